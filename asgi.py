@@ -0,0 +1,243 @@
+"""
+Serviço LLM V3 - modo de execução assíncrono (ASGI).
+
+Expõe os mesmos endpoints '/health', '/metrics', '/process', '/batch/pitch', '/jobs/<id>' e '/stream' da API Flask, mas com
+handlers assíncronos: as chamadas ao Gemini, embeddings e Firestore não
+prendem uma thread por requisição, permitindo manter centenas de chamadas
+lentas ao LLM em andamento em uma única instância.
+
+Execução: uvicorn asgi:app --host 0.0.0.0 --port $PORT (SERVING_MODE=async)
+"""
+
+import asyncio
+import logging
+import time
+from quart import Quart, Response, g, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import config
+import main
+from services import GeminiUnavailableError
+from handlers import (
+    handle_animaguy_request_async,
+    handle_pitch_request_async,
+    handle_pitch_batch_request_async,
+    stream_animaguy_request_async,
+    submit_pitch_job,
+    get_pitch_job_status_async,
+    JobQueueFullError
+)
+from utils import (
+    validate_mode,
+    validate_animaguy_request,
+    validate_pitch_request,
+    validate_pitch_batch_request,
+    validate_callback_url,
+    format_sse_event,
+    SSE_HEADERS,
+    metrics,
+    METRICS_CONTENT_TYPE,
+    REQUESTS_TOTAL,
+    REQUESTS_IN_FLIGHT,
+    REQUEST_SECONDS,
+    run_shutdown_hooks
+)
+
+logger = logging.getLogger(__name__)
+
+# Cria aplicação Quart (a inicialização dos serviços ocorre no import de main)
+app = Quart(__name__)
+app.config['MAX_CONTENT_LENGTH'] = main.app.config['MAX_CONTENT_LENGTH']
+
+@app.route("/health", methods=["GET"])
+async def health_check():
+    """Endpoint de health check."""
+    status, status_code = main.get_health_status()
+    return jsonify(status), status_code
+
+@app.after_serving
+async def flush_on_shutdown():
+    """
+    Executa os ganchos de encerramento após o uvicorn drenar as requisições.
+    
+    O uvicorn substitui o handler de SIGTERM de utils/shutdown.py; as filas de
+    gravação seguem ativas durante a drenagem e são gravadas aqui.
+    """
+    await asyncio.to_thread(run_shutdown_hooks)
+
+@app.before_request
+async def start_request_metrics():
+    """Conta a requisição como em andamento e marca o início."""
+    g.metrics_endpoint = main.request_metrics_endpoint(request.url_rule)
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(g.metrics_endpoint)
+
+@app.after_request
+async def count_request_metrics(response):
+    """Conta a requisição por endpoint e status."""
+    REQUESTS_TOTAL.inc(g.metrics_endpoint, str(response.status_code))
+    return response
+
+@app.teardown_request
+async def finish_request_metrics(error=None):
+    """Registra a duração da requisição (inclusive com erro)."""
+    if "metrics_start" in g:
+        REQUESTS_IN_FLIGHT.dec(g.metrics_endpoint)
+        REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, g.metrics_endpoint)
+
+@app.route("/metrics", methods=["GET"])
+async def metrics_endpoint():
+    """Endpoint de métricas no formato de texto do Prometheus."""
+    if not metrics.enabled:
+        return jsonify({"error": "Métricas desativadas (METRICS_ENABLED=False)"}), 404
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route("/process", methods=["POST"])
+async def process_request():
+    """Endpoint principal para processar requisições (versão assíncrona)."""
+    
+    if not main.initialization_successful:
+        return jsonify({
+            "error": "Serviço não inicializado corretamente. Verifique os logs."
+        }), 503
+    
+    try:
+        form = await request.form
+        files = await request.files
+        
+        # Valida modo
+        mode = form.get('mode')
+        is_valid, error_msg = validate_mode(mode)
+        if not is_valid:
+            return jsonify({"error": error_msg}), 400
+        
+        mode = mode.lower()
+        logger.info(f"Requisição recebida (async) - Modo: {mode}")
+        
+        # Extrai dados da requisição
+        text = form.get('text')
+        audio_file = files.get('audio_file')
+        
+        # Processa de acordo com o modo
+        if mode == "animaguy":
+            is_valid, error_msg = validate_animaguy_request(text, audio_file)
+            if not is_valid:
+                return jsonify({"error": error_msg}), 400
+            
+            session_id = form.get('session_id')
+            result = await handle_animaguy_request_async(text=text, session_id=session_id)
+            return jsonify(result), 200
+        
+        elif mode == "pitch":
+            is_valid, error_msg = validate_pitch_request(text, audio_file)
+            if not is_valid:
+                return jsonify({"error": error_msg}), 400
+            
+            # Modo assíncrono: responde com o job_id e analisa em segundo plano
+            if form.get('async', '').lower() in ('true', '1'):
+                callback_url = form.get('callback_url')
+                is_valid, error_msg = await asyncio.to_thread(
+                    validate_callback_url, callback_url, config.PITCH_CALLBACK_ALLOWED_HOSTS
+                )
+                if not is_valid:
+                    return jsonify({"error": error_msg}), 400
+                
+                # A cópia do áudio para o arquivo spooled (possivelmente em disco) é bloqueante
+                job = await asyncio.to_thread(
+                    submit_pitch_job, text=text, audio_file=audio_file, callback_url=callback_url
+                )
+                job["status_url"] = f"/jobs/{job['job_id']}"
+                return jsonify(job), 202, {"Location": job["status_url"]}
+            
+            result = await handle_pitch_request_async(text=text, audio_file=audio_file)
+            return jsonify(result), 200
+        
+        else:
+            return jsonify({"error": "Modo inválido."}), 400
+    
+    except JobQueueFullError as e:
+        logger.warning(str(e))
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    
+    except GeminiUnavailableError as e:
+        logger.warning(f"Chamada ao Gemini recusada: {e}")
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    
+    except RequestEntityTooLarge:
+        logger.error("Requisição muito grande")
+        return jsonify({"error": "Arquivo muito grande. Máximo: 25MB"}), 413
+    
+    except Exception as e:
+        logger.error(f"Erro ao processar requisição: {e}", exc_info=True)
+        return jsonify({
+            "error": f"Erro interno do servidor: {str(e)}"
+        }), 500
+
+@app.route("/batch/pitch", methods=["POST"])
+async def process_pitch_batch():
+    """Endpoint para análise de pitches em lote com concorrência limitada."""
+    
+    if not main.initialization_successful:
+        return jsonify({
+            "error": "Serviço não inicializado corretamente. Verifique os logs."
+        }), 503
+    
+    payload = await request.get_json(silent=True)
+    is_valid, error_msg = validate_pitch_batch_request(payload, config.BATCH_MAX_ITEMS, config.BATCH_AUDIO_URI_PREFIX)
+    if not is_valid:
+        return jsonify({"error": error_msg}), 400
+    
+    try:
+        result = await handle_pitch_batch_request_async(payload['items'], payload.get('concurrency'))
+        return jsonify(result), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao processar batch de pitches: {e}", exc_info=True)
+        return jsonify({
+            "error": f"Erro interno do servidor: {str(e)}"
+        }), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+async def get_job(job_id):
+    """Endpoint de consulta de uma análise de pitch assíncrona."""
+    
+    job = await get_pitch_job_status_async(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado"}), 404
+    
+    return jsonify(job), 200
+
+@app.route("/stream", methods=["POST"])
+async def stream_request():
+    """Endpoint AnimaGuy com resposta em streaming (Server-Sent Events)."""
+    
+    if not main.initialization_successful:
+        return jsonify({
+            "error": "Serviço não inicializado corretamente. Verifique os logs."
+        }), 503
+    
+    form = await request.form
+    files = await request.files
+    text = form.get('text')
+    audio_file = files.get('audio_file')
+    
+    is_valid, error_msg = validate_animaguy_request(text, audio_file)
+    if not is_valid:
+        return jsonify({"error": error_msg}), 400
+    
+    session_id = form.get('session_id')
+    logger.info("Requisição de streaming recebida (async) - Modo: animaguy")
+    
+    async def generate():
+        async for event in stream_animaguy_request_async(text=text, session_id=session_id):
+            yield format_sse_event(event["event"], event["data"]).encode('utf-8')
+    
+    return generate(), 200, {"Content-Type": "text/event-stream", **SSE_HEADERS}
+
+@app.errorhandler(404)
+async def not_found(error):
+    """Handler para 404."""
+    return jsonify({"error": "Endpoint não encontrado"}), 404
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=config.PORT, debug=config.DEBUG)
@@ -12,19 +12,159 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 # --- Gemini Configuration ---
 GEMINI_MODEL = "gemini-2.0-flash-exp"  # Modelo principal
 EMBEDDING_MODEL = "models/text-embedding-004"  # Para embeddings RAG
+GEMINI_MODEL_CACHE_SIZE = 32  # Instâncias de modelo reutilizadas (por configuração e instrução de sistema)
+GEMINI_CONTEXT_CACHE_ENABLED = os.environ.get("GEMINI_CONTEXT_CACHE_ENABLED", "False").lower() == "true"  # Cache de contexto das instruções de pitch
+GEMINI_CONTEXT_CACHE_MODEL = os.environ.get("GEMINI_CONTEXT_CACHE_MODEL", "models/gemini-1.5-flash-002")  # O cache de contexto exige modelo versionado
+GEMINI_CONTEXT_CACHE_TTL = int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", 3600))  # Tempo de vida do cache no servidor (segundos)
+GEMINI_CONTEXT_CACHE_RETRY_INTERVAL = 600  # Espera antes de tentar recriar o cache após falha (segundos)
+GEMINI_PITCH_MODELS = (GEMINI_MODEL, GEMINI_CONTEXT_CACHE_MODEL) if GEMINI_CONTEXT_CACHE_ENABLED else (GEMINI_MODEL,)  # Modelos que podem analisar um pitch (entram na chave do cache de resultados)
 
 # --- RAG Configuration ---
-RAG_TOP_K = 5  # Número de chunks mais relevantes a recuperar
+RAG_TOP_K = 5  # Número máximo de chunks no contexto (após filtro, MMR e orçamento)
 RAG_INDEX_PATH = "/tmp/faiss_index.bin"  # Caminho local para índice FAISS
 RAG_CHUNKS_PATH = "/tmp/text_chunks.json"  # Caminho local para chunks de texto
+RAG_INDEX_BLOB = os.environ.get("RAG_INDEX_BLOB", "faiss_index.bin")  # Objeto no bucket (sufixo .gz = comprimido)
+RAG_CHUNKS_BLOB = os.environ.get("RAG_CHUNKS_BLOB", "text_chunks.json")  # Objeto no bucket (sufixo .gz = comprimido)
+RAG_MANIFEST_PATH = "/tmp/rag_manifest.json"  # Geração/MD5 dos artefatos locais (evita downloads repetidos)
+RAG_DOWNLOAD_SLICE_THRESHOLD = 64 * 1024 * 1024  # Objetos maiores são baixados em fatias paralelas
+RAG_DOWNLOAD_SLICE_SIZE = 32 * 1024 * 1024  # Tamanho de cada fatia (range request)
+RAG_DOWNLOAD_SLICE_WORKERS = 8  # Fatias baixadas simultaneamente
+RAG_REFRESH_INTERVAL = int(os.environ.get("RAG_REFRESH_INTERVAL", 0))  # Segundos entre verificações de nova versão no bucket (0 = desativado)
+RAG_VERSIONS_DIR = "/tmp/rag_versions"  # Diretório das versões baixadas pela atualização automática
+RAG_CHUNK_SIZE = 1000  # Tamanho dos chunks (caracteres) na construção do índice
+RAG_CHUNK_OVERLAP = 200  # Sobreposição entre chunks consecutivos (caracteres)
+RAG_EMBED_BATCH_SIZE = 100  # Textos por chamada de embedding em lote (limite da API)
+RAG_INDEX_FACTORY = "Flat"  # String do faiss.index_factory na construção (ex: "IVF256,Flat", "HNSW32", "IVF256,PQ32")
+RAG_NPROBE = int(os.environ.get("RAG_NPROBE", 0))  # Listas visitadas por busca em índices IVF (0 = padrão do índice)
+RAG_EF_SEARCH = int(os.environ.get("RAG_EF_SEARCH", 0))  # Profundidade de busca em índices HNSW (0 = padrão do índice)
+RAG_INDEX_MMAP = os.environ.get("RAG_INDEX_MMAP", "True").lower() == "true"  # Mapeia as listas invertidas de índices IVF (Flat/HNSW são sempre copiados para o heap)
+
+# --- Busca Híbrida (BM25 + FAISS) ---
+RAG_HYBRID_ENABLED = os.environ.get("RAG_HYBRID_ENABLED", "True").lower() == "true"  # Índice lexical BM25 fundido com a busca densa
+RAG_HYBRID_CANDIDATES = 20  # Candidatos de cada busca (densa e lexical) antes da fusão e da montagem do contexto
+RAG_RRF_K = 60  # Constante de suavização do Reciprocal Rank Fusion
+RAG_BM25_K1 = 1.2  # Saturação da frequência do termo no BM25
+RAG_BM25_B = 0.75  # Normalização pelo tamanho do chunk no BM25
+RAG_EMBEDDING_DEADLINE = float(os.environ.get("RAG_EMBEDDING_DEADLINE", 2.0))  # Espera máxima pelo embedding antes de usar só a busca lexical (segundos)
+RAG_EMBEDDING_WORKERS = 4  # Threads para embeddings com prazo (modo síncrono)
+
+# --- Montagem do Contexto RAG ---
+RAG_MIN_SIMILARITY = float(os.environ.get("RAG_MIN_SIMILARITY", 0.35))  # Similaridade de cosseno mínima entre chunk e consulta
+RAG_MMR_LAMBDA = 0.7  # Peso da relevância no MMR (o restante penaliza redundância entre chunks)
+RAG_DUPLICATE_SIMILARITY = 0.95  # Chunks mais similares que isso a um já escolhido são descartados
+RAG_CONTEXT_MAX_CHARS = {
+    "animaguy": int(os.environ.get("RAG_CONTEXT_MAX_CHARS_ANIMAGUY", 4000)),
+    "pitch": int(os.environ.get("RAG_CONTEXT_MAX_CHARS_PITCH", 5000))
+}  # Orçamento de caracteres do contexto por modo
+RAG_CONTEXT_DEFAULT_MAX_CHARS = 5000  # Orçamento para chamadas sem modo
+RAG_CHARS_PER_TOKEN = 4  # Estimativa usada para registrar os tokens economizados
+
+# --- Warmup de Consultas Frequentes ---
+RAG_PITCH_AUDIO_QUERY = "dicas de pitch para investidores"  # Consulta RAG fixa dos pitches só com áudio
+RAG_WARMUP_ENABLED = os.environ.get("RAG_WARMUP_ENABLED", "True").lower() == "true"  # Pré-calcula embeddings e contextos na inicialização
+RAG_WARMUP_QUERIES = [RAG_PITCH_AUDIO_QUERY] + [
+    query.strip() for query in os.environ.get("RAG_WARMUP_QUERIES", "").split("|") if query.strip()
+]  # Consultas frequentes extras separadas por "|"
+
+# --- Busca com Múltiplas Consultas ---
+RAG_MULTI_QUERY_ENABLED = os.environ.get("RAG_MULTI_QUERY_ENABLED", "True").lower() == "true"  # Consultas extras do histórico e do pitch em uma busca
+RAG_KEY_PHRASES_MAX = int(os.environ.get("RAG_KEY_PHRASES_MAX", 3))  # Frases-chave de um pitch em texto usadas como consultas extras
+RAG_KEY_PHRASE_MAX_CHARS = 300  # Tamanho máximo de cada frase-chave
+RAG_HISTORY_QUERY_TURNS = 2  # Mensagens recentes do usuário condensadas em uma consulta extra (AnimaGuy)
+RAG_HISTORY_QUERY_MAX_CHARS = 500  # Tamanho máximo das consultas extras do histórico e do resumo
+
+# --- Cache de Embeddings ---
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "True").lower() == "true"
+EMBEDDING_CACHE_MAX_SIZE = int(os.environ.get("EMBEDDING_CACHE_MAX_SIZE", 1024))  # Máximo de consultas em cache
+EMBEDDING_CACHE_TTL = int(os.environ.get("EMBEDDING_CACHE_TTL", 3600))  # 1 hora
+
+# --- Cache Semântico de Respostas (AnimaGuy) ---
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"  # Opt-in
+SEMANTIC_CACHE_MAX_SIZE = int(os.environ.get("SEMANTIC_CACHE_MAX_SIZE", 512))  # Máximo de perguntas armazenadas
+SEMANTIC_CACHE_TTL = int(os.environ.get("SEMANTIC_CACHE_TTL", 1800))  # 30 minutos
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.95))  # Similaridade de cosseno mínima
+
+# --- Upload de Áudio ---
+AUDIO_MAX_BYTES = int(os.environ.get("AUDIO_MAX_BYTES", 25 * 1024 * 1024))  # 25MB por arquivo (rejeitado durante o upload)
+UPLOAD_SPOOL_MAX_MEMORY = int(os.environ.get("UPLOAD_SPOOL_MAX_MEMORY", 1024 * 1024))  # Bytes em memória antes de ir para arquivo temporário
+UPLOAD_CHUNK_SIZE = 256 * 1024  # Bloco de leitura para hash e cópia de áudio
+GEMINI_FILE_ACTIVE_TIMEOUT = int(os.environ.get("GEMINI_FILE_ACTIVE_TIMEOUT", 60))  # Espera pelo processamento do arquivo na File API
+
+# --- Normalização de Áudio (ffmpeg) ---
+AUDIO_NORMALIZATION_ENABLED = os.environ.get("AUDIO_NORMALIZATION_ENABLED", "False").lower() == "true"  # Opt-in
+AUDIO_NORMALIZE_SAMPLE_RATE = int(os.environ.get("AUDIO_NORMALIZE_SAMPLE_RATE", 16000))  # Taxa de amostragem de voz (Hz)
+AUDIO_NORMALIZE_BITRATE = os.environ.get("AUDIO_NORMALIZE_BITRATE", "24k")  # Bitrate do Opus
+AUDIO_SILENCE_THRESHOLD_DB = int(os.environ.get("AUDIO_SILENCE_THRESHOLD_DB", -50))  # Abaixo disso é silêncio (início/fim)
+AUDIO_NORMALIZE_TIMEOUT = int(os.environ.get("AUDIO_NORMALIZE_TIMEOUT", 60))  # Tempo máximo do ffmpeg (segundos)
+FFMPEG_PATH = os.environ.get("FFMPEG_PATH", "ffmpeg")
+FFPROBE_PATH = os.environ.get("FFPROBE_PATH", "ffprobe")
+
+# --- Histórico de Sessões (AnimaGuy) ---
+ANIMAGUY_HISTORY_MAX_TURNS = int(os.environ.get("ANIMAGUY_HISTORY_MAX_TURNS", 10))  # Turnos recentes enviados ao modelo
+ANIMAGUY_HISTORY_SUMMARY_ENABLED = os.environ.get("ANIMAGUY_HISTORY_SUMMARY_ENABLED", "True").lower() == "true"  # Resume turnos fora da janela
+ANIMAGUY_HISTORY_SUMMARY_BATCH = int(os.environ.get("ANIMAGUY_HISTORY_SUMMARY_BATCH", 5))  # Turnos antigos acumulados antes de resumir
+
+# --- Cache de Sessões (AnimaGuy) ---
+# Requer afinidade de sessão no Cloud Run (--session-affinity): sem ela, outra instância pode ler uma janela desatualizada
+SESSION_CACHE_ENABLED = os.environ.get("SESSION_CACHE_ENABLED", "False").lower() == "true"  # Opt-in
+SESSION_CACHE_MAX_SIZE = int(os.environ.get("SESSION_CACHE_MAX_SIZE", 1000))  # Máximo de sessões em memória
+SESSION_CACHE_TTL = int(os.environ.get("SESSION_CACHE_TTL", 900))  # 15 minutos sem uso
+SESSION_CACHE_FLUSH_INTERVAL = float(os.environ.get("SESSION_CACHE_FLUSH_INTERVAL", 2.0))  # Segundos entre gravações em lote
+
+# --- Single-flight (requisições idênticas simultâneas) ---
+SINGLE_FLIGHT_ENABLED = os.environ.get("SINGLE_FLIGHT_ENABLED", "True").lower() == "true"  # Coalesce embeddings, pitches e primeiros turnos idênticos em andamento
+
+# --- Métricas (Prometheus) ---
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True").lower() == "true"  # Expõe contadores, gauges e histogramas em /metrics
+
+# --- Cache de Resultados de Pitch ---
+PITCH_CACHE_ENABLED = os.environ.get("PITCH_CACHE_ENABLED", "True").lower() == "true"
+PITCH_CACHE_MAX_SIZE = int(os.environ.get("PITCH_CACHE_MAX_SIZE", 256))  # Máximo de análises em memória
+PITCH_CACHE_TTL = int(os.environ.get("PITCH_CACHE_TTL", 86400))  # 24 horas
+PITCH_CACHE_PERSISTENT = os.environ.get("PITCH_CACHE_PERSISTENT", "False").lower() == "true"  # Consulta 'pitch_jobs' no Firestore
+
+# --- Tracking de Jobs de Pitch ---
+PITCH_JOB_MAX_PENDING = int(os.environ.get("PITCH_JOB_MAX_PENDING", 1000))  # Jobs com escrita pendente em memória
+PITCH_JOB_BATCH_SIZE = int(os.environ.get("PITCH_JOB_BATCH_SIZE", 100))  # Pendências que antecipam a gravação
+PITCH_JOB_FLUSH_INTERVAL = float(os.environ.get("PITCH_JOB_FLUSH_INTERVAL", 1.0))  # Segundos entre gravações em lote
+
+# --- Jobs Assíncronos de Pitch (async=true) ---
+PITCH_ASYNC_WORKERS = int(os.environ.get("PITCH_ASYNC_WORKERS", 2))  # Análises simultâneas em segundo plano
+PITCH_ASYNC_MAX_QUEUED = int(os.environ.get("PITCH_ASYNC_MAX_QUEUED", 20))  # Jobs aguardando worker antes de recusar (503)
+PITCH_CALLBACK_TIMEOUT = int(os.environ.get("PITCH_CALLBACK_TIMEOUT", 10))  # Timeout do POST na callback_url (segundos)
+PITCH_CALLBACK_ALLOWED_HOSTS = frozenset(
+    host.strip().lower() for host in os.environ.get("PITCH_CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()
+)  # Hosts aceitos na callback_url (vazio = qualquer host público via https)
+
+# --- Batch de Pitches ---
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 500))  # Itens máximos por requisição de batch
+BATCH_DEFAULT_CONCURRENCY = int(os.environ.get("BATCH_DEFAULT_CONCURRENCY", 4))  # Análises simultâneas por batch
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 16))  # Limite superior aceito do cliente
+BATCH_AUDIO_BUCKET = os.environ.get("BATCH_AUDIO_BUCKET")  # Único bucket de onde o batch lê áudios (sem ele, 'audio_uri' é recusado)
+BATCH_AUDIO_PREFIX = os.environ.get("BATCH_AUDIO_PREFIX", "")  # Prefixo obrigatório dos objetos de áudio no bucket
+BATCH_AUDIO_URI_PREFIX = f"gs://{BATCH_AUDIO_BUCKET}/{BATCH_AUDIO_PREFIX}" if BATCH_AUDIO_BUCKET else None
 
 # --- Server Configuration ---
 PORT = int(os.environ.get("PORT", 8080))
 DEBUG = os.environ.get("DEBUG", "False").lower() == "true"
+SERVING_MODE = os.environ.get("SERVING_MODE", "wsgi").lower()  # 'wsgi' (gunicorn + Flask) ou 'async' (uvicorn + Quart)
 
 # --- Timeouts ---
 REQUEST_TIMEOUT = 300  # 5 minutos
-GEMINI_TIMEOUT = 180  # 3 minutos
+GEMINI_TIMEOUT = int(os.environ.get("GEMINI_TIMEOUT", 180))  # Tempo máximo de cada chamada de geração/upload ao Gemini (3 minutos)
+EMBEDDING_TIMEOUT = int(os.environ.get("EMBEDDING_TIMEOUT", 15))  # Tempo máximo de cada chamada de embedding
+
+# --- Política de Chamadas ao Gemini ---
+# Chamadas simultâneas por instância e classe; no modo async (concurrency 250 no Cloud Run) cada requisição mantém uma geração aberta
+GEMINI_MAX_CONCURRENCY_GENERATE = int(os.environ.get("GEMINI_MAX_CONCURRENCY_GENERATE", 250 if SERVING_MODE == "async" else 8))  # Geração e chat
+GEMINI_MAX_CONCURRENCY_EMBED = int(os.environ.get("GEMINI_MAX_CONCURRENCY_EMBED", 64 if SERVING_MODE == "async" else 8))  # Embeddings
+GEMINI_MAX_CONCURRENCY_FILE = int(os.environ.get("GEMINI_MAX_CONCURRENCY_FILE", 32 if SERVING_MODE == "async" else 4))  # File API e cache de contexto
+GEMINI_QUEUE_TIMEOUT = float(os.environ.get("GEMINI_QUEUE_TIMEOUT", 10))  # Espera máxima por vaga antes de responder 503 (segundos)
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", 3))  # Novas tentativas em erros transitórios (429/500/503/504)
+GEMINI_BACKOFF_BASE = 0.5  # Espera base do backoff exponencial com jitter (segundos)
+GEMINI_BACKOFF_MAX = 8.0  # Espera máxima entre tentativas (segundos)
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("GEMINI_CIRCUIT_FAILURE_THRESHOLD", 5))  # Falhas transitórias consecutivas que abrem o circuito
+GEMINI_CIRCUIT_RESET_TIMEOUT = int(os.environ.get("GEMINI_CIRCUIT_RESET_TIMEOUT", 30))  # Segundos com o circuito aberto antes da chamada de teste
 
 # --- Validação de Configurações Críticas ---
 def validate_config():
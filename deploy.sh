@@ -15,6 +15,31 @@ REGION="southamerica-east1"
 SERVICE_NAME="llm-v3-service"
 GCS_RAG_BUCKET_NAME="seu-rag-bucket"  # ALTERE PARA SEU BUCKET RAG
 GEMINI_API_KEY="sua-gemini-api-key"  # ALTERE PARA SUA API KEY
+SERVING_MODE="wsgi"  # 'wsgi' (gunicorn, 2 threads) ou 'async' (uvicorn, centenas de requisições por instância)
+
+SESSION_CACHE_ENABLED="False"  # 'True' mantém sessões do AnimaGuy em memória (ativa afinidade de sessão)
+PITCH_ASYNC_JOBS="True"  # 'True' se clientes usam async=true: a CPU fica alocada fora das requisições (--no-cpu-throttling)
+MIN_INSTANCES=0  # Com jobs assíncronos, 1+ evita que a última instância seja encerrada com jobs em andamento após ficar ociosa
+
+if [ "$SESSION_CACHE_ENABLED" = "True" ]; then
+  SESSION_AFFINITY_FLAG="--session-affinity"
+else
+  SESSION_AFFINITY_FLAG="--no-session-affinity"
+fi
+
+if [ "$SERVING_MODE" = "async" ]; then
+  CONCURRENCY=250
+else
+  CONCURRENCY=80
+fi
+
+# Jobs assíncronos e gravações em lote rodam depois da resposta: com a CPU
+# limitada às requisições (padrão do Cloud Run), ficariam praticamente parados
+if [ "$SERVING_MODE" = "async" ] || [ "$PITCH_ASYNC_JOBS" = "True" ]; then
+  CPU_THROTTLING_FLAG="--no-cpu-throttling"
+else
+  CPU_THROTTLING_FLAG="--cpu-throttling"
+fi
 
 echo ""
 echo "Configuração:"
@@ -22,6 +47,9 @@ echo "  Project ID: $PROJECT_ID"
 echo "  Region: $REGION"
 echo "  Service: $SERVICE_NAME"
 echo "  RAG Bucket: $GCS_RAG_BUCKET_NAME"
+echo "  Serving mode: $SERVING_MODE (concurrency $CONCURRENCY)"
+echo "  Session cache: $SESSION_CACHE_ENABLED"
+echo "  CPU: $CPU_THROTTLING_FLAG (min instances $MIN_INSTANCES)"
 echo ""
 
 read -p "As configurações estão corretas? (y/n) " -n 1 -r
@@ -46,10 +74,16 @@ gcloud run deploy $SERVICE_NAME \
   --cpu=1 \
   --timeout=300 \
   --cpu-boost \
+  --concurrency=$CONCURRENCY \
+  --min-instances=$MIN_INSTANCES \
+  $CPU_THROTTLING_FLAG \
+  $SESSION_AFFINITY_FLAG \
   --allow-unauthenticated \
   --set-env-vars="PROJECT_ID=${PROJECT_ID}" \
   --set-env-vars="GCS_RAG_BUCKET_NAME=${GCS_RAG_BUCKET_NAME}" \
-  --set-env-vars="GEMINI_API_KEY=${GEMINI_API_KEY}"
+  --set-env-vars="GEMINI_API_KEY=${GEMINI_API_KEY}" \
+  --set-env-vars="SERVING_MODE=${SERVING_MODE}" \
+  --set-env-vars="SESSION_CACHE_ENABLED=${SESSION_CACHE_ENABLED}"
 
 echo ""
 echo "=========================================="
@@ -0,0 +1,15 @@
+"""
+Configuração do gunicorn (carregada automaticamente do diretório de trabalho).
+
+O SIGTERM do Cloud Run dispara os ganchos de encerramento (utils/shutdown.py),
+mas as requisições em andamento ainda concluem durante a drenagem do worker.
+O worker_exit roda os ganchos de novo depois da drenagem, gravando o que essas
+requisições deixaram pendente.
+"""
+
+
+def worker_exit(server, worker):
+    """Executa os ganchos de encerramento após o worker drenar as requisições."""
+    from utils import run_shutdown_hooks
+    
+    run_shutdown_hooks()
@@ -2,10 +2,34 @@
 Handlers package - Processadores de requisições.
 """
 
-from .animaguy_handler import handle_animaguy_request
-from .pitch_handler import handle_pitch_request
+from .animaguy_handler import (
+    handle_animaguy_request,
+    handle_animaguy_request_async,
+    stream_animaguy_request,
+    stream_animaguy_request_async
+)
+from .pitch_handler import handle_pitch_request, handle_pitch_request_async
+from .batch_handler import handle_pitch_batch_request, handle_pitch_batch_request_async
+from .job_handler import (
+    submit_pitch_job,
+    get_pitch_job_status,
+    get_pitch_job_status_async,
+    fail_unfinished_jobs,
+    JobQueueFullError
+)
 
 __all__ = [
     'handle_animaguy_request',
-    'handle_pitch_request'
+    'handle_animaguy_request_async',
+    'stream_animaguy_request',
+    'stream_animaguy_request_async',
+    'handle_pitch_request',
+    'handle_pitch_request_async',
+    'handle_pitch_batch_request',
+    'handle_pitch_batch_request_async',
+    'submit_pitch_job',
+    'get_pitch_job_status',
+    'get_pitch_job_status_async',
+    'fail_unfinished_jobs',
+    'JobQueueFullError'
 ]
@@ -2,12 +2,14 @@
 Handler para requisições do modo AnimaGuy.
 """
 
+import asyncio
 import logging
 import uuid
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
 
-from services import rag_service, gemini_service
-from utils import firestore_client
+import config
+from services import rag_service, gemini_service, semantic_cache, session_history
+from utils import animaguy_flight
 from models import PROMPT_ANIMAGUY
 
 logger = logging.getLogger(__name__)
@@ -23,40 +25,111 @@ def handle_animaguy_request(text: str, session_id: str = None) -> Dict[str, Any]
     Returns:
         Dict: Resposta com 'answer' e 'session_id'
     """
-    # Gera ou usa session_id existente
-    if not session_id:
-        session_id = str(uuid.uuid4())
-        logger.info(f"Nova sessão AnimaGuy criada: {session_id}")
-    else:
-        logger.info(f"Usando sessão existente: {session_id}")
+    session_id, is_existing_session = _resolve_session(session_id)
     
     try:
-        # 1. Busca contexto relevante no RAG
-        logger.info("Buscando contexto RAG para AnimaGuy...")
-        context = rag_service.find_relevant_context(text)
+        # 1-4. Histórico, cache semântico, contexto RAG e prompt do sistema
+        turn = _prepare_turn(text, session_id, is_existing_session)
         
-        if not context:
-            context = "Nenhum contexto adicional da base de conhecimento encontrado."
-            logger.warning("RAG não retornou contexto relevante.")
+        if turn["cached_answer"] is not None:
+            _save_turn(session_id, turn["session"], text, turn["cached_answer"])
+            return {
+                "answer": turn["cached_answer"],
+                "session_id": session_id
+            }
         
-        # 2. Monta o prompt do sistema com contexto
-        system_prompt = PROMPT_ANIMAGUY.format(context=context)
+        # 5. Gera resposta com Gemini
+        logger.info("Gerando resposta com Gemini...")
+        answer = _generate_answer(text, turn)
         
-        # 3. Recupera histórico da sessão
-        history = firestore_client.get_session_history(session_id)
+        # 6. Atualiza histórico
+        _finish_turn(turn, session_id, text, answer)
         
-        # 4. Gera resposta com Gemini
-        logger.info("Gerando resposta com Gemini...")
-        answer = gemini_service.generate_chat_response(
+        logger.info(f"Resposta AnimaGuy gerada com sucesso para sessão {session_id}")
+        
+        return {
+            "answer": answer,
+            "session_id": session_id
+        }
+        
+    except Exception as e:
+        logger.error(f"Erro ao processar requisição AnimaGuy: {e}", exc_info=True)
+        raise
+
+
+def stream_animaguy_request(text: str, session_id: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Processa uma requisição do modo AnimaGuy emitindo a resposta em partes.
+    
+    Args:
+        text: Mensagem do usuário
+        session_id: ID da sessão (opcional, cria nova se None)
+        
+    Yields:
+        Dict: Eventos {'event': 'session'|'token'|'done'|'error', 'data': {...}}
+    """
+    session_id, is_existing_session = _resolve_session(session_id)
+    yield {"event": "session", "data": {"session_id": session_id}}
+    
+    try:
+        turn = _prepare_turn(text, session_id, is_existing_session)
+        
+        if turn["cached_answer"] is not None:
+            yield {"event": "token", "data": {"text": turn["cached_answer"]}}
+            _save_turn(session_id, turn["session"], text, turn["cached_answer"])
+            yield {"event": "done", "data": {"session_id": session_id}}
+            return
+        
+        logger.info("Gerando resposta em streaming com Gemini...")
+        answer_parts = []
+        for chunk in gemini_service.generate_chat_response_stream(
             user_message=text,
-            system_prompt=system_prompt,
-            history=history
-        )
+            system_prompt=turn["system_prompt"],
+            history=turn["history"]
+        ):
+            answer_parts.append(chunk)
+            yield {"event": "token", "data": {"text": chunk}}
         
-        # 5. Atualiza histórico
-        history.append({"role": "user", "parts": [text]})
-        history.append({"role": "model", "parts": [answer]})
-        firestore_client.save_session_history(session_id, history)
+        # Persiste a resposta completa ao final do streaming
+        _finish_turn(turn, session_id, text, "".join(answer_parts))
+        
+        logger.info(f"Resposta AnimaGuy (streaming) gerada com sucesso para sessão {session_id}")
+        yield {"event": "done", "data": {"session_id": session_id}}
+        
+    except Exception as e:
+        logger.error(f"Erro ao processar requisição AnimaGuy (streaming): {e}", exc_info=True)
+        yield {"event": "error", "data": {"error": f"Erro interno do servidor: {str(e)}"}}
+
+
+async def handle_animaguy_request_async(text: str, session_id: str = None) -> Dict[str, Any]:
+    """
+    Versão assíncrona de handle_animaguy_request.
+    
+    Etapas independentes (histórico da sessão e busca RAG) rodam concorrentemente.
+    
+    Args:
+        text: Mensagem do usuário
+        session_id: ID da sessão (opcional, cria nova se None)
+        
+    Returns:
+        Dict: Resposta com 'answer' e 'session_id'
+    """
+    session_id, is_existing_session = _resolve_session(session_id)
+    
+    try:
+        turn = await _prepare_turn_async(text, session_id, is_existing_session)
+        
+        if turn["cached_answer"] is not None:
+            await _save_turn_async(session_id, turn["session"], text, turn["cached_answer"])
+            return {
+                "answer": turn["cached_answer"],
+                "session_id": session_id
+            }
+        
+        logger.info("Gerando resposta com Gemini...")
+        answer = await _generate_answer_async(text, turn)
+        
+        await _finish_turn_async(turn, session_id, text, answer)
         
         logger.info(f"Resposta AnimaGuy gerada com sucesso para sessão {session_id}")
         
@@ -68,3 +141,273 @@ def handle_animaguy_request(text: str, session_id: str = None) -> Dict[str, Any]
     except Exception as e:
         logger.error(f"Erro ao processar requisição AnimaGuy: {e}", exc_info=True)
         raise
+
+
+async def stream_animaguy_request_async(text: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Versão assíncrona de stream_animaguy_request.
+    
+    Args:
+        text: Mensagem do usuário
+        session_id: ID da sessão (opcional, cria nova se None)
+        
+    Yields:
+        Dict: Eventos {'event': 'session'|'token'|'done'|'error', 'data': {...}}
+    """
+    session_id, is_existing_session = _resolve_session(session_id)
+    yield {"event": "session", "data": {"session_id": session_id}}
+    
+    try:
+        turn = await _prepare_turn_async(text, session_id, is_existing_session)
+        
+        if turn["cached_answer"] is not None:
+            yield {"event": "token", "data": {"text": turn["cached_answer"]}}
+            await _save_turn_async(session_id, turn["session"], text, turn["cached_answer"])
+            yield {"event": "done", "data": {"session_id": session_id}}
+            return
+        
+        logger.info("Gerando resposta em streaming com Gemini...")
+        answer_parts = []
+        async for chunk in gemini_service.generate_chat_response_stream_async(
+            user_message=text,
+            system_prompt=turn["system_prompt"],
+            history=turn["history"]
+        ):
+            answer_parts.append(chunk)
+            yield {"event": "token", "data": {"text": chunk}}
+        
+        await _finish_turn_async(turn, session_id, text, "".join(answer_parts))
+        
+        logger.info(f"Resposta AnimaGuy (streaming) gerada com sucesso para sessão {session_id}")
+        yield {"event": "done", "data": {"session_id": session_id}}
+        
+    except Exception as e:
+        logger.error(f"Erro ao processar requisição AnimaGuy (streaming): {e}", exc_info=True)
+        yield {"event": "error", "data": {"error": f"Erro interno do servidor: {str(e)}"}}
+
+
+def _resolve_session(session_id: Optional[str]) -> Tuple[str, bool]:
+    """Gera um novo session_id se necessário e indica se a sessão já existia."""
+    if not session_id:
+        session_id = str(uuid.uuid4())
+        logger.info(f"Nova sessão AnimaGuy criada: {session_id}")
+        return session_id, False
+    
+    logger.info(f"Usando sessão existente: {session_id}")
+    return session_id, True
+
+
+def _prepare_turn(text: str, session_id: str, is_existing_session: bool) -> Dict[str, Any]:
+    """
+    Executa as etapas anteriores à geração: histórico, cache semântico, RAG e prompt.
+    
+    Returns:
+        Dict: 'session', 'history', 'query_embedding', 'use_semantic_cache', 'cached_answer' e 'system_prompt'
+    """
+    # 1. Recupera o histórico limitado da sessão (sessões novas não têm histórico)
+    session = session_history.load(session_id) if is_existing_session else session_history.empty()
+    turn = {
+        "session": session,
+        "history": session["history"],
+        "query_embedding": None,
+        "use_semantic_cache": (
+            config.SEMANTIC_CACHE_ENABLED and session["turn_count"] == 0 and rag_service.is_available()
+        ),
+        "cached_answer": None,
+        "system_prompt": None
+    }
+    
+    # 2. Cache semântico para perguntas de primeiro turno (opt-in)
+    if turn["use_semantic_cache"]:
+        try:
+            turn["query_embedding"] = rag_service.embed_query(text)
+        except Exception as e:
+            logger.warning(f"Falha ao gerar embedding para o cache semântico: {e}")
+            turn["use_semantic_cache"] = False
+    
+    if turn["use_semantic_cache"]:
+        turn["cached_answer"] = semantic_cache.lookup(turn["query_embedding"], rag_service.index_version)
+        if turn["cached_answer"] is not None:
+            logger.info(f"Resposta AnimaGuy servida do cache semântico para sessão {session_id}")
+            return turn
+    
+    # 3. Busca contexto relevante no RAG (reaproveita o embedding, se já calculado)
+    logger.info("Buscando contexto RAG para AnimaGuy...")
+    queries = _rag_queries(text, session)
+    if len(queries) > 1:
+        context = rag_service.find_relevant_context_multi(queries, mode="animaguy")
+    else:
+        context = rag_service.find_relevant_context(text, query_embedding=turn["query_embedding"], mode="animaguy")
+    
+    if not context:
+        context = "Nenhum contexto adicional da base de conhecimento encontrado."
+        logger.warning("RAG não retornou contexto relevante.")
+    
+    # 4. Monta o prompt do sistema com contexto
+    turn["system_prompt"] = PROMPT_ANIMAGUY.format(context=context)
+    return turn
+
+
+def _rag_queries(text: str, session: Dict[str, Any]) -> List[str]:
+    """
+    Consultas RAG de um turno: a mensagem e, em sessões com histórico, as
+    mensagens recentes do usuário condensadas e o resumo dos turnos antigos.
+    """
+    queries = [text]
+    if not config.RAG_MULTI_QUERY_ENABLED or session["turn_count"] == 0:
+        return queries
+    
+    window = session["window"]
+    recent_messages = [past_turn["user"] for past_turn in window["turns"][-config.RAG_HISTORY_QUERY_TURNS:]]
+    if recent_messages:
+        # Mantém o final (as mensagens mais recentes) se passar do limite
+        queries.append(" ".join(" ".join(recent_messages).split())[-config.RAG_HISTORY_QUERY_MAX_CHARS:])
+    if window["summary"]:
+        queries.append(window["summary"][:config.RAG_HISTORY_QUERY_MAX_CHARS])
+    return queries
+
+
+def _generate_answer(text: str, turn: Dict[str, Any]) -> str:
+    """Gera a resposta com Gemini; primeiros turnos idênticos simultâneos compartilham uma chamada."""
+    def generate() -> str:
+        return gemini_service.generate_chat_response(
+            user_message=text,
+            system_prompt=turn["system_prompt"],
+            history=turn["history"]
+        )
+    
+    # Com histórico, a resposta depende da sessão e não pode ser compartilhada
+    if turn["session"]["turn_count"] > 0:
+        return generate()
+    
+    answer, shared = animaguy_flight.do(_first_turn_key(text), generate)
+    if shared:
+        # A requisição que fez a chamada já alimenta o cache semântico
+        turn["use_semantic_cache"] = False
+    return answer
+
+
+def _first_turn_key(text: str) -> Tuple[str, int]:
+    """Impressão digital de um primeiro turno: pergunta normalizada e versão do índice RAG."""
+    return " ".join(text.split()), rag_service.index_version
+
+
+def _finish_turn(turn: Dict[str, Any], session_id: str, text: str, answer: str) -> None:
+    """Persiste o turno gerado e alimenta o cache semântico quando aplicável."""
+    _save_turn(session_id, turn["session"], text, answer)
+    
+    if turn["use_semantic_cache"]:
+        semantic_cache.add(turn["query_embedding"], answer, rag_service.index_version)
+
+
+async def _prepare_turn_async(text: str, session_id: str, is_existing_session: bool) -> Dict[str, Any]:
+    """
+    Versão assíncrona de _prepare_turn: histórico e RAG (ou embedding) rodam em paralelo.
+    
+    Returns:
+        Dict: 'session', 'history', 'query_embedding', 'use_semantic_cache', 'cached_answer' e 'system_prompt'
+    """
+    history_task = session_history.load_async(session_id) if is_existing_session else _empty_history()
+    turn = {
+        "session": None,
+        "history": [],
+        "query_embedding": None,
+        "use_semantic_cache": config.SEMANTIC_CACHE_ENABLED and rag_service.is_available(),
+        "cached_answer": None,
+        "system_prompt": None
+    }
+    
+    if turn["use_semantic_cache"]:
+        # Histórico e embedding em paralelo (o embedding serve ao cache e ao RAG)
+        session, query_embedding = await asyncio.gather(
+            history_task,
+            rag_service.embed_query_async(text),
+            return_exceptions=True
+        )
+        if isinstance(session, BaseException):
+            raise session
+        if isinstance(query_embedding, BaseException):
+            logger.warning(f"Falha ao gerar embedding para o cache semântico: {query_embedding}")
+            query_embedding = None
+        
+        turn["session"] = session
+        turn["history"] = session["history"]
+        turn["query_embedding"] = query_embedding
+        
+        # O cache semântico só vale para o primeiro turno da sessão
+        turn["use_semantic_cache"] = query_embedding is not None and session["turn_count"] == 0
+        if turn["use_semantic_cache"]:
+            turn["cached_answer"] = semantic_cache.lookup(query_embedding, rag_service.index_version)
+            if turn["cached_answer"] is not None:
+                logger.info(f"Resposta AnimaGuy servida do cache semântico para sessão {session_id}")
+                return turn
+        
+        queries = _rag_queries(text, session)
+        if len(queries) > 1:
+            context = await rag_service.find_relevant_context_multi_async(queries, mode="animaguy")
+        else:
+            context = await rag_service.find_relevant_context_async(text, query_embedding=query_embedding, mode="animaguy")
+    elif is_existing_session and config.RAG_MULTI_QUERY_ENABLED:
+        # As consultas extras vêm do histórico: carrega a sessão antes da busca
+        logger.info("Buscando histórico e contexto RAG para AnimaGuy...")
+        turn["session"] = await history_task
+        turn["history"] = turn["session"]["history"]
+        context = await rag_service.find_relevant_context_multi_async(
+            _rag_queries(text, turn["session"]), mode="animaguy"
+        )
+    else:
+        # Histórico e busca RAG em paralelo
+        logger.info("Buscando contexto RAG e histórico para AnimaGuy...")
+        context, turn["session"] = await asyncio.gather(
+            rag_service.find_relevant_context_async(text, mode="animaguy"),
+            history_task
+        )
+        turn["history"] = turn["session"]["history"]
+    
+    if not context:
+        context = "Nenhum contexto adicional da base de conhecimento encontrado."
+        logger.warning("RAG não retornou contexto relevante.")
+    
+    turn["system_prompt"] = PROMPT_ANIMAGUY.format(context=context)
+    return turn
+
+
+async def _generate_answer_async(text: str, turn: Dict[str, Any]) -> str:
+    """Versão assíncrona de _generate_answer."""
+    def generate():
+        return gemini_service.generate_chat_response_async(
+            user_message=text,
+            system_prompt=turn["system_prompt"],
+            history=turn["history"]
+        )
+    
+    if turn["session"]["turn_count"] > 0:
+        return await generate()
+    
+    answer, shared = await animaguy_flight.do_async(_first_turn_key(text), generate)
+    if shared:
+        turn["use_semantic_cache"] = False
+    return answer
+
+
+async def _finish_turn_async(turn: Dict[str, Any], session_id: str, text: str, answer: str) -> None:
+    """Versão assíncrona de _finish_turn."""
+    await _save_turn_async(session_id, turn["session"], text, answer)
+    
+    if turn["use_semantic_cache"]:
+        semantic_cache.add(turn["query_embedding"], answer, rag_service.index_version)
+
+
+async def _empty_history() -> Dict[str, Any]:
+    """Histórico de uma sessão nova (evita leitura no Firestore)."""
+    return session_history.empty()
+
+
+def _save_turn(session_id: str, session: Dict[str, Any], text: str, answer: str) -> None:
+    """Acrescenta o turno (pergunta e resposta) à sessão no Firestore, sem reescrever o histórico."""
+    session_history.append(session, session_id, text, answer)
+
+
+async def _save_turn_async(session_id: str, session: Dict[str, Any], text: str, answer: str) -> None:
+    """Versão assíncrona de _save_turn."""
+    await session_history.append_async(session, session_id, text, answer)
@@ -0,0 +1,164 @@
+"""
+Handler para análise de pitches em lote.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from werkzeug.datastructures import FileStorage
+
+import config
+from services import rag_service, storage_service
+from utils import BoundedSpooledFile
+from .pitch_handler import handle_pitch_request, handle_pitch_request_async, pitch_rag_queries
+
+logger = logging.getLogger(__name__)
+
+def handle_pitch_batch_request(items: List[Dict[str, Any]], concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Processa uma lista de pitches com concorrência limitada.
+    
+    Args:
+        items: Lista de itens {'text': str opcional, 'audio_uri': 'gs://...' opcional}
+        concurrency: Análises simultâneas (limitada por config.BATCH_MAX_CONCURRENCY)
+    
+    Returns:
+        Dict: 'results' por item (na ordem de entrada) e 'summary' com tempos agregados
+    """
+    concurrency = _resolve_concurrency(concurrency, len(items))
+    logger.info(f"Processando batch de {len(items)} pitches (concorrência {concurrency})")
+    
+    start_time = time.monotonic()
+    _prefetch_embeddings(items)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pitch-batch") as executor:
+        results = list(executor.map(_process_item, range(len(items)), items))
+    
+    return _build_response(results, concurrency, start_time)
+
+
+async def handle_pitch_batch_request_async(items: List[Dict[str, Any]], concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Versão assíncrona de handle_pitch_batch_request (limitada por semáforo).
+    
+    Args:
+        items: Lista de itens {'text': str opcional, 'audio_uri': 'gs://...' opcional}
+        concurrency: Análises simultâneas (limitada por config.BATCH_MAX_CONCURRENCY)
+    
+    Returns:
+        Dict: 'results' por item (na ordem de entrada) e 'summary' com tempos agregados
+    """
+    concurrency = _resolve_concurrency(concurrency, len(items))
+    logger.info(f"Processando batch de {len(items)} pitches (concorrência {concurrency})")
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def process(position: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            item_start = time.monotonic()
+            audio_file = None
+            try:
+                if item.get('audio_uri'):
+                    audio_file = await asyncio.to_thread(_load_audio, item['audio_uri'])
+                result = await handle_pitch_request_async(text=item.get('text'), audio_file=audio_file)
+                return _item_result(position, item_start, result=result)
+            except Exception as e:
+                logger.error(f"Erro no item {position} do batch: {e}")
+                return _item_result(position, item_start, error=e)
+            finally:
+                if audio_file is not None:
+                    audio_file.stream.close()
+    
+    start_time = time.monotonic()
+    await asyncio.to_thread(_prefetch_embeddings, items)
+    results = await asyncio.gather(*(process(i, item) for i, item in enumerate(items)))
+    
+    return _build_response(list(results), concurrency, start_time)
+
+
+def _resolve_concurrency(concurrency: Optional[int], total_items: int) -> int:
+    """Aplica o padrão e os limites de concorrência configurados."""
+    concurrency = concurrency or config.BATCH_DEFAULT_CONCURRENCY
+    return max(1, min(concurrency, config.BATCH_MAX_CONCURRENCY, total_items))
+
+
+def _prefetch_embeddings(items: List[Dict[str, Any]]) -> None:
+    """Gera em uma chamada os embeddings das consultas RAG de todos os pitches do batch."""
+    if not rag_service.is_available():
+        return
+    queries = [query for item in items for query in pitch_rag_queries(item.get('text'))]
+    rag_service.prefetch_embeddings(queries)
+
+
+def _load_audio(audio_uri: str) -> FileStorage:
+    """Baixa o áudio referenciado no GCS para um arquivo spooled e o expõe como um arquivo enviado."""
+    # Só lê do bucket/prefixo configurado: a URI vem de uma requisição não autenticada
+    if config.BATCH_AUDIO_URI_PREFIX is None:
+        raise ValueError("Áudio por 'audio_uri' não está habilitado (BATCH_AUDIO_BUCKET).")
+    
+    spooled = BoundedSpooledFile(max_bytes=config.AUDIO_MAX_BYTES, max_memory=config.UPLOAD_SPOOL_MAX_MEMORY)
+    try:
+        storage_service.download_to_file(audio_uri, spooled, allowed_prefix=config.BATCH_AUDIO_URI_PREFIX)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return FileStorage(stream=spooled, filename=audio_uri.rsplit('/', 1)[-1])
+
+
+def _process_item(position: int, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Processa um item do batch, capturando erros individualmente."""
+    item_start = time.monotonic()
+    audio_file = None
+    try:
+        audio_file = _load_audio(item['audio_uri']) if item.get('audio_uri') else None
+        result = handle_pitch_request(text=item.get('text'), audio_file=audio_file)
+        return _item_result(position, item_start, result=result)
+    except Exception as e:
+        logger.error(f"Erro no item {position} do batch: {e}")
+        return _item_result(position, item_start, error=e)
+    finally:
+        if audio_file is not None:
+            audio_file.stream.close()
+
+
+def _item_result(
+    position: int,
+    item_start: float,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[Exception] = None
+) -> Dict[str, Any]:
+    """Monta o resultado individual de um item."""
+    item_result = {
+        "index": position,
+        "status": "ok" if error is None else "error",
+        "elapsed_ms": round((time.monotonic() - item_start) * 1000, 1)
+    }
+    if error is None:
+        item_result["result"] = result
+    else:
+        item_result["error"] = str(error)
+    return item_result
+
+
+def _build_response(results: List[Dict[str, Any]], concurrency: int, start_time: float) -> Dict[str, Any]:
+    """Monta a resposta do batch com o resumo de tempos."""
+    elapsed_ms = (time.monotonic() - start_time) * 1000
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    item_times = [r["elapsed_ms"] for r in results]
+    
+    logger.info(f"Batch concluído: {succeeded}/{len(results)} com sucesso em {elapsed_ms:.0f}ms")
+    
+    return {
+        "results": results,
+        "summary": {
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "concurrency": concurrency,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "avg_item_ms": round(sum(item_times) / len(item_times), 1) if item_times else 0.0,
+            "max_item_ms": max(item_times) if item_times else 0.0
+        }
+    }
@@ -0,0 +1,209 @@
+"""
+Handler para análises de pitch assíncronas (job + polling ou callback).
+
+A requisição apenas registra o job e o coloca em um pool limitado de workers;
+o cliente consulta GET /jobs/<id> ou recebe o resultado na callback_url.
+Assim análises longas de áudio não ocupam as threads HTTP do servidor.
+No encerramento da instância, os jobs ainda na fila ou em execução são
+marcados como ERROR, para que o cliente reenvie o pitch em vez de aguardar.
+"""
+
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from werkzeug.datastructures import FileStorage
+
+import config
+from utils import (
+    firestore_client,
+    pitch_job_writer,
+    copy_to_spooled_file,
+    validate_callback_url,
+    public_http_session
+)
+from .pitch_handler import handle_pitch_request
+
+logger = logging.getLogger(__name__)
+
+# Campos do documento do job expostos no endpoint de consulta
+JOB_PUBLIC_FIELDS = ('status', 'result', 'error')
+
+_executor = ThreadPoolExecutor(max_workers=config.PITCH_ASYNC_WORKERS, thread_name_prefix="pitch-job")
+_slots = threading.BoundedSemaphore(config.PITCH_ASYNC_WORKERS + config.PITCH_ASYNC_MAX_QUEUED)
+
+# Jobs na fila ou em execução (marcados como ERROR no encerramento)
+_unfinished_jobs = set()
+_jobs_lock = threading.RLock()  # Reentrante: o gancho pode rodar no handler de SIGTERM da thread principal
+_shutting_down = threading.Event()
+
+JOB_INTERRUPTED_ERROR = "A instância foi encerrada antes da conclusão da análise. Envie o pitch novamente."
+
+
+class JobQueueFullError(RuntimeError):
+    """Levantada quando não há vaga no pool de análises assíncronas."""
+
+
+def submit_pitch_job(
+    text: Optional[str] = None,
+    audio_file: Optional[FileStorage] = None,
+    callback_url: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Registra uma análise de pitch para execução em segundo plano.
+    
+    Args:
+        text: Texto do pitch (opcional)
+        audio_file: Arquivo de áudio do pitch (opcional)
+        callback_url: URL que receberá o resultado via POST (opcional)
+    
+    Returns:
+        Dict: 'job_id' e 'status' ('QUEUED')
+    
+    Raises:
+        JobQueueFullError: Se o pool e a fila de espera estiverem cheios
+    """
+    if _shutting_down.is_set():
+        raise JobQueueFullError("Instância em encerramento. Tente novamente em instantes.")
+    if not _slots.acquire(blocking=False):
+        raise JobQueueFullError("Fila de análises assíncronas cheia. Tente novamente em instantes.")
+    
+    try:
+        job_id = str(uuid.uuid4())
+        
+        # O stream do upload é fechado ao fim da requisição: copia o áudio em blocos
+        detached_audio = None
+        if audio_file:
+            detached_audio = FileStorage(stream=copy_to_spooled_file(audio_file.stream), filename=audio_file.filename)
+        
+        pitch_job_writer.create(job_id, {
+            "status": "QUEUED",
+            "has_audio": detached_audio is not None,
+            "has_text": bool(text),
+            "has_callback": bool(callback_url)
+        })
+        with _jobs_lock:
+            _unfinished_jobs.add(job_id)
+        _executor.submit(_run_job, job_id, text, detached_audio, callback_url)
+    
+    except Exception:
+        with _jobs_lock:
+            _unfinished_jobs.discard(job_id)
+        _slots.release()
+        raise
+    
+    logger.info(f"Pitch {job_id} enfileirado para análise assíncrona")
+    return {"job_id": job_id, "status": "QUEUED"}
+
+
+def get_pitch_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Consulta o estado de um job de pitch.
+    
+    Args:
+        job_id: ID do job
+    
+    Returns:
+        Dict: 'job_id', 'status' e, quando concluído, 'result' ou 'error'; None se não existir
+    """
+    return _build_status(job_id, firestore_client.get_pitch_job(job_id))
+
+
+async def get_pitch_job_status_async(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Versão assíncrona de get_pitch_job_status.
+    
+    Args:
+        job_id: ID do job
+    
+    Returns:
+        Dict: 'job_id', 'status' e, quando concluído, 'result' ou 'error'; None se não existir
+    """
+    return _build_status(job_id, await firestore_client.get_pitch_job_async(job_id))
+
+
+def _build_status(job_id: str, stored: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Combina o documento gravado com as escritas ainda pendentes do job."""
+    job = stored or {}
+    pending = pitch_job_writer.get_pending(job_id)
+    if pending:
+        job.update(pending)
+    
+    if not job:
+        return None
+    
+    status = {"job_id": job_id}
+    status.update({field: job[field] for field in JOB_PUBLIC_FIELDS if field in job})
+    return status
+
+
+def fail_unfinished_jobs() -> None:
+    """
+    Marca como ERROR os jobs na fila ou em execução (gancho de encerramento).
+    
+    Jobs na fila são cancelados e novas submissões são recusadas. Jobs em
+    execução que concluírem durante a drenagem sobrescrevem o ERROR com o
+    status final.
+    """
+    _shutting_down.set()
+    _executor.shutdown(wait=False, cancel_futures=True)
+    
+    with _jobs_lock:
+        unfinished = list(_unfinished_jobs)
+        for job_id in unfinished:
+            pitch_job_writer.update(job_id, {"status": "ERROR", "error": JOB_INTERRUPTED_ERROR})
+    
+    if unfinished:
+        logger.warning(f"{len(unfinished)} jobs de pitch interrompidos pelo encerramento marcados como ERROR")
+
+
+def _run_job(job_id: str, text: Optional[str], audio_file: Optional[FileStorage], callback_url: Optional[str]) -> None:
+    """Executa a análise no pool e notifica a callback_url, se houver."""
+    try:
+        result = handle_pitch_request(text=text, audio_file=audio_file, job_id=job_id)
+        payload = {"job_id": job_id, "status": "COMPLETE", "result": result}
+    
+    except Exception as e:
+        payload = {"job_id": job_id, "status": "ERROR", "error": str(e)}
+    
+    finally:
+        _slots.release()
+        if audio_file:
+            audio_file.close()
+    
+    # Grava o status final mesmo que o handler já o tenha gravado: o encerramento
+    # pode ter marcado o job como interrompido enquanto ele concluía
+    with _jobs_lock:
+        _unfinished_jobs.discard(job_id)
+        pitch_job_writer.update(job_id, {field: payload[field] for field in JOB_PUBLIC_FIELDS if field in payload})
+    
+    if callback_url:
+        _send_callback(callback_url, payload)
+
+
+def _send_callback(callback_url: str, payload: Dict[str, Any]) -> None:
+    """Envia o resultado do job para a callback_url (falhas são apenas registradas)."""
+    try:
+        # Revalida na hora do envio: o DNS pode ter mudado desde a submissão do job
+        is_valid, error_msg = validate_callback_url(callback_url, config.PITCH_CALLBACK_ALLOWED_HOSTS)
+        if not is_valid:
+            raise ValueError(error_msg)
+        
+        # A sessão recusa a conexão se o DNS mudar para um endereço não público após a validação
+        with public_http_session() as session:
+            response = session.post(
+                callback_url,
+                json=payload,
+                timeout=config.PITCH_CALLBACK_TIMEOUT,
+                allow_redirects=False
+            )
+        if response.is_redirect:
+            raise ValueError(f"Redirecionamento não permitido na callback_url ({response.status_code})")
+        response.raise_for_status()
+        logger.info(f"Callback do job {payload['job_id']} enviado ({response.status_code})")
+    
+    except Exception as e:
+        logger.error(f"Erro ao enviar callback do job {payload['job_id']}: {e}")
+        pitch_job_writer.update(payload['job_id'], {"callback_error": str(e)})
@@ -2,31 +2,41 @@
 Handler para requisições do modo Pitch.
 """
 
+import asyncio
 import logging
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from werkzeug.datastructures import FileStorage
 
-from services import rag_service, gemini_service
-from utils import firestore_client, get_audio_mime_type
+import config
+from services import rag_service, gemini_service, pitch_cache
+from utils import pitch_job_writer, pitch_flight, get_audio_mime_type, hash_stream, prepare_audio
 from models import PROMPT_PITCH_INSTRUCTION
 
 logger = logging.getLogger(__name__)
 
-def handle_pitch_request(text: Optional[str] = None, audio_file: Optional[FileStorage] = None) -> Dict[str, Any]:
+def handle_pitch_request(
+    text: Optional[str] = None,
+    audio_file: Optional[FileStorage] = None,
+    job_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Processa uma requisição do modo Pitch.
     
     Args:
         text: Texto do pitch (opcional)
         audio_file: Arquivo de áudio do pitch (opcional)
+        job_id: ID do job de tracking (opcional, gerado se None)
         
     Returns:
         Dict: Resposta com análise dos investidores e transcrição (se houver áudio)
     """
-    job_id = str(uuid.uuid4())
+    job_id = job_id or str(uuid.uuid4())
     logger.info(f"Processando pitch {job_id}")
     
+    # Registra o job para tracking antes de qualquer consulta ao cache (gravado em segundo plano)
+    pitch_job_writer.create(job_id, {"has_audio": audio_file is not None, "has_text": bool(text)})
+    
     try:
         # 1. Monta o conteúdo do pitch
         pitch_content = ""
@@ -35,83 +45,234 @@ def handle_pitch_request(text: Optional[str] = None, audio_file: Optional[FileSt
             pitch_content = f"Texto do pitch:\n{text}"
             logger.info(f"Pitch com texto ({len(text)} chars)")
         
-        # 2. Busca contexto relevante no RAG
-        query_for_rag = text if text else "dicas de pitch para investidores"
-        logger.info("Buscando contexto RAG para Pitch...")
-        context = rag_service.find_relevant_context(query_for_rag)
+        audio_digest, audio_size = None, 0
+        if audio_file:
+            # Hash do áudio em blocos (sem carregar o arquivo inteiro em memória)
+            audio_digest, audio_size = hash_stream(audio_file.stream)
         
-        if not context:
-            context = "Analise o pitch com base em suas melhores práticas de avaliação de negócios."
-            logger.warning("RAG não retornou contexto relevante.")
+        # Verifica se o mesmo pitch já foi analisado (reenvios após erros de rede)
+        cache_key = pitch_cache.build_key(audio_digest=audio_digest, text=text)
+        pitch_job_writer.update(job_id, {"cache_key": cache_key})
+        cached_result = pitch_cache.get(cache_key)
+        if cached_result is not None:
+            logger.info(f"Pitch {job_id} servido do cache de resultados")
+            pitch_job_writer.update(job_id, {"status": "COMPLETE", "result": cached_result})
+            return cached_result
         
-        # 3. Processa com áudio ou texto
-        if audio_file:
-            logger.info(f"Pitch com áudio: {audio_file.filename}")
-            
-            # Lê o arquivo de áudio
-            audio_file.seek(0)
-            audio_data = audio_file.read()
-            audio_mime_type = get_audio_mime_type(audio_file.filename)
-            
-            logger.info(f"Áudio: {len(audio_data)} bytes, tipo: {audio_mime_type}")
-            
-            # Monta o prompt com contexto RAG
-            prompt = PROMPT_PITCH_INSTRUCTION.format(
-                context=context,
-                pitch_content="(Áudio do pitch anexado)"
+        # Pitches idênticos simultâneos compartilham uma única análise
+        result, shared = pitch_flight.do(
+            cache_key,
+            lambda: _analyze_pitch(job_id, text, pitch_content, audio_file, audio_size, cache_key)
+        )
+        if shared:
+            logger.info(f"Pitch {job_id} compartilhou a análise de uma requisição idêntica")
+        else:
+            logger.info(f"Pitch {job_id} processado com sucesso")
+        pitch_job_writer.update(job_id, {"status": "COMPLETE", "result": result})
+        return result
+        
+    except Exception as e:
+        logger.error(f"Erro ao processar pitch {job_id}: {e}", exc_info=True)
+        pitch_job_writer.update(job_id, {"status": "ERROR", "error": str(e)})
+        raise
+
+
+def _analyze_pitch(
+    job_id: str,
+    text: Optional[str],
+    pitch_content: str,
+    audio_file: Optional[FileStorage],
+    audio_size: int,
+    cache_key: str
+) -> Dict[str, Any]:
+    """Busca o contexto RAG, analisa o pitch com Gemini e armazena o resultado no cache."""
+    # 2. Busca contexto relevante no RAG
+    logger.info("Buscando contexto RAG para Pitch...")
+    context = rag_service.find_relevant_context_multi(pitch_rag_queries(text), mode="pitch")
+    
+    if not context:
+        context = "Analise o pitch com base em suas melhores práticas de avaliação de negócios."
+        logger.warning("RAG não retornou contexto relevante.")
+    
+    # 3. Processa com áudio ou texto
+    if audio_file:
+        logger.info(f"Pitch com áudio: {audio_file.filename}")
+        
+        # Detecta o formato real e normaliza para voz (AUDIO_NORMALIZATION_ENABLED)
+        audio = prepare_audio(audio_file.stream, get_audio_mime_type(audio_file.filename))
+        
+        logger.info(f"Áudio: {audio.size} bytes (recebido: {audio_size}), tipo: {audio.mime_type}")
+        
+        # Monta o prompt com contexto RAG
+        prompt = PROMPT_PITCH_INSTRUCTION.format(
+            context=context,
+            pitch_content="(Áudio do pitch anexado)"
+        )
+        
+        # Envia o áudio à File API a partir do arquivo spooled e analisa pela referência
+        try:
+            uploaded_audio = gemini_service.upload_audio(
+                audio.stream, audio.mime_type, display_name=job_id, path=audio.path
             )
-            
-            # Cria job no Firestore (opcional, para tracking)
-            firestore_client.create_pitch_job(job_id, {
-                "has_audio": True,
-                "has_text": bool(text)
-            })
-            
-            # Analisa com Gemini (processamento nativo de áudio)
+        finally:
+            audio.close()
+        try:
             result = gemini_service.analyze_pitch_with_audio(
                 prompt=prompt,
-                audio_data=audio_data,
-                audio_mime_type=audio_mime_type
+                audio_file=uploaded_audio
             )
-            
-            # Adiciona campo de transcrição vazio (Gemini processa internamente)
-            result["transcription_text"] = ""
-            
-            # Atualiza job como completo
-            firestore_client.update_pitch_job(job_id, {"status": "COMPLETE", "result": result})
-            
+        finally:
+            gemini_service.delete_file(uploaded_audio)
+        
+        # Adiciona campo de transcrição vazio (Gemini processa internamente)
+        result["transcription_text"] = ""
+        
+    else:
+        # Apenas texto
+        logger.info("Pitch apenas com texto")
+        
+        # Monta o prompt com contexto RAG
+        prompt = PROMPT_PITCH_INSTRUCTION.format(
+            context=context,
+            pitch_content=pitch_content
+        )
+        
+        # Analisa com Gemini
+        result = gemini_service.analyze_pitch_with_text(
+            prompt=prompt,
+            pitch_text=text
+        )
+        
+        # Adiciona campo de transcrição vazio
+        result["transcription_text"] = ""
+    
+    pitch_cache.set(cache_key, result)
+    return result
+
+
+async def handle_pitch_request_async(
+    text: Optional[str] = None,
+    audio_file: Optional[FileStorage] = None,
+    job_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Versão assíncrona de handle_pitch_request.
+    
+    Args:
+        text: Texto do pitch (opcional)
+        audio_file: Arquivo de áudio do pitch (opcional)
+        job_id: ID do job de tracking (opcional, gerado se None)
+        
+    Returns:
+        Dict: Resposta com análise dos investidores e transcrição (se houver áudio)
+    """
+    job_id = job_id or str(uuid.uuid4())
+    logger.info(f"Processando pitch {job_id}")
+    
+    # Registra o job para tracking antes de qualquer consulta ao cache (gravado em segundo plano)
+    pitch_job_writer.create(job_id, {"has_audio": audio_file is not None, "has_text": bool(text)})
+    
+    try:
+        audio_digest, audio_size = None, 0
+        if audio_file:
+            # Leitura em blocos do arquivo spooled (pode estar em disco)
+            audio_digest, audio_size = await asyncio.to_thread(hash_stream, audio_file.stream)
+        
+        # Verifica se o mesmo pitch já foi analisado (o nível persistente faz I/O bloqueante)
+        cache_key = pitch_cache.build_key(audio_digest=audio_digest, text=text)
+        pitch_job_writer.update(job_id, {"cache_key": cache_key})
+        cached_result = await asyncio.to_thread(pitch_cache.get, cache_key)
+        if cached_result is not None:
+            logger.info(f"Pitch {job_id} servido do cache de resultados")
+            pitch_job_writer.update(job_id, {"status": "COMPLETE", "result": cached_result})
+            return cached_result
+        
+        # Pitches idênticos simultâneos compartilham uma única análise
+        result, shared = await pitch_flight.do_async(
+            cache_key,
+            lambda: _analyze_pitch_async(job_id, text, audio_file, audio_size, cache_key)
+        )
+        if shared:
+            logger.info(f"Pitch {job_id} compartilhou a análise de uma requisição idêntica")
         else:
-            # Apenas texto
-            logger.info("Pitch apenas com texto")
-            
-            # Monta o prompt com contexto RAG
-            prompt = PROMPT_PITCH_INSTRUCTION.format(
-                context=context,
-                pitch_content=pitch_content
-            )
-            
-            # Cria job no Firestore
-            firestore_client.create_pitch_job(job_id, {
-                "has_audio": False,
-                "has_text": True
-            })
-            
-            # Analisa com Gemini
-            result = gemini_service.analyze_pitch_with_text(
-                prompt=prompt,
-                pitch_text=text
-            )
-            
-            # Adiciona campo de transcrição vazio
-            result["transcription_text"] = ""
-            
-            # Atualiza job como completo
-            firestore_client.update_pitch_job(job_id, {"status": "COMPLETE", "result": result})
-        
-        logger.info(f"Pitch {job_id} processado com sucesso")
+            logger.info(f"Pitch {job_id} processado com sucesso")
+        pitch_job_writer.update(job_id, {"status": "COMPLETE", "result": result})
         return result
         
     except Exception as e:
         logger.error(f"Erro ao processar pitch {job_id}: {e}", exc_info=True)
-        firestore_client.update_pitch_job(job_id, {"status": "ERROR", "error": str(e)})
+        pitch_job_writer.update(job_id, {"status": "ERROR", "error": str(e)})
         raise
+
+
+async def _analyze_pitch_async(
+    job_id: str,
+    text: Optional[str],
+    audio_file: Optional[FileStorage],
+    audio_size: int,
+    cache_key: str
+) -> Dict[str, Any]:
+    """Versão assíncrona de _analyze_pitch."""
+    # 1. Busca contexto RAG
+    logger.info("Buscando contexto RAG para Pitch...")
+    context = await rag_service.find_relevant_context_multi_async(pitch_rag_queries(text), mode="pitch")
+    
+    if not context:
+        context = "Analise o pitch com base em suas melhores práticas de avaliação de negócios."
+        logger.warning("RAG não retornou contexto relevante.")
+    
+    # 2. Analisa com Gemini (áudio nativo ou texto)
+    if audio_file:
+        audio = await asyncio.to_thread(
+            prepare_audio, audio_file.stream, get_audio_mime_type(audio_file.filename)
+        )
+        logger.info(f"Áudio: {audio.size} bytes (recebido: {audio_size}), tipo: {audio.mime_type}")
+        
+        prompt = PROMPT_PITCH_INSTRUCTION.format(
+            context=context,
+            pitch_content="(Áudio do pitch anexado)"
+        )
+        try:
+            uploaded_audio = await gemini_service.upload_audio_async(
+                audio.stream, audio.mime_type, display_name=job_id, path=audio.path
+            )
+        finally:
+            audio.close()
+        try:
+            result = await gemini_service.analyze_pitch_with_audio_async(
+                prompt=prompt,
+                audio_file=uploaded_audio
+            )
+        finally:
+            await gemini_service.delete_file_async(uploaded_audio)
+    else:
+        prompt = PROMPT_PITCH_INSTRUCTION.format(
+            context=context,
+            pitch_content=f"Texto do pitch:\n{text}"
+        )
+        result = await gemini_service.analyze_pitch_with_text_async(
+            prompt=prompt,
+            pitch_text=text
+        )
+    
+    result["transcription_text"] = ""
+    
+    pitch_cache.set(cache_key, result)
+    return result
+
+
+def pitch_rag_queries(text: Optional[str]) -> List[str]:
+    """
+    Consultas RAG de um pitch: o texto e suas frases-chave, ou a consulta fixa dos pitches só com áudio.
+    
+    Args:
+        text: Texto do pitch (opcional)
+    
+    Returns:
+        List[str]: Consultas, da principal para as complementares
+    """
+    if not text:
+        return [config.RAG_PITCH_AUDIO_QUERY]
+    if not config.RAG_MULTI_QUERY_ENABLED:
+        return [text]
+    return [text] + rag_service.key_phrases(text)
@@ -9,13 +9,54 @@ Serviço monolítico com:
 """
 
 import logging
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from werkzeug.exceptions import RequestEntityTooLarge
 
 import config
-from services import rag_service, storage_service
-from handlers import handle_animaguy_request, handle_pitch_request
-from utils import validate_mode, validate_animaguy_request, validate_pitch_request
+from services import (
+    rag_service,
+    context_assembler,
+    storage_service,
+    gemini_service,
+    semantic_cache,
+    pitch_cache,
+    index_refresher,
+    session_history,
+    gemini_policy,
+    GeminiUnavailableError
+)
+from handlers import (
+    handle_animaguy_request,
+    handle_pitch_request,
+    handle_pitch_batch_request,
+    stream_animaguy_request,
+    submit_pitch_job,
+    get_pitch_job_status,
+    fail_unfinished_jobs,
+    JobQueueFullError
+)
+from utils import (
+    session_cache,
+    pitch_job_writer,
+    register_shutdown_hook,
+    embedding_flight,
+    pitch_flight,
+    animaguy_flight,
+    SpooledRequest,
+    validate_mode,
+    validate_animaguy_request,
+    validate_pitch_request,
+    validate_pitch_batch_request,
+    validate_callback_url,
+    format_sse_event,
+    SSE_HEADERS,
+    metrics,
+    METRICS_CONTENT_TYPE,
+    REQUESTS_TOTAL,
+    REQUESTS_IN_FLIGHT,
+    REQUEST_SECONDS
+)
 
 # Configuração de logging
 logging.basicConfig(
@@ -27,6 +68,8 @@ logger = logging.getLogger(__name__)
 # Cria aplicação Flask
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 26 * 1024 * 1024  # 26MB máximo
+# Uploads vão para arquivos spooled e são recusados ao exceder AUDIO_MAX_BYTES
+app.request_class = SpooledRequest
 
 # Variável global para indicar se a inicialização foi bem-sucedida
 initialization_successful = False
@@ -52,13 +95,32 @@ def initialize_services():
             
             # Carrega índice RAG em memória
             logger.info("Carregando índice RAG em memória...")
-            if rag_service.load_index():
+            if rag_service.load_index(artifact_version=storage_service.rag_artifact_version):
                 logger.info("✓ Índice RAG carregado e pronto")
+                
+                # Embeddings em lote e contextos das consultas frequentes
+                if config.RAG_WARMUP_ENABLED:
+                    warmup = rag_service.warmup(config.RAG_WARMUP_QUERIES)
+                    logger.info(f"✓ Warmup do RAG concluído em {warmup['seconds']}s ({warmup['contexts']} contextos)")
             else:
                 logger.warning("⚠ RAG não disponível - serviço continuará sem contexto da base de conhecimento")
         else:
             logger.warning("⚠ Falha ao baixar arquivos RAG - serviço continuará sem RAG")
         
+        # Atualização do índice em segundo plano (RAG_REFRESH_INTERVAL > 0)
+        if index_refresher.start():
+            logger.info("✓ Atualização automática do índice RAG iniciada")
+        
+        # Gravação adiada das sessões do AnimaGuy (SESSION_CACHE_ENABLED)
+        if session_cache.start():
+            logger.info("✓ Cache de sessões com gravação adiada iniciado")
+        
+        # Tracking de jobs de pitch gravado em lote fora do caminho da requisição
+        pitch_job_writer.start()
+        
+        # Jobs assíncronos interrompidos pelo encerramento da instância viram ERROR
+        register_shutdown_hook("pitch_jobs", fail_unfinished_jobs)
+        
         initialization_successful = True
         logger.info("=" * 60)
         logger.info("✓ Inicialização concluída com sucesso!")
@@ -74,15 +136,138 @@ def initialize_services():
 # Inicializa serviços na startup
 initialize_services()
 
-@app.route("/health", methods=["GET"])
-def health_check():
-    """Endpoint de health check."""
+def register_metric_collectors():
+    """Expõe em /metrics as estatísticas que os serviços já mantêm (lidas na coleta)."""
+    caches = {
+        "embedding": rag_service.embedding_cache.stats,
+        "semantic": semantic_cache.stats,
+        "pitch": pitch_cache.stats,
+        "session": session_cache.stats
+    }
+    flights = {"embeddings": embedding_flight, "pitch": pitch_flight, "animaguy": animaguy_flight}
+    
+    def cache_samples():
+        samples = []
+        for name, get_stats in caches.items():
+            stats = get_stats()
+            samples.append(({"cache": name, "result": "hit"}, stats["hits"]))
+            samples.append(({"cache": name, "result": "miss"}, stats["misses"]))
+        return samples
+    
+    def flight_samples():
+        samples = []
+        for name, flight in flights.items():
+            samples.append(({"group": name, "result": "executed"}, flight.executed))
+            samples.append(({"group": name, "result": "shared"}, flight.shared))
+        return samples
+    
+    metrics.register_collector("cache_requests_total", "Consultas aos caches por resultado.", "counter", cache_samples)
+    metrics.register_collector(
+        "rag_warm_hits_total", "Consultas servidas pela tabela de warmup.", "counter",
+        lambda: [({}, rag_service.warm_hits)]
+    )
+    metrics.register_collector(
+        "rag_lexical_fallbacks_total", "Buscas RAG feitas só com o índice lexical.", "counter",
+        lambda: [({}, rag_service.lexical_fallbacks)]
+    )
+    metrics.register_collector(
+        "rag_context_tokens_saved_total", "Tokens economizados na montagem do contexto RAG.", "counter",
+        lambda: [({}, context_assembler.stats()["tokens_saved"])]
+    )
+    metrics.register_collector(
+        "single_flight_calls_total", "Chamadas executadas e compartilhadas por grupo de single-flight.", "counter",
+        flight_samples
+    )
+    metrics.register_collector(
+        "gemini_calls_in_flight", "Chamadas ao Gemini em andamento por classe de chamada.", "gauge",
+        lambda: [
+            ({"call_class": call_class}, count)
+            for call_class, count in gemini_policy.stats()["in_flight"].items()
+        ]
+    )
+    metrics.register_collector(
+        "gemini_call_events_total", "Tentativas, falhas e recusas da política de chamadas ao Gemini.", "counter",
+        lambda: [
+            ({"event": event}, gemini_policy.stats()[event])
+            for event in ("calls", "retries", "failures", "rejected_open", "rejected_busy", "circuit_opens")
+        ]
+    )
+    metrics.register_collector(
+        "gemini_circuit_open", "1 se o circuito do Gemini não estiver fechado.", "gauge",
+        lambda: [({}, 0 if gemini_policy.stats()["circuit_state"] == "closed" else 1)]
+    )
+
+register_metric_collectors()
+
+def request_metrics_endpoint(url_rule) -> str:
+    """Rótulo do endpoint nas métricas: a rota (ex: '/jobs/<job_id>'), para não gerar um rótulo por URL."""
+    return url_rule.rule if url_rule is not None else "unmatched"
+
+@app.before_request
+def start_request_metrics():
+    """Conta a requisição como em andamento e marca o início."""
+    g.metrics_endpoint = request_metrics_endpoint(request.url_rule)
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc(g.metrics_endpoint)
+
+@app.after_request
+def count_request_metrics(response):
+    """Conta a requisição por endpoint e status."""
+    REQUESTS_TOTAL.inc(g.metrics_endpoint, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """Registra a duração da requisição (inclusive com erro)."""
+    # Em respostas em streaming, executa ao final do stream
+    if "metrics_start" in g:
+        REQUESTS_IN_FLIGHT.dec(g.metrics_endpoint)
+        REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_start, g.metrics_endpoint)
+
+def get_health_status():
+    """
+    Monta o payload do health check (compartilhado com o modo ASGI).
+    
+    Returns:
+        Tuple[Dict, int]: (payload, status HTTP)
+    """
     status = {
         "status": "healthy" if initialization_successful else "degraded",
         "rag_available": rag_service.is_available(),
-        "service": "llm-v3"
+        "rag_index": rag_service.load_stats,
+        "rag_refresh": index_refresher.stats(),
+        "rag_lexical_fallbacks": rag_service.lexical_fallbacks,
+        "rag_warmup": {**rag_service.warmup_stats, "hits": rag_service.warm_hits},
+        "rag_context": context_assembler.stats(),
+        "embedding_cache": rag_service.embedding_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "pitch_cache": pitch_cache.stats(),
+        "gemini": gemini_service.stats(),
+        "session_history": session_history.stats(),
+        "session_cache": session_cache.stats(),
+        "pitch_jobs": pitch_job_writer.stats(),
+        "single_flight": {
+            "embeddings": embedding_flight.stats(),
+            "pitch": pitch_flight.stats(),
+            "animaguy": animaguy_flight.stats()
+        },
+        "service": "llm-v3",
+        "serving_mode": config.SERVING_MODE
     }
-    return jsonify(status), 200 if initialization_successful else 503
+    return status, 200 if initialization_successful else 503
+
+@app.route("/health", methods=["GET"])
+def health_check():
+    """Endpoint de health check."""
+    status, status_code = get_health_status()
+    return jsonify(status), status_code
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Endpoint de métricas no formato de texto do Prometheus."""
+    if not metrics.enabled:
+        return jsonify({"error": "Métricas desativadas (METRICS_ENABLED=False)"}), 404
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
 @app.route("/process", methods=["POST"])
 def process_request():
@@ -125,6 +310,17 @@ def process_request():
             if not is_valid:
                 return jsonify({"error": error_msg}), 400
             
+            # Modo assíncrono: responde com o job_id e analisa em segundo plano
+            if request.form.get('async', '').lower() in ('true', '1'):
+                callback_url = request.form.get('callback_url')
+                is_valid, error_msg = validate_callback_url(callback_url, config.PITCH_CALLBACK_ALLOWED_HOSTS)
+                if not is_valid:
+                    return jsonify({"error": error_msg}), 400
+                
+                job = submit_pitch_job(text=text, audio_file=audio_file, callback_url=callback_url)
+                job["status_url"] = f"/jobs/{job['job_id']}"
+                return jsonify(job), 202, {"Location": job["status_url"]}
+            
             # Processa Pitch
             result = handle_pitch_request(text=text, audio_file=audio_file)
             return jsonify(result), 200
@@ -132,6 +328,14 @@ def process_request():
         else:
             return jsonify({"error": "Modo inválido."}), 400
             
+    except JobQueueFullError as e:
+        logger.warning(str(e))
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "30"}
+    
+    except GeminiUnavailableError as e:
+        logger.warning(f"Chamada ao Gemini recusada: {e}")
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    
     except RequestEntityTooLarge:
         logger.error("Requisição muito grande")
         return jsonify({"error": "Arquivo muito grande. Máximo: 25MB"}), 413
@@ -142,6 +346,69 @@ def process_request():
             "error": f"Erro interno do servidor: {str(e)}"
         }), 500
 
+@app.route("/batch/pitch", methods=["POST"])
+def process_pitch_batch():
+    """Endpoint para análise de pitches em lote com concorrência limitada."""
+    
+    if not initialization_successful:
+        return jsonify({
+            "error": "Serviço não inicializado corretamente. Verifique os logs."
+        }), 503
+    
+    payload = request.get_json(silent=True)
+    is_valid, error_msg = validate_pitch_batch_request(payload, config.BATCH_MAX_ITEMS, config.BATCH_AUDIO_URI_PREFIX)
+    if not is_valid:
+        return jsonify({"error": error_msg}), 400
+    
+    try:
+        result = handle_pitch_batch_request(payload['items'], payload.get('concurrency'))
+        return jsonify(result), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao processar batch de pitches: {e}", exc_info=True)
+        return jsonify({
+            "error": f"Erro interno do servidor: {str(e)}"
+        }), 500
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Endpoint de consulta de uma análise de pitch assíncrona."""
+    
+    job = get_pitch_job_status(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado"}), 404
+    
+    return jsonify(job), 200
+
+@app.route("/stream", methods=["POST"])
+def stream_request():
+    """Endpoint AnimaGuy com resposta em streaming (Server-Sent Events)."""
+    
+    if not initialization_successful:
+        return jsonify({
+            "error": "Serviço não inicializado corretamente. Verifique os logs."
+        }), 503
+    
+    text = request.form.get('text')
+    audio_file = request.files.get('audio_file')
+    
+    is_valid, error_msg = validate_animaguy_request(text, audio_file)
+    if not is_valid:
+        return jsonify({"error": error_msg}), 400
+    
+    session_id = request.form.get('session_id')
+    logger.info("Requisição de streaming recebida - Modo: animaguy")
+    
+    def generate():
+        for event in stream_animaguy_request(text=text, session_id=session_id):
+            yield format_sse_event(event["event"], event["data"])
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @app.errorhandler(404)
 def not_found(error):
     """Handler para 404."""
@@ -4,12 +4,22 @@ Models package - Templates e estruturas de dados.
 
 from .prompts import (
     PROMPT_ANIMAGUY,
+    PROMPT_PITCH_SYSTEM,
     PROMPT_PITCH_INSTRUCTION,
+    PROMPT_PITCH_VERSION,
+    PROMPT_HISTORY_SUMMARY,
+    HISTORY_SUMMARY_USER_MESSAGE,
+    HISTORY_SUMMARY_MODEL_MESSAGE,
     ANIMAGUY_WELCOME
 )
 
 __all__ = [
     'PROMPT_ANIMAGUY',
+    'PROMPT_PITCH_SYSTEM',
     'PROMPT_PITCH_INSTRUCTION',
+    'PROMPT_PITCH_VERSION',
+    'PROMPT_HISTORY_SUMMARY',
+    'HISTORY_SUMMARY_USER_MESSAGE',
+    'HISTORY_SUMMARY_MODEL_MESSAGE',
     'ANIMAGUY_WELCOME'
 ]
@@ -3,11 +3,24 @@ Services package - Serviços para integração com APIs externas.
 """
 
 from .rag_service import rag_service
+from .context_assembler import context_assembler
+from .gemini_policy import gemini_policy, GeminiUnavailableError
 from .gemini_service import gemini_service
 from .storage_service import storage_service
+from .semantic_cache import semantic_cache
+from .pitch_cache import pitch_cache
+from .index_refresher import index_refresher
+from .session_history import session_history
 
 __all__ = [
     'rag_service',
+    'context_assembler',
+    'gemini_policy',
+    'GeminiUnavailableError',
     'gemini_service',
-    'storage_service'
+    'storage_service',
+    'semantic_cache',
+    'pitch_cache',
+    'index_refresher',
+    'session_history'
 ]
@@ -0,0 +1,208 @@
+"""
+Montagem do contexto RAG enviado ao Gemini.
+
+Recebe os candidatos da busca (densa, lexical ou híbrida, já em excesso),
+descarta os pouco similares à consulta, remove quase duplicados com
+Maximal Marginal Relevance (MMR) sobre os vetores armazenados no índice e
+respeita um orçamento de caracteres por modo. Cada montagem registra quantos
+tokens foram economizados em relação aos RAG_TOP_K primeiros candidatos.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import faiss
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Separador entre chunks no contexto
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+class ContextAssembler:
+    """Filtro por similaridade, MMR e orçamento de caracteres para o contexto RAG."""
+    
+    def __init__(
+        self,
+        min_similarity: float,
+        mmr_lambda: float,
+        duplicate_similarity: float,
+        max_chars_by_mode: Dict[str, int],
+        default_max_chars: int,
+        chars_per_token: float
+    ):
+        """
+        Inicializa o montador.
+        
+        Args:
+            min_similarity: Similaridade de cosseno mínima entre chunk e consulta
+            mmr_lambda: Peso da relevância no MMR (1.0 = sem penalizar redundância)
+            duplicate_similarity: Similaridade a partir da qual um chunk é descartado como duplicado
+            max_chars_by_mode: Orçamento de caracteres do contexto por modo ('animaguy', 'pitch')
+            default_max_chars: Orçamento para modos sem valor próprio
+            chars_per_token: Caracteres por token usados na estimativa de economia
+        """
+        self.min_similarity = min_similarity
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_similarity = duplicate_similarity
+        self.max_chars_by_mode = max_chars_by_mode
+        self.default_max_chars = default_max_chars
+        self.chars_per_token = chars_per_token
+        self._lock = threading.Lock()
+        self.assembled = 0
+        self.below_threshold = 0
+        self.duplicates = 0
+        self.over_budget = 0
+        self.tokens_saved = 0
+    
+    def assemble(
+        self,
+        index: faiss.Index,
+        text_chunks: List[str],
+        candidate_ids: Sequence[int],
+        query_embedding: Optional[np.ndarray],
+        k: int,
+        mode: Optional[str] = None
+    ) -> str:
+        """
+        Seleciona e concatena os chunks do contexto.
+        
+        Args:
+            index: Índice FAISS (fonte dos vetores dos chunks)
+            text_chunks: Chunks de texto do índice
+            candidate_ids: Candidatos da busca, do mais para o menos relevante
+            query_embedding: Embeddings das consultas, formato (n, dim), ou None (busca só lexical)
+            k: Número máximo de chunks no contexto
+            mode: Modo da requisição (define o orçamento de caracteres)
+        
+        Returns:
+            str: Contexto montado (vazio se nenhum candidato passar no filtro)
+        """
+        candidate_ids = list(candidate_ids)
+        max_chars = self.max_chars_by_mode.get(mode, self.default_max_chars)
+        baseline_chars = len(CONTEXT_SEPARATOR.join(text_chunks[chunk_id] for chunk_id in candidate_ids[:k]))
+        
+        below_threshold = duplicates = 0
+        vectors = _reconstruct_normalized(index, candidate_ids)
+        if vectors is None:
+            # Índice sem reconstrução de vetores: mantém a ordem da busca
+            selected_ids = candidate_ids[:k]
+        else:
+            if query_embedding is not None:
+                # Com várias consultas, vale a maior similaridade entre elas
+                query_norms = np.linalg.norm(query_embedding, axis=1, keepdims=True)
+                query_norms[query_norms == 0] = 1.0
+                relevance = (vectors @ (query_embedding / query_norms).T).max(axis=1) if len(vectors) else np.zeros(0)
+                keep = relevance >= self.min_similarity
+                below_threshold = int(len(keep) - keep.sum())
+                candidate_ids = [chunk_id for chunk_id, kept in zip(candidate_ids, keep) if kept]
+                vectors, relevance = vectors[keep], relevance[keep]
+            else:
+                # Sem embedding da consulta, a relevância segue a ordem da busca lexical
+                relevance = np.linspace(1.0, 0.5, len(candidate_ids)) if candidate_ids else np.zeros(0)
+            
+            order, duplicates = self._mmr(vectors, relevance, k)
+            selected_ids = [candidate_ids[position] for position in order]
+        
+        parts: List[str] = []
+        used_chars = 0
+        over_budget = 0
+        for chunk_id in selected_ids:
+            chunk = text_chunks[chunk_id]
+            separator_chars = len(CONTEXT_SEPARATOR) if parts else 0
+            if used_chars + separator_chars + len(chunk) > max_chars:
+                if not parts:
+                    # O chunk mais relevante sozinho excede o orçamento: entra truncado
+                    parts.append(chunk[:max_chars])
+                    used_chars = len(parts[0])
+                over_budget = len(selected_ids) - len(parts)
+                break
+            parts.append(chunk)
+            used_chars += separator_chars + len(chunk)
+        
+        context = CONTEXT_SEPARATOR.join(parts)
+        tokens_saved = max(0, int((baseline_chars - len(context)) / self.chars_per_token))
+        with self._lock:
+            self.assembled += 1
+            self.below_threshold += below_threshold
+            self.duplicates += duplicates
+            self.over_budget += over_budget
+            self.tokens_saved += tokens_saved
+        
+        logger.info(
+            f"Contexto RAG ({mode or 'padrão'}): {len(parts)} de {len(candidate_ids) + below_threshold} candidatos, "
+            f"{len(context)} chars (~{int(len(context) / self.chars_per_token)} tokens); "
+            f"descartados: {below_threshold} pouco similares, {duplicates} duplicados, {over_budget} acima do orçamento; "
+            f"economia de ~{tokens_saved} tokens em relação aos {k} primeiros"
+        )
+        return context
+    
+    def _mmr(self, vectors: np.ndarray, relevance: np.ndarray, k: int):
+        """
+        Ordena os candidatos por Maximal Marginal Relevance, descartando quase duplicados.
+        
+        Returns:
+            Tuple[List[int], int]: (posições selecionadas, número de duplicados descartados)
+        """
+        remaining = list(range(len(vectors)))
+        selected: List[int] = []
+        duplicates = 0
+        while remaining and len(selected) < k:
+            if selected:
+                redundancy = (vectors[remaining] @ vectors[selected].T).max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(scores))
+            if redundancy[best] >= self.duplicate_similarity:
+                duplicates += 1
+                remaining.pop(best)
+                continue
+            selected.append(remaining.pop(best))
+        return selected, duplicates
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas das montagens de contexto.
+        
+        Returns:
+            Dict: Montagens, chunks descartados por motivo e tokens economizados
+        """
+        with self._lock:
+            return {
+                "assembled": self.assembled,
+                "below_threshold": self.below_threshold,
+                "duplicates": self.duplicates,
+                "over_budget": self.over_budget,
+                "tokens_saved": self.tokens_saved,
+                "max_chars_by_mode": self.max_chars_by_mode
+            }
+
+
+def _reconstruct_normalized(index: faiss.Index, chunk_ids: Sequence[int]) -> Optional[np.ndarray]:
+    """Recupera os vetores dos chunks no índice, normalizados (None se o índice não suportar)."""
+    if not chunk_ids:
+        return np.zeros((0, index.d), dtype=np.float32)
+    try:
+        vectors = np.vstack([index.reconstruct(int(chunk_id)) for chunk_id in chunk_ids]).astype(np.float32)
+    except RuntimeError as e:
+        logger.debug(f"Índice {type(index).__name__} não reconstrói vetores: {e}")
+        return None
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# Instância global do montador de contexto (singleton)
+context_assembler = ContextAssembler(
+    min_similarity=config.RAG_MIN_SIMILARITY,
+    mmr_lambda=config.RAG_MMR_LAMBDA,
+    duplicate_similarity=config.RAG_DUPLICATE_SIMILARITY,
+    max_chars_by_mode=config.RAG_CONTEXT_MAX_CHARS,
+    default_max_chars=config.RAG_CONTEXT_DEFAULT_MAX_CHARS,
+    chars_per_token=config.RAG_CHARS_PER_TOKEN
+)
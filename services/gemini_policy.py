@@ -0,0 +1,418 @@
+"""
+Política compartilhada das chamadas à API Gemini (geração, embeddings e File API).
+
+Todas as chamadas passam por:
+- um semáforo por classe de chamada (embeddings, geração e arquivos) que limita
+  as chamadas simultâneas, de modo que gerações longas não ocupem as vagas dos
+  embeddings (quem não consegue vaga em GEMINI_QUEUE_TIMEOUT segundos falha em
+  vez de acumular threads);
+- novas tentativas com backoff exponencial e jitter para erros transitórios
+  (429, 500, 503, 504, timeouts e falhas de conexão); chamadas longas
+  (geração e upload) passam retry_timeouts=False, pois repetir um timeout de
+  GEMINI_TIMEOUT segundos estouraria o tempo máximo da requisição;
+- um circuit breaker que, após falhas transitórias consecutivas, recusa novas
+  chamadas imediatamente por GEMINI_CIRCUIT_RESET_TIMEOUT segundos e depois
+  libera uma chamada de teste.
+Os timeouts por chamada são passados pelos chamadores em request_options.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from google.api_core import exceptions as google_exceptions
+
+import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Erros transitórios: nova tentativa com backoff e contagem no circuit breaker
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError
+)
+
+# Timeouts: transitórios, mas só repetidos em chamadas curtas (retry_timeouts=True)
+TIMEOUT_ERRORS = (
+    google_exceptions.DeadlineExceeded,
+    TimeoutError,
+    asyncio.TimeoutError
+)
+
+# Classes de chamada, cada uma com seu limite de chamadas simultâneas
+CALL_EMBED = "embed"  # Embeddings (curtos)
+CALL_GENERATE = "generate"  # Geração de conteúdo e chat (longos)
+CALL_FILE = "file"  # File API (upload, consulta e remoção) e cache de contexto
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class GeminiUnavailableError(RuntimeError):
+    """Levantada quando a chamada é recusada sem chegar ao Gemini (circuito aberto ou sem vaga)."""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GeminiCallPolicy:
+    """Semáforos por classe de chamada, novas tentativas com backoff e circuit breaker para chamadas ao Gemini."""
+    
+    def __init__(
+        self,
+        max_concurrency: Dict[str, int],
+        queue_timeout: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        failure_threshold: int,
+        reset_timeout: float
+    ):
+        """
+        Inicializa a política.
+        
+        Args:
+            max_concurrency: Máximo de chamadas simultâneas no processo por classe de chamada
+            queue_timeout: Espera máxima por uma vaga no semáforo (segundos)
+            max_retries: Novas tentativas após um erro transitório
+            backoff_base: Espera base do backoff exponencial (segundos)
+            backoff_max: Espera máxima entre tentativas (segundos)
+            failure_threshold: Falhas transitórias consecutivas que abrem o circuito
+            reset_timeout: Tempo com o circuito aberto antes da chamada de teste (segundos)
+        """
+        self.max_concurrency = {call_class: max(1, limit) for call_class, limit in max_concurrency.items()}
+        self.queue_timeout = queue_timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._semaphores = {
+            call_class: threading.BoundedSemaphore(limit) for call_class, limit in self.max_concurrency.items()
+        }
+        self._lock = threading.Lock()
+        self._state = CIRCUIT_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.in_flight = {call_class: 0 for call_class in self.max_concurrency}
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected_open = 0
+        self.rejected_busy = 0
+        self.circuit_opens = 0
+    
+    def call(
+        self,
+        fn: Callable[..., T],
+        *args,
+        call_class: str = CALL_GENERATE,
+        retry_timeouts: bool = True,
+        **kwargs
+    ) -> T:
+        """
+        Executa uma chamada síncrona ao Gemini sob a política.
+        
+        Args:
+            fn: Função do SDK a chamar
+            *args, **kwargs: Argumentos repassados à função
+            call_class: Classe da chamada (CALL_EMBED, CALL_GENERATE ou CALL_FILE), que define o semáforo
+            retry_timeouts: Se timeouts geram nova tentativa (False em chamadas longas)
+        
+        Returns:
+            O retorno da função
+        
+        Raises:
+            GeminiUnavailableError: Se o circuito estiver aberto ou não houver vaga
+        """
+        semaphore = self._semaphores[call_class]
+        attempt = 0
+        while True:
+            is_probe = self._before_call()
+            try:
+                acquired = semaphore.acquire(timeout=self.queue_timeout)
+            except BaseException:
+                self._release_probe(is_probe)
+                raise
+            if not acquired:
+                self._reject_busy(is_probe, call_class)
+            
+            try:
+                self._track_start(call_class)
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._after_failure(e, attempt, retry_timeouts)
+                if delay is None:
+                    raise
+            except BaseException:
+                self._release_probe(is_probe)
+                raise
+            else:
+                self._after_success()
+                return result
+            finally:
+                self._track_end(call_class)
+                semaphore.release()
+            
+            # Espera fora do semáforo, liberando a vaga para outras chamadas
+            time.sleep(delay)
+            attempt += 1
+    
+    async def call_async(
+        self,
+        fn: Callable[..., Awaitable[T]],
+        *args,
+        call_class: str = CALL_GENERATE,
+        timeout: Optional[float] = None,
+        retry_timeouts: bool = True,
+        **kwargs
+    ) -> T:
+        """
+        Versão assíncrona de call (compartilha os semáforos e o circuito com as chamadas síncronas).
+        
+        Args:
+            fn: Função assíncrona do SDK a chamar
+            *args, **kwargs: Argumentos repassados à função
+            call_class: Classe da chamada (CALL_EMBED, CALL_GENERATE ou CALL_FILE), que define o semáforo
+            timeout: Tempo máximo de cada tentativa (segundos, opcional)
+            retry_timeouts: Se timeouts geram nova tentativa (False em chamadas longas)
+        
+        Returns:
+            O retorno da função
+        
+        Raises:
+            GeminiUnavailableError: Se o circuito estiver aberto ou não houver vaga
+        """
+        semaphore = self._semaphores[call_class]
+        attempt = 0
+        while True:
+            is_probe = self._before_call()
+            try:
+                acquired = await self._acquire_async(semaphore)
+            except BaseException:
+                self._release_probe(is_probe)
+                raise
+            if not acquired:
+                self._reject_busy(is_probe, call_class)
+            
+            try:
+                self._track_start(call_class)
+                if timeout is not None:
+                    result = await asyncio.wait_for(fn(*args, **kwargs), timeout)
+                else:
+                    result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._after_failure(e, attempt, retry_timeouts)
+                if delay is None:
+                    raise
+            except BaseException:
+                # Cancelamento não diz nada sobre o Gemini: só libera a chamada de teste
+                self._release_probe(is_probe)
+                raise
+            else:
+                self._after_success()
+                return result
+            finally:
+                self._track_end(call_class)
+                semaphore.release()
+            
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    async def _acquire_async(self, semaphore: threading.BoundedSemaphore) -> bool:
+        """
+        Obtém uma vaga no semáforo sem bloquear o event loop.
+        
+        A espera roda em uma thread, que não pode ser interrompida: se a tarefa
+        for cancelada, a vaga obtida depois do cancelamento é devolvida.
+        
+        Args:
+            semaphore: Semáforo da classe de chamada
+        
+        Returns:
+            bool: True se obteve a vaga em queue_timeout segundos
+        """
+        # Tentativa imediata evita ocupar uma thread quando há vaga
+        if semaphore.acquire(blocking=False):
+            return True
+        
+        acquire = asyncio.ensure_future(asyncio.to_thread(semaphore.acquire, True, self.queue_timeout))
+        try:
+            return await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            acquire.add_done_callback(lambda done: self._release_abandoned_slot(semaphore, done))
+            raise
+    
+    @staticmethod
+    def _release_abandoned_slot(semaphore: threading.BoundedSemaphore, acquire: "asyncio.Future[bool]") -> None:
+        """Devolve a vaga obtida por uma espera cuja tarefa foi cancelada."""
+        if not acquire.cancelled() and acquire.exception() is None and acquire.result():
+            semaphore.release()
+    
+    def _before_call(self) -> bool:
+        """
+        Recusa a chamada se o circuito estiver aberto (ou já houver uma chamada de teste).
+        
+        Returns:
+            bool: True se esta chamada é a chamada de teste do circuito meio aberto
+        """
+        with self._lock:
+            self.calls += 1
+            if self._state == CIRCUIT_CLOSED:
+                return False
+            
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if self._state == CIRCUIT_OPEN and remaining <= 0:
+                self._state = CIRCUIT_HALF_OPEN
+                logger.info("Circuito do Gemini meio aberto: liberando chamada de teste")
+            
+            if self._state == CIRCUIT_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            
+            self.rejected_open += 1
+            retry_after = max(1, int(remaining + 0.999))
+        
+        raise GeminiUnavailableError(
+            "Serviço Gemini temporariamente indisponível. Tente novamente em instantes.",
+            retry_after=retry_after
+        )
+    
+    def _reject_busy(self, is_probe: bool, call_class: str) -> None:
+        """Recusa a chamada por falta de vaga no semáforo da classe."""
+        with self._lock:
+            self.rejected_busy += 1
+            if is_probe:
+                self._probe_in_flight = False
+        logger.warning(
+            f"Sem vaga para chamar o Gemini ({call_class}) em {self.queue_timeout}s "
+            f"({self.max_concurrency[call_class]} em andamento)"
+        )
+        raise GeminiUnavailableError(
+            "Muitas análises em andamento. Tente novamente em instantes.",
+            retry_after=max(1, int(self.queue_timeout))
+        )
+    
+    def _release_probe(self, is_probe: bool) -> None:
+        """Libera a chamada de teste interrompida sem resultado (ex: cancelamento)."""
+        if is_probe:
+            with self._lock:
+                self._probe_in_flight = False
+    
+    def _after_success(self) -> None:
+        with self._lock:
+            if self._state != CIRCUIT_CLOSED:
+                logger.info("Circuito do Gemini fechado: chamada de teste bem-sucedida")
+            self._state = CIRCUIT_CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+    
+    def _after_failure(self, error: Exception, attempt: int, retry_timeouts: bool = True) -> Optional[float]:
+        """
+        Registra a falha e decide se haverá nova tentativa.
+        
+        Args:
+            error: Erro da tentativa
+            attempt: Número da tentativa (a partir de 0)
+            retry_timeouts: Se timeouts geram nova tentativa
+        
+        Returns:
+            float: Espera antes da nova tentativa, ou None para propagar o erro
+        """
+        retryable = isinstance(error, RETRYABLE_ERRORS)
+        with self._lock:
+            self.failures += 1
+            was_probe = self._probe_in_flight
+            self._probe_in_flight = False
+            
+            if not retryable:
+                # Erros do cliente (ex: 400) não indicam degradação do serviço
+                return None
+            
+            self._consecutive_failures += 1
+            if was_probe or self._consecutive_failures >= self.failure_threshold:
+                if self._state != CIRCUIT_OPEN:
+                    self.circuit_opens += 1
+                    logger.error(
+                        f"Circuito do Gemini aberto por {self.reset_timeout}s após "
+                        f"{self._consecutive_failures} falhas transitórias: {error}"
+                    )
+                self._state = CIRCUIT_OPEN
+                self._opened_at = time.monotonic()
+                return None
+            
+            if attempt >= self.max_retries:
+                return None
+            
+            if not retry_timeouts and isinstance(error, TIMEOUT_ERRORS):
+                # A tentativa já consumiu o timeout inteiro: repetir estouraria o prazo da requisição
+                return None
+            
+            self.retries += 1
+        
+        # Backoff exponencial com jitter completo
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        logger.warning(
+            f"Erro transitório do Gemini ({type(error).__name__}); "
+            f"tentativa {attempt + 2} de {self.max_retries + 1} em {delay:.2f}s"
+        )
+        return delay
+    
+    def _track_start(self, call_class: str) -> None:
+        with self._lock:
+            self.in_flight[call_class] += 1
+    
+    def _track_end(self, call_class: str) -> None:
+        with self._lock:
+            self.in_flight[call_class] -= 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da política de chamadas.
+        
+        Returns:
+            Dict: Estado do circuito, chamadas em andamento e limites por classe, tentativas e recusas
+        """
+        with self._lock:
+            return {
+                "circuit_state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "in_flight": dict(self.in_flight),
+                "max_concurrency": dict(self.max_concurrency),
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "rejected_open": self.rejected_open,
+                "rejected_busy": self.rejected_busy,
+                "circuit_opens": self.circuit_opens
+            }
+
+
+# Instância global da política de chamadas ao Gemini (singleton)
+gemini_policy = GeminiCallPolicy(
+    max_concurrency={
+        CALL_EMBED: config.GEMINI_MAX_CONCURRENCY_EMBED,
+        CALL_GENERATE: config.GEMINI_MAX_CONCURRENCY_GENERATE,
+        CALL_FILE: config.GEMINI_MAX_CONCURRENCY_FILE
+    },
+    queue_timeout=config.GEMINI_QUEUE_TIMEOUT,
+    max_retries=config.GEMINI_MAX_RETRIES,
+    backoff_base=config.GEMINI_BACKOFF_BASE,
+    backoff_max=config.GEMINI_BACKOFF_MAX,
+    failure_threshold=config.GEMINI_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=config.GEMINI_CIRCUIT_RESET_TIMEOUT
+)
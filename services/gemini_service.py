@@ -2,21 +2,46 @@
 Serviço para integração com Google Gemini API.
 """
 
+import asyncio
+import datetime
 import logging
 import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 import google.generativeai as genai
-from typing import Dict, Any, List, Optional
+from google.generativeai import caching
+from typing import Dict, Any, AsyncIterator, BinaryIO, Iterator, List, Optional
 
 import config
+from models import PROMPT_PITCH_SYSTEM, PROMPT_PITCH_VERSION
+from utils import TTLCache, register_shutdown_hook, stage_timer, record_token_usage, AUDIO_BYTES, PROMPT_CHARS
+from .gemini_policy import gemini_policy, CALL_FILE
 
 logger = logging.getLogger(__name__)
 
+# Configuração de geração das análises de pitch
+PITCH_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# Timeout aplicado a cada chamada de geração
+REQUEST_OPTIONS = {"timeout": config.GEMINI_TIMEOUT}
+
 class GeminiService:
     """Serviço para interação com a API Gemini."""
     
     def __init__(self):
         """Inicializa o serviço Gemini."""
         self.is_configured = False
+        # Modelos reutilizados por (modelo, generation_config, instrução de sistema)
+        self._models = TTLCache(max_size=config.GEMINI_MODEL_CACHE_SIZE, ttl_seconds=0)
+        self._pitch_cache = None
+        self._pitch_cache_expires_at = 0.0
+        self._pitch_cache_retry_at = 0.0
+        self._pitch_cache_lock = threading.Lock()
+        self.pitch_cache_creations = 0
+        self.pitch_cache_errors = 0
         self._configure()
     
     def _configure(self):
@@ -28,6 +53,11 @@ class GeminiService:
             genai.configure(api_key=config.GEMINI_API_KEY)
             self.is_configured = True
             logger.info("Serviço Gemini configurado com sucesso.")
+            if config.GEMINI_CONTEXT_CACHE_ENABLED:
+                logger.info(
+                    f"Análises de pitch usam {config.GEMINI_CONTEXT_CACHE_MODEL} quando o cache de contexto "
+                    f"estiver ativo e {config.GEMINI_MODEL} quando não estiver"
+                )
             
         except Exception as e:
             logger.error(f"Erro ao configurar Gemini API: {e}", exc_info=True)
@@ -54,24 +84,56 @@ class GeminiService:
             raise RuntimeError("Serviço Gemini não está configurado")
         
         try:
-            model = genai.GenerativeModel(config.GEMINI_MODEL)
+            # O prompt do sistema vai como instrução de sistema nativa do modelo
+            chat = self._get_chat_model(system_prompt).start_chat(history=history or [])
             
-            # Monta o histórico
-            chat_history = []
-            
-            # Adiciona o prompt do sistema
-            chat_history.append({"role": "user", "parts": [system_prompt]})
-            chat_history.append({"role": "model", "parts": ["Entendido! Estou pronto para ajudar."]})
+            # Envia a mensagem do usuário
+            PROMPT_CHARS.observe(len(system_prompt) + len(user_message), "chat")
+            with stage_timer("gemini_chat"):
+                response = gemini_policy.call(
+                    chat.send_message, user_message, request_options=REQUEST_OPTIONS, retry_timeouts=False
+                )
+            record_token_usage("chat", response)
             
-            # Adiciona histórico anterior se existir
-            if history:
-                chat_history.extend(history)
+            logger.info(f"Resposta do Gemini gerada com sucesso. Tamanho: {len(response.text)} chars")
+            return response.text
             
-            # Inicia o chat
-            chat = model.start_chat(history=chat_history)
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta do Gemini: {e}", exc_info=True)
+            raise
+    
+    async def generate_chat_response_async(
+        self, 
+        user_message: str, 
+        system_prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """
+        Versão assíncrona de generate_chat_response.
+        
+        Args:
+            user_message: Mensagem do usuário
+            system_prompt: Prompt do sistema (contexto)
+            history: Histórico de conversa (opcional)
             
-            # Envia a mensagem do usuário
-            response = chat.send_message(user_message)
+        Returns:
+            str: Resposta gerada pelo modelo
+        """
+        if not self.is_configured:
+            raise RuntimeError("Serviço Gemini não está configurado")
+        
+        try:
+            chat = self._get_chat_model(system_prompt).start_chat(history=history or [])
+            PROMPT_CHARS.observe(len(system_prompt) + len(user_message), "chat")
+            with stage_timer("gemini_chat"):
+                response = await gemini_policy.call_async(
+                    chat.send_message_async,
+                    user_message,
+                    request_options=REQUEST_OPTIONS,
+                    timeout=config.GEMINI_TIMEOUT,
+                    retry_timeouts=False
+                )
+            record_token_usage("chat", response)
             
             logger.info(f"Resposta do Gemini gerada com sucesso. Tamanho: {len(response.text)} chars")
             return response.text
@@ -80,19 +142,218 @@ class GeminiService:
             logger.error(f"Erro ao gerar resposta do Gemini: {e}", exc_info=True)
             raise
     
-    def analyze_pitch_with_audio(
+    def generate_chat_response_stream(
+        self, 
+        user_message: str, 
+        system_prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> Iterator[str]:
+        """
+        Gera uma resposta de chat em streaming, emitindo os trechos conforme chegam.
+        
+        Args:
+            user_message: Mensagem do usuário
+            system_prompt: Prompt do sistema (contexto)
+            history: Histórico de conversa (opcional)
+            
+        Yields:
+            str: Trechos de texto da resposta
+        """
+        if not self.is_configured:
+            raise RuntimeError("Serviço Gemini não está configurado")
+        
+        try:
+            chat = self._get_chat_model(system_prompt).start_chat(history=history or [])
+            PROMPT_CHARS.observe(len(system_prompt) + len(user_message), "chat_stream")
+            # A política cobre o início do streaming (até o primeiro trecho)
+            with stage_timer("gemini_stream_start"):
+                response = gemini_policy.call(
+                    chat.send_message,
+                    user_message,
+                    stream=True,
+                    request_options=REQUEST_OPTIONS,
+                    retry_timeouts=False
+                )
+            
+            total_chars = 0
+            for chunk in response:
+                if chunk.text:
+                    total_chars += len(chunk.text)
+                    yield chunk.text
+            
+            # O usage_metadata completo só existe após o último trecho
+            record_token_usage("chat_stream", response)
+            logger.info(f"Resposta do Gemini (streaming) concluída. Tamanho: {total_chars} chars")
+            
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta do Gemini em streaming: {e}", exc_info=True)
+            raise
+    
+    async def generate_chat_response_stream_async(
+        self, 
+        user_message: str, 
+        system_prompt: str,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Versão assíncrona de generate_chat_response_stream.
+        
+        Args:
+            user_message: Mensagem do usuário
+            system_prompt: Prompt do sistema (contexto)
+            history: Histórico de conversa (opcional)
+            
+        Yields:
+            str: Trechos de texto da resposta
+        """
+        if not self.is_configured:
+            raise RuntimeError("Serviço Gemini não está configurado")
+        
+        try:
+            chat = self._get_chat_model(system_prompt).start_chat(history=history or [])
+            PROMPT_CHARS.observe(len(system_prompt) + len(user_message), "chat_stream")
+            with stage_timer("gemini_stream_start"):
+                response = await gemini_policy.call_async(
+                    chat.send_message_async,
+                    user_message,
+                    stream=True,
+                    request_options=REQUEST_OPTIONS,
+                    timeout=config.GEMINI_TIMEOUT,
+                    retry_timeouts=False
+                )
+            
+            total_chars = 0
+            async for chunk in response:
+                if chunk.text:
+                    total_chars += len(chunk.text)
+                    yield chunk.text
+            
+            record_token_usage("chat_stream", response)
+            logger.info(f"Resposta do Gemini (streaming) concluída. Tamanho: {total_chars} chars")
+            
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta do Gemini em streaming: {e}", exc_info=True)
+            raise
+    
+    def upload_audio(
         self,
-        prompt: str,
-        audio_data: bytes,
-        audio_mime_type: str
-    ) -> Dict[str, Any]:
+        stream: BinaryIO,
+        mime_type: str,
+        display_name: Optional[str] = None,
+        path: Optional[str] = None
+    ):
+        """
+        Envia um áudio para a File API do Gemini.
+        
+        O SDK (google-generativeai 0.7) só envia arquivos a partir de um caminho:
+        sem `path`, o stream é copiado para um arquivo temporário, removido após o envio.
+        
+        Args:
+            stream: Stream binário do áudio (lido a partir da posição atual)
+            mime_type: Tipo MIME do áudio (ex: 'audio/mpeg')
+            display_name: Nome exibido do arquivo (opcional)
+            path: Arquivo em disco com o mesmo conteúdo do stream (opcional, evita a cópia)
+            
+        Returns:
+            File: Referência ao arquivo pronto (estado ACTIVE) para uso em generate_content
+        """
+        if not self.is_configured:
+            raise RuntimeError("Serviço Gemini não está configurado")
+        
+        start_time = time.monotonic()
+        temp_path = None
+        if path is None:
+            with tempfile.NamedTemporaryFile(suffix='.audio', delete=False) as temp_file:
+                temp_path = temp_file.name
+                shutil.copyfileobj(stream, temp_file, 1024 * 1024)
+            path = temp_path
+        
+        try:
+            with stage_timer("gemini_upload"):
+                audio_file = gemini_policy.call(
+                    genai.upload_file,
+                    path,
+                    mime_type=mime_type,
+                    display_name=display_name,
+                    call_class=CALL_FILE,
+                    retry_timeouts=False
+                )
+        finally:
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+        
+        # Arquivos de mídia passam por processamento antes de poderem ser usados
+        deadline = start_time + config.GEMINI_FILE_ACTIVE_TIMEOUT
+        while audio_file.state.name == "PROCESSING":
+            if time.monotonic() > deadline:
+                self.delete_file(audio_file)
+                raise TimeoutError(f"Arquivo {audio_file.name} não ficou pronto em {config.GEMINI_FILE_ACTIVE_TIMEOUT}s")
+            time.sleep(1)
+            audio_file = gemini_policy.call(genai.get_file, audio_file.name, call_class=CALL_FILE)
+        
+        if audio_file.state.name != "ACTIVE":
+            self.delete_file(audio_file)
+            raise RuntimeError(f"Falha no processamento do arquivo {audio_file.name}: {audio_file.state.name}")
+        
+        AUDIO_BYTES.observe(audio_file.size_bytes)
+        logger.info(
+            f"Áudio enviado à File API: {audio_file.name} ({audio_file.size_bytes} bytes) "
+            f"em {time.monotonic() - start_time:.1f}s"
+        )
+        return audio_file
+    
+    async def upload_audio_async(
+        self,
+        stream: BinaryIO,
+        mime_type: str,
+        display_name: Optional[str] = None,
+        path: Optional[str] = None
+    ):
+        """
+        Versão assíncrona de upload_audio (a File API não tem cliente assíncrono).
+        
+        Args:
+            stream: Stream binário do áudio (lido a partir da posição atual)
+            mime_type: Tipo MIME do áudio (ex: 'audio/mpeg')
+            display_name: Nome exibido do arquivo (opcional)
+            path: Arquivo em disco com o mesmo conteúdo do stream (opcional, evita a cópia)
+            
+        Returns:
+            File: Referência ao arquivo pronto (estado ACTIVE) para uso em generate_content
+        """
+        return await asyncio.to_thread(self.upload_audio, stream, mime_type, display_name, path)
+    
+    def delete_file(self, audio_file) -> None:
+        """
+        Remove um arquivo da File API (falhas são apenas registradas; o arquivo expira em 48h).
+        
+        Args:
+            audio_file: Referência retornada por upload_audio
+        """
+        try:
+            gemini_policy.call(genai.delete_file, audio_file.name, call_class=CALL_FILE)
+        except Exception as e:
+            logger.warning(f"Não foi possível remover o arquivo {audio_file.name} da File API: {e}")
+    
+    async def delete_file_async(self, audio_file) -> None:
+        """
+        Versão assíncrona de delete_file.
+        
+        Args:
+            audio_file: Referência retornada por upload_audio
+        """
+        await asyncio.to_thread(self.delete_file, audio_file)
+    
+    def analyze_pitch_with_audio(self, prompt: str, audio_file) -> Dict[str, Any]:
         """
         Analisa um pitch com áudio usando Gemini (processamento nativo de áudio).
         
         Args:
             prompt: Prompt de instrução para análise
-            audio_data: Dados do arquivo de áudio
-            audio_mime_type: Tipo MIME do áudio (ex: 'audio/mpeg')
+            audio_file: Referência ao áudio na File API (retornada por upload_audio)
             
         Returns:
             Dict: Resposta JSON parseada com análise dos investidores
@@ -101,32 +362,54 @@ class GeminiService:
             raise RuntimeError("Serviço Gemini não está configurado")
         
         try:
-            # Configura o modelo para gerar JSON
-            model = genai.GenerativeModel(
-                config.GEMINI_MODEL,
-                generation_config={"response_mime_type": "application/json"}
-            )
-            
-            # Prepara o conteúdo multimodal
-            contents = [
-                prompt,
-                {
-                    "mime_type": audio_mime_type,
-                    "data": audio_data
-                }
-            ]
+            # Modelo com as instruções fixas do painel e saída em JSON
+            model = self._get_pitch_model()
             
-            logger.info(f"Enviando áudio ({len(audio_data)} bytes) para análise do Gemini...")
-            response = model.generate_content(contents)
+            # O áudio é referenciado pela File API em vez de enviado inline
+            logger.info(f"Analisando áudio {audio_file.name} com Gemini...")
+            PROMPT_CHARS.observe(len(prompt), "pitch_audio")
+            with stage_timer("gemini_pitch_audio"):
+                response = gemini_policy.call(
+                    model.generate_content, [prompt, audio_file], request_options=REQUEST_OPTIONS, retry_timeouts=False
+                )
+            record_token_usage("pitch_audio", response)
             
             # Parse da resposta JSON
-            try:
-                result = json.loads(response.text)
-                logger.info("Análise de pitch concluída com sucesso.")
-                return result
-            except json.JSONDecodeError as e:
-                logger.error(f"Resposta do Gemini não é JSON válido: {response.text[:500]}")
-                raise ValueError(f"Resposta inválida do Gemini: {e}")
+            return self._parse_json_response(response)
+                
+        except Exception as e:
+            logger.error(f"Erro ao analisar pitch com áudio: {e}", exc_info=True)
+            raise
+    
+    async def analyze_pitch_with_audio_async(self, prompt: str, audio_file) -> Dict[str, Any]:
+        """
+        Versão assíncrona de analyze_pitch_with_audio.
+        
+        Args:
+            prompt: Prompt de instrução para análise
+            audio_file: Referência ao áudio na File API (retornada por upload_audio)
+            
+        Returns:
+            Dict: Resposta JSON parseada com análise dos investidores
+        """
+        if not self.is_configured:
+            raise RuntimeError("Serviço Gemini não está configurado")
+        
+        try:
+            model = self._get_pitch_model()
+            
+            logger.info(f"Analisando áudio {audio_file.name} com Gemini...")
+            PROMPT_CHARS.observe(len(prompt), "pitch_audio")
+            with stage_timer("gemini_pitch_audio"):
+                response = await gemini_policy.call_async(
+                    model.generate_content_async,
+                    [prompt, audio_file],
+                    request_options=REQUEST_OPTIONS,
+                    timeout=config.GEMINI_TIMEOUT,
+                    retry_timeouts=False
+                )
+            record_token_usage("pitch_audio", response)
+            return self._parse_json_response(response)
                 
         except Exception as e:
             logger.error(f"Erro ao analisar pitch com áudio: {e}", exc_info=True)
@@ -151,27 +434,257 @@ class GeminiService:
             raise RuntimeError("Serviço Gemini não está configurado")
         
         try:
-            # Configura o modelo para gerar JSON
-            model = genai.GenerativeModel(
-                config.GEMINI_MODEL,
-                generation_config={"response_mime_type": "application/json"}
-            )
+            # Modelo com as instruções fixas do painel e saída em JSON
+            model = self._get_pitch_model()
             
             logger.info(f"Analisando pitch com texto ({len(pitch_text)} chars)...")
-            response = model.generate_content(prompt)
+            PROMPT_CHARS.observe(len(prompt), "pitch_text")
+            with stage_timer("gemini_pitch_text"):
+                response = gemini_policy.call(
+                    model.generate_content, prompt, request_options=REQUEST_OPTIONS, retry_timeouts=False
+                )
+            record_token_usage("pitch_text", response)
             
             # Parse da resposta JSON
-            try:
-                result = json.loads(response.text)
-                logger.info("Análise de pitch concluída com sucesso.")
-                return result
-            except json.JSONDecodeError as e:
-                logger.error(f"Resposta do Gemini não é JSON válido: {response.text[:500]}")
-                raise ValueError(f"Resposta inválida do Gemini: {e}")
+            return self._parse_json_response(response)
                 
         except Exception as e:
             logger.error(f"Erro ao analisar pitch com texto: {e}", exc_info=True)
             raise
+    
+    async def analyze_pitch_with_text_async(
+        self,
+        prompt: str,
+        pitch_text: str
+    ) -> Dict[str, Any]:
+        """
+        Versão assíncrona de analyze_pitch_with_text.
+        
+        Args:
+            prompt: Prompt de instrução para análise
+            pitch_text: Texto do pitch
+            
+        Returns:
+            Dict: Resposta JSON parseada com análise dos investidores
+        """
+        if not self.is_configured:
+            raise RuntimeError("Serviço Gemini não está configurado")
+        
+        try:
+            model = self._get_pitch_model()
+            
+            logger.info(f"Analisando pitch com texto ({len(pitch_text)} chars)...")
+            PROMPT_CHARS.observe(len(prompt), "pitch_text")
+            with stage_timer("gemini_pitch_text"):
+                response = await gemini_policy.call_async(
+                    model.generate_content_async,
+                    prompt,
+                    request_options=REQUEST_OPTIONS,
+                    timeout=config.GEMINI_TIMEOUT,
+                    retry_timeouts=False
+                )
+            record_token_usage("pitch_text", response)
+            return self._parse_json_response(response)
+                
+        except Exception as e:
+            logger.error(f"Erro ao analisar pitch com texto: {e}", exc_info=True)
+            raise
+    
+    def summarize_conversation(self, prompt: str) -> str:
+        """
+        Gera o resumo compacto de turnos antigos de uma conversa.
+        
+        Args:
+            prompt: Prompt de resumo já preenchido com o resumo atual e os novos turnos
+            
+        Returns:
+            str: Resumo atualizado
+        """
+        if not self.is_configured:
+            raise RuntimeError("Serviço Gemini não está configurado")
+        
+        try:
+            PROMPT_CHARS.observe(len(prompt), "summary")
+            with stage_timer("gemini_summary"):
+                response = gemini_policy.call(
+                    self._get_model().generate_content, prompt, request_options=REQUEST_OPTIONS, retry_timeouts=False
+                )
+            record_token_usage("summary", response)
+            
+            logger.info(f"Resumo de conversa gerado. Tamanho: {len(response.text)} chars")
+            return response.text.strip()
+            
+        except Exception as e:
+            logger.error(f"Erro ao resumir conversa: {e}", exc_info=True)
+            raise
+    
+    def _get_model(
+        self,
+        generation_config: Optional[Dict[str, Any]] = None,
+        system_instruction: Optional[str] = None,
+        model_name: str = config.GEMINI_MODEL
+    ) -> genai.GenerativeModel:
+        """
+        Retorna um modelo reutilizável para a combinação de configuração e instrução de sistema.
+        
+        Use apenas com instruções fixas: instruções que mudam a cada requisição
+        encheriam o cache e descartariam os modelos fixos (veja _get_chat_model).
+        
+        Args:
+            generation_config: Configuração de geração (opcional)
+            system_instruction: Instrução de sistema fixa (opcional)
+            model_name: Modelo Gemini (padrão: GEMINI_MODEL)
+            
+        Returns:
+            GenerativeModel: Instância compartilhada entre requisições
+        """
+        key = (
+            model_name,
+            json.dumps(generation_config, sort_keys=True) if generation_config else None,
+            system_instruction
+        )
+        model = self._models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name,
+                generation_config=generation_config,
+                system_instruction=system_instruction
+            )
+            self._models.set(key, model)
+        return model
+    
+    @staticmethod
+    def _get_chat_model(system_instruction: str) -> genai.GenerativeModel:
+        """
+        Cria o modelo de chat do AnimaGuy (não reutilizado: a instrução traz o contexto RAG da requisição).
+        
+        Args:
+            system_instruction: Prompt do sistema com o contexto da requisição
+            
+        Returns:
+            GenerativeModel: Nova instância (a criação é local, sem chamada à API)
+        """
+        return genai.GenerativeModel(config.GEMINI_MODEL, system_instruction=system_instruction)
+    
+    def _get_pitch_model(self) -> genai.GenerativeModel:
+        """
+        Retorna o modelo de análise de pitch.
+        
+        Com GEMINI_CONTEXT_CACHE_ENABLED, as instruções fixas do painel ficam em
+        um cache de contexto do Gemini (processadas uma vez no servidor) e o
+        modelo é o do cache (GEMINI_CONTEXT_CACHE_MODEL). Caso contrário, ou se
+        o cache não puder ser criado, as instruções são enviadas como instrução
+        de sistema a cada chamada ao GEMINI_MODEL.
+        
+        Returns:
+            GenerativeModel: Modelo configurado para responder em JSON
+        """
+        if config.GEMINI_CONTEXT_CACHE_ENABLED:
+            cached_content = self._get_pitch_context_cache()
+            if cached_content is not None:
+                key = ("cached_content", cached_content.name)
+                model = self._models.get(key)
+                if model is None:
+                    model = genai.GenerativeModel.from_cached_content(
+                        cached_content,
+                        generation_config=PITCH_GENERATION_CONFIG
+                    )
+                    self._models.set(key, model)
+                return model
+        
+        return self._get_model(
+            generation_config=PITCH_GENERATION_CONFIG,
+            system_instruction=PROMPT_PITCH_SYSTEM,
+            model_name=config.GEMINI_MODEL
+        )
+    
+    def _get_pitch_context_cache(self):
+        """
+        Retorna o cache de contexto das instruções de pitch, criando ou renovando se necessário.
+        
+        Returns:
+            CachedContent: Cache válido, ou None se indisponível (ex: prefixo abaixo do mínimo da API)
+        """
+        with self._pitch_cache_lock:
+            now = time.monotonic()
+            if self._pitch_cache is not None and now < self._pitch_cache_expires_at:
+                return self._pitch_cache
+            
+            if now < self._pitch_cache_retry_at:
+                return None
+            
+            ttl = datetime.timedelta(seconds=config.GEMINI_CONTEXT_CACHE_TTL)
+            try:
+                if self._pitch_cache is not None:
+                    # Cache perto de expirar: estende o tempo de vida no servidor
+                    gemini_policy.call(self._pitch_cache.update, ttl=ttl, call_class=CALL_FILE)
+                else:
+                    self._pitch_cache = gemini_policy.call(
+                        caching.CachedContent.create,
+                        call_class=CALL_FILE,
+                        model=config.GEMINI_CONTEXT_CACHE_MODEL,
+                        display_name=f"pitch-system-v{PROMPT_PITCH_VERSION}",
+                        system_instruction=PROMPT_PITCH_SYSTEM,
+                        ttl=ttl
+                    )
+                    self.pitch_cache_creations += 1
+                    register_shutdown_hook("gemini_context_cache", self.delete_context_caches)
+                    logger.info(f"Cache de contexto do pitch criado: {self._pitch_cache.name}")
+                
+                # Renova com folga antes da expiração no servidor
+                self._pitch_cache_expires_at = now + config.GEMINI_CONTEXT_CACHE_TTL * 0.9
+                return self._pitch_cache
+            
+            except Exception as e:
+                self.pitch_cache_errors += 1
+                self._pitch_cache = None
+                self._pitch_cache_retry_at = now + config.GEMINI_CONTEXT_CACHE_RETRY_INTERVAL
+                logger.warning(f"Cache de contexto do pitch indisponível; usando instrução de sistema: {e}")
+                return None
+    
+    def delete_context_caches(self) -> None:
+        """Remove o cache de contexto do pitch no servidor (chamado no encerramento)."""
+        with self._pitch_cache_lock:
+            if self._pitch_cache is None:
+                return
+            try:
+                self._pitch_cache.delete()
+                logger.info(f"Cache de contexto do pitch removido: {self._pitch_cache.name}")
+            except Exception as e:
+                logger.warning(f"Não foi possível remover o cache de contexto do pitch: {e}")
+            self._pitch_cache = None
+            self._pitch_cache_expires_at = 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da política de chamadas, dos modelos reutilizados e do cache de contexto.
+        
+        Returns:
+            Dict: Política de chamadas, modelos em cache e estado do cache de contexto do pitch
+        """
+        return {
+            "call_policy": gemini_policy.stats(),
+            "models": self._models.stats(),
+            "context_cache": {
+                "enabled": config.GEMINI_CONTEXT_CACHE_ENABLED,
+                "pitch_models": list(config.GEMINI_PITCH_MODELS),
+                "active": self._pitch_cache is not None,
+                "name": self._pitch_cache.name if self._pitch_cache is not None else None,
+                "creations": self.pitch_cache_creations,
+                "errors": self.pitch_cache_errors
+            }
+        }
+    
+    @staticmethod
+    def _parse_json_response(response) -> Dict[str, Any]:
+        """Faz o parse da resposta JSON da análise de pitch."""
+        try:
+            result = json.loads(response.text)
+            logger.info("Análise de pitch concluída com sucesso.")
+            return result
+        except json.JSONDecodeError as e:
+            logger.error(f"Resposta do Gemini não é JSON válido: {response.text[:500]}")
+            raise ValueError(f"Resposta inválida do Gemini: {e}")
 
 # Instância global do serviço Gemini (singleton)
 gemini_service = GeminiService()
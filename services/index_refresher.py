@@ -0,0 +1,159 @@
+"""
+Atualização do índice RAG em segundo plano, sem downtime.
+
+Consulta periodicamente as gerações dos artefatos no bucket RAG. Quando uma
+nova versão é publicada, baixa os arquivos para um diretório próprio da versão,
+carrega um novo estado no RAGService fora do caminho das requisições e o ativa
+atomicamente; os arquivos da versão anterior são removidos em seguida.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import config
+from .rag_service import rag_service
+from .storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+
+class IndexRefresher:
+    """Thread em segundo plano que recarrega o índice RAG quando o bucket muda."""
+    
+    def __init__(self, interval_seconds: int):
+        """
+        Inicializa o refresher.
+        
+        Args:
+            interval_seconds: Intervalo entre consultas ao bucket (<= 0 desativa)
+        """
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending_version: Optional[str] = None
+        self.checks = 0
+        self.reloads = 0
+        self.last_check_at: Optional[str] = None
+        self.last_reload_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+    
+    def start(self) -> bool:
+        """
+        Inicia a thread de atualização, se habilitada.
+        
+        Returns:
+            bool: True se a thread foi iniciada
+        """
+        if self.interval_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return False
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="rag-index-refresher", daemon=True)
+        self._thread.start()
+        logger.info(f"Atualização automática do índice RAG ativa (intervalo: {self.interval_seconds}s)")
+        return True
+    
+    def stop(self) -> None:
+        """Sinaliza a thread para encerrar."""
+        self._stop_event.set()
+    
+    def check_now(self) -> bool:
+        """
+        Verifica o bucket e recarrega o índice se uma nova versão estiver estável.
+        
+        Uma versão só é aplicada quando observada em duas consultas seguidas,
+        evitando carregar um par índice/chunks publicado pela metade.
+        
+        Returns:
+            bool: True se o índice foi recarregado
+        """
+        self.checks += 1
+        self.last_check_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        
+        remote_version = storage_service.get_rag_artifact_version()
+        current_version = rag_service.load_stats.get("artifact_version")
+        if remote_version is None or remote_version == current_version:
+            self._pending_version = None
+            return False
+        
+        if remote_version != self._pending_version:
+            logger.info(f"Nova versão do índice RAG detectada ({remote_version}); aguardando estabilizar")
+            self._pending_version = remote_version
+            return False
+        
+        return self._reload(remote_version)
+    
+    def _reload(self, version: str) -> bool:
+        """Baixa e ativa uma nova versão dos artefatos."""
+        start_time = time.monotonic()
+        version_dir = os.path.join(config.RAG_VERSIONS_DIR, version)
+        os.makedirs(version_dir, exist_ok=True)
+        index_path = os.path.join(version_dir, os.path.basename(config.RAG_INDEX_PATH))
+        chunks_path = os.path.join(version_dir, os.path.basename(config.RAG_CHUNKS_PATH))
+        
+        if not storage_service.download_rag_files(index_path=index_path, chunks_path=chunks_path):
+            raise RuntimeError(f"Falha ao baixar a versão {version} do índice RAG")
+        
+        downloaded_version = storage_service.rag_artifact_version
+        previous_state = rag_service.state
+        if not rag_service.reload(index_path, chunks_path, artifact_version=downloaded_version):
+            raise RuntimeError(f"Falha ao carregar a versão {downloaded_version} do índice RAG")
+        
+        self.reloads += 1
+        self._pending_version = None
+        self.last_reload_seconds = round(time.monotonic() - start_time, 3)
+        logger.info(f"Índice RAG atualizado para a versão {downloaded_version} em {self.last_reload_seconds}s")
+        
+        # Remove os arquivos da versão anterior (/tmp ocupa RAM no Cloud Run). Buscas em
+        # andamento não são afetadas: arquivos mapeados continuam válidos até serem liberados.
+        if previous_state is not None:
+            self._remove_files(previous_state.index_path, previous_state.chunks_path, keep_dir=version_dir)
+        return True
+    
+    @staticmethod
+    def _remove_files(index_path: str, chunks_path: str, keep_dir: str) -> None:
+        """Remove os artefatos de uma versão anterior e seu diretório de versão, se houver."""
+        for path in (index_path, chunks_path):
+            if os.path.dirname(path) != keep_dir:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        
+        previous_dir = os.path.dirname(index_path)
+        if os.path.dirname(previous_dir) == config.RAG_VERSIONS_DIR and previous_dir != keep_dir:
+            shutil.rmtree(previous_dir, ignore_errors=True)
+    
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.check_now()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Erro na atualização do índice RAG: {e}", exc_info=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna o estado da atualização automática.
+        
+        Returns:
+            Dict: Intervalo, contadores, última verificação, duração da última recarga e erro
+        """
+        return {
+            "enabled": self.interval_seconds > 0,
+            "interval_seconds": self.interval_seconds,
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "last_check_at": self.last_check_at,
+            "last_reload_seconds": self.last_reload_seconds,
+            "last_error": self.last_error
+        }
+
+
+# Instância global do refresher (singleton)
+index_refresher = IndexRefresher(interval_seconds=config.RAG_REFRESH_INTERVAL)
@@ -0,0 +1,229 @@
+"""
+Índice lexical (BM25) em memória sobre os chunks do RAG.
+
+Construído junto com o índice FAISS a cada carga, com as listas de postings
+em arrays numpy contíguos (formato CSR: offsets por termo, IDs de chunk e
+frequências), sem dependências externas. Complementa a busca densa (termos
+exatos, siglas, nomes) e permite recuperar contexto sem a API de embeddings.
+"""
+
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+
+# Palavras muito frequentes em português que não ajudam a ranquear
+STOPWORDS = frozenset(
+    "a ao aos as com como da das de do dos e em entre era essa esse esta este eu foi "
+    "ha isso isto ja la lhe mais mas me mesmo meu minha muito na nas nem no nos o os "
+    "ou para pela pelas pelo pelos por qual quando que quem se sem ser seu sua so sobre "
+    "tambem te tem tu um uma umas uns voce voces".split()
+)
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Normaliza (caixa e acentos) e divide o texto em termos, sem stopwords.
+    
+    Args:
+        text: Texto de um chunk ou de uma consulta
+    
+    Returns:
+        List[str]: Termos na ordem em que aparecem
+    """
+    normalized = unicodedata.normalize("NFKD", text.casefold())
+    normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+    return [
+        token for token in _TOKEN_PATTERN.findall(normalized)
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """Índice invertido com pontuação BM25 e postings compactos."""
+    
+    def __init__(self, text_chunks: Sequence[str], k1: float, b: float):
+        """
+        Constrói o índice.
+        
+        Args:
+            text_chunks: Chunks de texto (a posição é o ID do chunk)
+            k1: Saturação da frequência do termo
+            b: Peso da normalização pelo tamanho do chunk
+        """
+        start_time = time.monotonic()
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(text_chunks)
+        self.vocabulary: Dict[str, int] = {}
+        
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        frequencies: List[int] = []
+        doc_lengths = np.zeros(self.num_docs, dtype=np.float32)
+        
+        for doc_id, chunk in enumerate(text_chunks):
+            tokens = tokenize(chunk)
+            doc_lengths[doc_id] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                frequencies.append(count)
+        
+        # Ordena as ocorrências por termo para montar o formato CSR
+        term_ids_array = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids_array, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.frequencies = np.minimum(frequencies, np.iinfo(np.uint16).max).astype(np.uint16)[order]
+        document_frequency = np.bincount(term_ids_array, minlength=len(self.vocabulary))
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(document_frequency, out=self.offsets[1:])
+        
+        self.idf = np.log1p(
+            (self.num_docs - document_frequency + 0.5) / (document_frequency + 0.5)
+        ).astype(np.float32)
+        average_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+        # Denominador do BM25 sem a frequência: k1 * (1 - b + b * tamanho / tamanho médio)
+        self.length_norm = (
+            k1 * (1 - b + b * doc_lengths / average_length) if average_length else np.full(self.num_docs, k1)
+        ).astype(np.float32)
+        self.build_seconds = round(time.monotonic() - start_time, 3)
+    
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Retorna os k chunks com maior pontuação BM25 para a consulta.
+        
+        Args:
+            query: Texto da consulta
+            k: Número máximo de resultados
+        
+        Returns:
+            List[Tuple[int, float]]: (ID do chunk, pontuação), da maior para a menor
+        """
+        term_ids = {self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary}
+        if not term_ids or k <= 0:
+            return []
+        
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.frequencies[start:end].astype(np.float32)
+            # Cada chunk aparece uma vez por termo: soma vetorizada sem colisões
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+        
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in ranked]
+    
+    def term_idf(self, term: str) -> float:
+        """
+        Retorna o IDF de um termo já normalizado (0.0 se não estiver no índice).
+        
+        Args:
+            term: Termo produzido por tokenize
+        
+        Returns:
+            float: IDF do termo
+        """
+        term_id = self.vocabulary.get(term)
+        return float(self.idf[term_id]) if term_id is not None else 0.0
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Retorna o tamanho do índice.
+        
+        Returns:
+            Dict: Termos, postings, memória dos arrays (MB) e tempo de construção
+        """
+        arrays = (self.doc_ids, self.frequencies, self.offsets, self.idf, self.length_norm)
+        return {
+            "terms": len(self.vocabulary),
+            "postings": int(len(self.doc_ids)),
+            "arrays_mb": round(sum(array.nbytes for array in arrays) / (1024 * 1024), 2),
+            "build_seconds": self.build_seconds
+        }
+
+
+def build_lexical_index(text_chunks: Sequence[str]) -> BM25Index:
+    """
+    Constrói o índice BM25 com os parâmetros configurados.
+    
+    Args:
+        text_chunks: Chunks de texto do RAG
+    
+    Returns:
+        BM25Index: Índice pronto para busca
+    """
+    return BM25Index(text_chunks, k1=config.RAG_BM25_K1, b=config.RAG_BM25_B)
+
+
+def extract_key_phrases(
+    text: str,
+    max_phrases: int,
+    lexical_index: Optional[BM25Index] = None,
+    max_chars: int = 300
+) -> List[str]:
+    """
+    Extrai as frases mais informativas de um texto para usar como consultas extras.
+    
+    Cada frase é pontuada pela soma do IDF dos seus termos no índice lexical
+    (termos raros na base pesam mais); sem índice, pelo número de termos distintos.
+    
+    Args:
+        text: Texto de origem (ex: transcrição de um pitch)
+        max_phrases: Número máximo de frases
+        lexical_index: Índice BM25 usado para pesar os termos (opcional)
+        max_chars: Tamanho máximo de cada frase
+    
+    Returns:
+        List[str]: Frases selecionadas, na ordem em que aparecem no texto
+    """
+    if max_phrases <= 0:
+        return []
+    
+    scored: List[Tuple[float, int, str]] = []
+    for position, sentence in enumerate(_SENTENCE_PATTERN.split(text)):
+        sentence = " ".join(sentence.split())[:max_chars]
+        terms = set(tokenize(sentence))
+        if len(terms) < 3:
+            continue
+        if lexical_index is not None:
+            score = sum(lexical_index.term_idf(term) for term in terms)
+        else:
+            score = float(len(terms))
+        if score > 0:
+            scored.append((score, position, sentence))
+    
+    best = sorted(scored, key=lambda item: item[0], reverse=True)[:max_phrases]
+    return [sentence for _, _, sentence in sorted(best, key=lambda item: item[1])]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int, rrf_k: int) -> List[int]:
+    """
+    Combina listas ranqueadas de chunks por Reciprocal Rank Fusion.
+    
+    Args:
+        rankings: Listas de IDs de chunk, cada uma da mais para a menos relevante
+        k: Número de IDs a retornar
+        rrf_k: Constante de suavização do RRF (pontuação = soma de 1 / (rrf_k + posição))
+    
+    Returns:
+        List[int]: IDs de chunk ordenados pela pontuação combinada
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for position, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + position)
+    
+    return sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)[:k]
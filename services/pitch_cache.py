@@ -0,0 +1,105 @@
+"""
+Cache de resultados de análise de pitch endereçado por conteúdo.
+
+A chave combina o hash do áudio e/ou do texto normalizado com a versão do
+prompt e os modelos Gemini das análises (GEMINI_PITCH_MODELS), de modo que reenvios do mesmo pitch reaproveitam a
+análise anterior. O nível em memória pode ser complementado pela coleção
+'pitch_jobs' do Firestore (PITCH_CACHE_PERSISTENT).
+"""
+
+import copy
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+import config
+from models import PROMPT_PITCH_VERSION
+from utils import firestore_client, TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class PitchCache:
+    """Cache em dois níveis (memória e Firestore) para análises de pitch."""
+    
+    def __init__(self):
+        """Inicializa o cache de pitch."""
+        self.memory = TTLCache(
+            max_size=config.PITCH_CACHE_MAX_SIZE if config.PITCH_CACHE_ENABLED else 0,
+            ttl_seconds=config.PITCH_CACHE_TTL
+        )
+        self.persistent_hits = 0
+    
+    @staticmethod
+    def build_key(audio_digest: Optional[bytes] = None, text: Optional[str] = None) -> str:
+        """
+        Calcula a chave de conteúdo de um pitch.
+        
+        Args:
+            audio_digest: SHA-256 do áudio do pitch, calculado em blocos por hash_stream (opcional)
+            text: Texto do pitch (opcional)
+        
+        Returns:
+            str: Hash SHA-256 hexadecimal do conteúdo, prompt e modelos
+        """
+        digest = hashlib.sha256()
+        models = "+".join(config.GEMINI_PITCH_MODELS)
+        digest.update(f"model={models};prompt={PROMPT_PITCH_VERSION};".encode('utf-8'))
+        if audio_digest:
+            digest.update(b"audio=")
+            digest.update(audio_digest)
+        if text:
+            normalized_text = " ".join(text.split())
+            digest.update(b"text=")
+            digest.update(normalized_text.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Recupera a análise armazenada para uma chave.
+        
+        Args:
+            cache_key: Chave calculada por build_key
+        
+        Returns:
+            Dict: Cópia do resultado armazenado, ou None se ausente
+        """
+        if not config.PITCH_CACHE_ENABLED:
+            return None
+        
+        result = self.memory.get(cache_key)
+        if result is None and config.PITCH_CACHE_PERSISTENT:
+            result = firestore_client.find_pitch_result(cache_key)
+            if result is not None:
+                self.persistent_hits += 1
+                self.memory.set(cache_key, result)
+        
+        return copy.deepcopy(result) if result is not None else None
+    
+    def set(self, cache_key: str, result: Dict[str, Any]) -> None:
+        """
+        Armazena a análise em memória (o nível persistente é o próprio job no Firestore).
+        
+        Args:
+            cache_key: Chave calculada por build_key
+            result: Resultado da análise
+        """
+        if config.PITCH_CACHE_ENABLED:
+            self.memory.set(cache_key, copy.deepcopy(result))
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas de uso do cache.
+        
+        Returns:
+            Dict: Estatísticas do nível em memória e acertos no Firestore
+        """
+        return {
+            **self.memory.stats(),
+            "persistent": config.PITCH_CACHE_PERSISTENT,
+            "persistent_hits": self.persistent_hits
+        }
+
+
+# Instância global do cache de pitch (singleton)
+pitch_cache = PitchCache()
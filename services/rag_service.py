@@ -2,69 +2,393 @@
 Serviço RAG (Retrieval-Augmented Generation) usando FAISS.
 """
 
+import asyncio
 import logging
 import json
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import numpy as np
 import faiss
 import google.generativeai as genai
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import config
+from utils import TTLCache, embedding_flight, stage_timer
+from .gemini_policy import gemini_policy, CALL_EMBED
+from .lexical_index import BM25Index, build_lexical_index, extract_key_phrases, reciprocal_rank_fusion
+from .context_assembler import context_assembler
 
 logger = logging.getLogger(__name__)
 
 
+class RAGState:
+    """Estado carregado do RAG (índice + chunks), substituído por inteiro a cada recarga."""
+    
+    def __init__(
+        self,
+        index: faiss.Index,
+        text_chunks: List[str],
+        version: int,
+        artifact_version: Optional[str],
+        index_path: str,
+        chunks_path: str,
+        load_stats: dict,
+        lexical_index: Optional[BM25Index] = None
+    ):
+        self.index = index
+        self.text_chunks = text_chunks
+        self.lexical_index = lexical_index
+        self.version = version
+        self.artifact_version = artifact_version
+        self.index_path = index_path
+        self.chunks_path = chunks_path
+        self.load_stats = load_stats
+
+
 class RAGService:
     """Serviço para busca de contexto relevante usando FAISS."""
     
     def __init__(self):
         """Inicializa o serviço RAG."""
-        self.index: Optional[faiss.Index] = None
-        self.text_chunks: Optional[List[str]] = None
-        self.is_loaded = False
-        
-    def load_index(self) -> bool:
+        # Buscas leem self._state uma única vez; recargas trocam a referência
+        # atomicamente e o estado antigo é liberado quando a última busca termina.
+        self._state: Optional[RAGState] = None
+        self._reload_lock = threading.Lock()
+        self._version_counter = 0
+        self.embedding_cache = TTLCache(
+            max_size=config.EMBEDDING_CACHE_MAX_SIZE if config.EMBEDDING_CACHE_ENABLED else 0,
+            ttl_seconds=config.EMBEDDING_CACHE_TTL
+        )
+        # Embeddings com prazo: se excedido, a busca segue só com o índice lexical
+        self._embedding_executor = ThreadPoolExecutor(
+            max_workers=config.RAG_EMBEDDING_WORKERS,
+            thread_name_prefix="rag-embedding"
+        )
+        self.lexical_fallbacks = 0
+        # Consultas frequentes pré-calculadas no warmup (chave: consulta normalizada): texto
+        # original, embedding fixo e contexto por versão do índice. Os mapas não são alterados
+        # depois de publicados: cada atualização publica um novo mapa com uma única atribuição
+        self._warm_queries: Dict[str, str] = {}
+        self._warm_embeddings: Dict[str, np.ndarray] = {}
+        self._warm_contexts: Dict[Tuple[str, Optional[str]], Tuple[int, str]] = {}
+        self.warm_hits = 0
+        self.warmup_stats: dict = {}
+    
+    @property
+    def state(self) -> Optional[RAGState]:
+        """Estado ativo (capture uma vez para operar sobre uma versão consistente)."""
+        return self._state
+    
+    @property
+    def index(self) -> Optional[faiss.Index]:
+        return self._state.index if self._state else None
+    
+    @property
+    def text_chunks(self) -> Optional[List[str]]:
+        return self._state.text_chunks if self._state else None
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._state is not None
+    
+    @property
+    def index_version(self) -> int:
+        """Versão do estado carregado (muda a cada recarga e invalida caches dependentes)."""
+        return self._state.version if self._state else 0
+    
+    @property
+    def load_stats(self) -> dict:
+        return self._state.load_stats if self._state else {}
+    
+    def load_index(self, artifact_version: Optional[str] = None) -> bool:
         """
         Carrega o índice FAISS e os chunks de texto do disco.
         
+        Args:
+            artifact_version: Identificador da versão dos artefatos (ex: gerações no GCS)
+        
         Returns:
             bool: True se carregado com sucesso, False caso contrário
         """
         if self.is_loaded:
             logger.info("Índice RAG já carregado em memória.")
             return True
+        
+        return self.reload(config.RAG_INDEX_PATH, config.RAG_CHUNKS_PATH, artifact_version=artifact_version)
+    
+    def reload(self, index_path: str, chunks_path: str, artifact_version: Optional[str] = None) -> bool:
+        """
+        Carrega um novo estado do RAG e o ativa atomicamente.
+        
+        Buscas em andamento terminam sobre o estado anterior, que é liberado
+        quando deixa de ser referenciado.
+        
+        Args:
+            index_path: Caminho local do índice FAISS
+            chunks_path: Caminho local dos chunks de texto
+            artifact_version: Identificador da versão dos artefatos (ex: gerações no GCS)
+            
+        Returns:
+            bool: True se carregado com sucesso, False caso contrário
+        """
+        with self._reload_lock:
+            try:
+                rss_before = _get_rss_mb()
+                start_time = time.monotonic()
+                
+                logger.info("Carregando índice FAISS...")
+                index, mmap_used = self._read_index(index_path)
+                search_params = self._apply_search_params(index)
+                self._enable_reconstruct(index)
+                
+                logger.info("Carregando chunks de texto...")
+                with open(chunks_path, 'r', encoding='utf-8') as f:
+                    text_chunks = json.load(f)
+                
+                lexical_index = None
+                if config.RAG_HYBRID_ENABLED:
+                    logger.info("Construindo índice lexical (BM25)...")
+                    lexical_index = build_lexical_index(text_chunks)
+                
+                rss_after = _get_rss_mb()
+                self._version_counter += 1
+                load_stats = {
+                    "version": self._version_counter,
+                    "artifact_version": artifact_version,
+                    "mmap": mmap_used,
+                    "index_type": type(index).__name__,
+                    "search_params": search_params,
+                    "total_chunks": len(text_chunks),
+                    "lexical_index": lexical_index.stats() if lexical_index is not None else None,
+                    "load_seconds": round(time.monotonic() - start_time, 3),
+                    "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "rss_before_mb": rss_before,
+                    "rss_after_mb": rss_after
+                }
+                
+                self._state = RAGState(
+                    index=index,
+                    text_chunks=text_chunks,
+                    version=self._version_counter,
+                    artifact_version=artifact_version,
+                    index_path=index_path,
+                    chunks_path=chunks_path,
+                    load_stats=load_stats,
+                    lexical_index=lexical_index
+                )
+                
+                logger.info(f"Índice RAG carregado com sucesso. Total de chunks: {len(text_chunks)}")
+                logger.info(
+                    f"Carga do índice ({load_stats['index_type']}, mmap={mmap_used}) em "
+                    f"{load_stats['load_seconds']}s. Memória residente: {rss_before}MB -> {rss_after}MB"
+                )
+                return True
+                
+            except FileNotFoundError as e:
+                logger.error(f"Arquivos do índice RAG não encontrados: {e}")
+                logger.warning("O serviço continuará sem RAG. As respostas não terão contexto da base de conhecimento.")
+                return False
+            except Exception as e:
+                logger.error(f"Erro ao carregar índice RAG: {e}", exc_info=True)
+                return False
+    
+    @staticmethod
+    def _read_index(index_path: str) -> Tuple[faiss.Index, bool]:
+        """
+        Lê o índice FAISS, mapeando o arquivo em memória quando suportado.
+        
+        Só as listas invertidas de índices IVF são de fato mapeadas (as páginas
+        ficam compartilhadas com o arquivo em /tmp em vez de copiadas para o
+        heap). Outros tipos (Flat, HNSW) aceitam IO_FLAG_MMAP sem erro, mas
+        copiam os vetores para o heap; nesse caso o retorno é False.
+        
+        Args:
+            index_path: Caminho local do índice FAISS
             
+        Returns:
+            Tuple[faiss.Index, bool]: (índice, True se os dados do índice estão mapeados do arquivo)
+        """
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP", None)
+        if config.RAG_INDEX_MMAP and mmap_flag is not None:
+            try:
+                index = faiss.read_index(index_path, mmap_flag)
+            except RuntimeError as e:
+                logger.warning(f"Tipo de índice não suporta mmap, carregando em memória: {e}")
+            else:
+                if RAGService._is_mmap_backed(index):
+                    return index, True
+                logger.warning(
+                    f"Índice {type(index).__name__} não é mapeado pelo FAISS (apenas listas invertidas IVF são); "
+                    f"vetores carregados no heap"
+                )
+                return index, False
+        
+        return faiss.read_index(index_path), False
+    
+    @staticmethod
+    def _is_mmap_backed(index: faiss.Index) -> bool:
+        """Indica se as listas invertidas do índice IVF foram lidas via mmap (OnDiskInvertedLists)."""
+        try:
+            invlists = faiss.extract_index_ivf(index).invlists
+        except RuntimeError:
+            return False
+        return type(faiss.downcast_InvertedLists(invlists)).__name__ == "OnDiskInvertedLists"
+    
+    @staticmethod
+    def _enable_reconstruct(index: faiss.Index) -> None:
+        """Habilita a reconstrução de vetores em índices IVF (usada pelo MMR na montagem do contexto)."""
         try:
-            logger.info("Carregando índice FAISS...")
-            self.index = faiss.read_index(config.RAG_INDEX_PATH)
+            faiss.extract_index_ivf(index).make_direct_map()
+        except RuntimeError:
+            # Índices que não são IVF já reconstroem (Flat, HNSW) ou não suportam
+            pass
+    
+    @staticmethod
+    def _apply_search_params(index: faiss.Index) -> dict:
+        """
+        Aplica os parâmetros de busca configurados (nprobe, efSearch) quando o índice os suporta.
+        
+        Args:
+            index: Índice FAISS carregado
             
-            logger.info("Carregando chunks de texto...")
-            with open(config.RAG_CHUNKS_PATH, 'r', encoding='utf-8') as f:
-                self.text_chunks = json.load(f)
+        Returns:
+            dict: Parâmetros efetivamente aplicados
+        """
+        applied = {}
+        parameter_space = faiss.ParameterSpace()
+        for name, value in (("nprobe", config.RAG_NPROBE), ("efSearch", config.RAG_EF_SEARCH)):
+            if value <= 0:
+                continue
+            try:
+                parameter_space.set_index_parameter(index, name, value)
+                applied[name] = value
+            except RuntimeError:
+                logger.debug(f"Parâmetro '{name}' não se aplica ao índice {type(index).__name__}")
+        
+        if applied:
+            logger.info(f"Parâmetros de busca FAISS aplicados: {applied}")
+        return applied
+    
+    def find_relevant_context(
+        self,
+        query: str,
+        k: int = None,
+        query_embedding: Optional[np.ndarray] = None,
+        mode: Optional[str] = None
+    ) -> str:
+        """
+        Encontra os chunks de texto mais relevantes para uma consulta.
+        
+        Args:
+            query: Texto da consulta do usuário
+            k: Número máximo de chunks no contexto (usa config.RAG_TOP_K se None)
+            query_embedding: Embedding já calculado da consulta (opcional, evita recalcular)
+            mode: Modo da requisição ('animaguy', 'pitch'), que define o orçamento do contexto
             
-            self.is_loaded = True
-            logger.info(f"Índice RAG carregado com sucesso. Total de chunks: {len(self.text_chunks)}")
-            return True
+        Returns:
+            str: Contexto relevante concatenado, ou string vazia se RAG não disponível
+        """
+        if not self.is_loaded:
+            logger.warning("RAG não está carregado. Tentando carregar...")
+            if not self.load_index():
+                return ""
+        
+        if k is None:
+            k = config.RAG_TOP_K
+            
+        try:
+            # Consultas frequentes são servidas da tabela do warmup
+            warm_context = self._get_warm_context(query, k, mode) if query_embedding is None else None
+            if warm_context is not None:
+                return warm_context
+            
+            # Gera embedding para a consulta (ou recupera do cache)
+            if query_embedding is None:
+                if self._has_lexical_index():
+                    query_embedding = self._embed_with_deadline(self.embed_query, query)
+                else:
+                    query_embedding = self.embed_query(query)
+            
+            return self._search_context([query], query_embedding, k, mode)
             
-        except FileNotFoundError as e:
-            logger.error(f"Arquivos do índice RAG não encontrados: {e}")
-            logger.warning("O serviço continuará sem RAG. As respostas não terão contexto da base de conhecimento.")
-            return False
         except Exception as e:
-            logger.error(f"Erro ao carregar índice RAG: {e}", exc_info=True)
-            return False
+            logger.error(f"Erro durante busca RAG: {e}", exc_info=True)
+            return ""
     
-    def find_relevant_context(self, query: str, k: int = None) -> str:
+    async def find_relevant_context_async(
+        self,
+        query: str,
+        k: int = None,
+        query_embedding: Optional[np.ndarray] = None,
+        mode: Optional[str] = None
+    ) -> str:
         """
-        Encontra os chunks de texto mais relevantes para uma consulta.
+        Versão assíncrona de find_relevant_context (embedding sem bloquear o event loop).
         
         Args:
             query: Texto da consulta do usuário
-            k: Número de chunks a recuperar (usa config.RAG_TOP_K se None)
+            k: Número máximo de chunks no contexto (usa config.RAG_TOP_K se None)
+            query_embedding: Embedding já calculado da consulta (opcional, evita recalcular)
+            mode: Modo da requisição ('animaguy', 'pitch'), que define o orçamento do contexto
             
         Returns:
             str: Contexto relevante concatenado, ou string vazia se RAG não disponível
         """
+        if not self.is_loaded:
+            logger.warning("RAG não está carregado. Tentando carregar...")
+            if not await asyncio.to_thread(self.load_index):
+                return ""
+        
+        if k is None:
+            k = config.RAG_TOP_K
+            
+        try:
+            warm_context = self._get_warm_context(query, k, mode) if query_embedding is None else None
+            if warm_context is not None:
+                return warm_context
+            
+            if query_embedding is None:
+                if self._has_lexical_index():
+                    query_embedding = await self._embed_with_deadline_async(self.embed_query_async(query))
+                else:
+                    query_embedding = await self.embed_query_async(query)
+            
+            # A busca FAISS é local e libera o GIL; roda fora do event loop
+            return await asyncio.to_thread(self._search_context, [query], query_embedding, k, mode)
+            
+        except Exception as e:
+            logger.error(f"Erro durante busca RAG: {e}", exc_info=True)
+            return ""
+    
+    def find_relevant_context_multi(
+        self,
+        queries: List[str],
+        k: int = None,
+        mode: Optional[str] = None
+    ) -> str:
+        """
+        Encontra os chunks mais relevantes para várias consultas de uma vez.
+        
+        As consultas (ex: a mensagem do usuário, o resumo do histórico e frases
+        de um pitch) são embutidas em uma única chamada em lote e buscadas em
+        uma única chamada index.search sobre a matriz de consultas; os
+        resultados são fundidos e deduplicados.
+        
+        Args:
+            queries: Consultas, da principal para as complementares
+            k: Número máximo de chunks no contexto (usa config.RAG_TOP_K se None)
+            mode: Modo da requisição ('animaguy', 'pitch'), que define o orçamento do contexto
+            
+        Returns:
+            str: Contexto relevante concatenado, ou string vazia se RAG não disponível
+        """
+        queries = self._unique_queries(queries)
+        if len(queries) <= 1:
+            return self.find_relevant_context(queries[0], k=k, mode=mode) if queries else ""
+        
         if not self.is_loaded:
             logger.warning("RAG não está carregado. Tentando carregar...")
             if not self.load_index():
@@ -72,36 +396,511 @@ class RAGService:
         
         if k is None:
             k = config.RAG_TOP_K
+        
+        try:
+            if self._has_lexical_index():
+                query_embeddings = self._embed_with_deadline(self.embed_queries, queries)
+            else:
+                query_embeddings = self.embed_queries(queries)
+            
+            return self._search_context(queries, query_embeddings, k, mode)
+            
+        except Exception as e:
+            logger.error(f"Erro durante busca RAG com múltiplas consultas: {e}", exc_info=True)
+            return ""
+    
+    async def find_relevant_context_multi_async(
+        self,
+        queries: List[str],
+        k: int = None,
+        mode: Optional[str] = None
+    ) -> str:
+        """
+        Versão assíncrona de find_relevant_context_multi.
+        
+        Args:
+            queries: Consultas, da principal para as complementares
+            k: Número máximo de chunks no contexto (usa config.RAG_TOP_K se None)
+            mode: Modo da requisição ('animaguy', 'pitch'), que define o orçamento do contexto
             
+        Returns:
+            str: Contexto relevante concatenado, ou string vazia se RAG não disponível
+        """
+        queries = self._unique_queries(queries)
+        if len(queries) <= 1:
+            return await self.find_relevant_context_async(queries[0], k=k, mode=mode) if queries else ""
+        
+        if not self.is_loaded:
+            logger.warning("RAG não está carregado. Tentando carregar...")
+            if not await asyncio.to_thread(self.load_index):
+                return ""
+        
+        if k is None:
+            k = config.RAG_TOP_K
+        
         try:
-            # Gera embedding para a consulta
-            logger.debug(f"Gerando embedding para consulta: '{query[:50]}...'")
-            result = genai.embed_content(
+            if self._has_lexical_index():
+                query_embeddings = await self._embed_with_deadline_async(self.embed_queries_async(queries))
+            else:
+                query_embeddings = await self.embed_queries_async(queries)
+            
+            return await asyncio.to_thread(self._search_context, queries, query_embeddings, k, mode)
+            
+        except Exception as e:
+            logger.error(f"Erro durante busca RAG com múltiplas consultas: {e}", exc_info=True)
+            return ""
+    
+    def _search_context(
+        self,
+        queries: List[str],
+        query_embeddings: Optional[np.ndarray],
+        k: int,
+        mode: Optional[str] = None
+    ) -> str:
+        """
+        Busca os chunks mais relevantes e monta o contexto.
+        
+        Busca RAG_HYBRID_CANDIDATES candidatos por consulta (com o índice
+        lexical, as buscas densa e BM25 são fundidas por Reciprocal Rank Fusion;
+        sem embeddings, usa apenas a busca lexical) e delega ao ContextAssembler
+        o filtro por similaridade, o MMR e o orçamento de caracteres do modo.
+        
+        Args:
+            queries: Textos das consultas (busca lexical)
+            query_embeddings: Embeddings das consultas, formato (n, dim), ou None
+            k: Número máximo de chunks no contexto
+            mode: Modo da requisição (orçamento do contexto)
+            
+        Returns:
+            str: Contexto relevante concatenado
+        """
+        # Referência única ao estado: uma recarga concorrente não afeta esta busca
+        state = self._state
+        candidates = max(k, config.RAG_HYBRID_CANDIDATES)
+        
+        rankings = []
+        if query_embeddings is not None:
+            # Uma única busca FAISS para a matriz de consultas (distâncias recalculadas como cosseno na montagem)
+            with stage_timer("index_search"):
+                distances, indices = state.index.search(query_embeddings, candidates)
+            for row in indices:
+                rankings.append([int(idx) for idx in row if 0 <= idx < len(state.text_chunks)])
+        
+        if state.lexical_index is not None:
+            with stage_timer("bm25_search"):
+                for query in queries:
+                    rankings.append([chunk_id for chunk_id, _ in state.lexical_index.search(query, candidates)])
+        
+        # A fusão também remove os chunks repetidos entre as consultas
+        candidate_ids = reciprocal_rank_fusion(rankings, candidates, config.RAG_RRF_K)
+        
+        search_mode = "híbrida" if query_embeddings is not None and state.lexical_index is not None else (
+            "densa" if query_embeddings is not None else "lexical"
+        )
+        logger.info(f"Busca {search_mode}: {len(candidate_ids)} candidatos para {len(queries)} consulta(s).")
+        
+        with stage_timer("context_assembly"):
+            context = context_assembler.assemble(
+                state.index, state.text_chunks, candidate_ids, query_embeddings, k, mode
+            )
+        logger.debug(f"Contexto gerado (primeiros 200 chars): {context[:200]}...")
+        
+        return context
+    
+    def key_phrases(self, text: str) -> List[str]:
+        """
+        Extrai frases-chave de um texto para usar como consultas extras na busca.
+        
+        Args:
+            text: Texto de origem (ex: pitch em texto)
+            
+        Returns:
+            List[str]: Até config.RAG_KEY_PHRASES_MAX frases, na ordem do texto
+        """
+        state = self._state
+        return extract_key_phrases(
+            text,
+            config.RAG_KEY_PHRASES_MAX,
+            lexical_index=state.lexical_index if state is not None else None,
+            max_chars=config.RAG_KEY_PHRASE_MAX_CHARS
+        )
+    
+    def _has_lexical_index(self) -> bool:
+        state = self._state
+        return state is not None and state.lexical_index is not None
+    
+    def _embed_with_deadline(self, embed_fn, *args) -> Optional[np.ndarray]:
+        """
+        Gera embeddings com prazo de RAG_EMBEDDING_DEADLINE segundos.
+        
+        Se a API falhar ou demorar, retorna None (a busca segue só com o índice
+        lexical); a chamada lenta continua em segundo plano e alimenta o cache.
+        
+        Args:
+            embed_fn: embed_query ou embed_queries
+            *args: Consulta(s) repassada(s) a embed_fn
+            
+        Returns:
+            np.ndarray: Embedding(s) das consultas, ou None
+        """
+        future = self._embedding_executor.submit(embed_fn, *args)
+        try:
+            return future.result(timeout=config.RAG_EMBEDDING_DEADLINE)
+        except FutureTimeoutError:
+            logger.warning(f"Embedding excedeu {config.RAG_EMBEDDING_DEADLINE}s; usando apenas a busca lexical")
+        except Exception as e:
+            logger.warning(f"Falha no embedding da consulta; usando apenas a busca lexical: {e}")
+        self.lexical_fallbacks += 1
+        return None
+    
+    async def _embed_with_deadline_async(self, embedding_coro) -> Optional[np.ndarray]:
+        """
+        Versão assíncrona de _embed_with_deadline.
+        
+        Args:
+            embedding_coro: Corrotina de embed_query_async ou embed_queries_async
+            
+        Returns:
+            np.ndarray: Embedding(s) das consultas, ou None
+        """
+        task = asyncio.ensure_future(embedding_coro)
+        try:
+            # shield: o prazo não cancela a chamada, que ainda alimenta o cache
+            return await asyncio.wait_for(asyncio.shield(task), config.RAG_EMBEDDING_DEADLINE)
+        except asyncio.TimeoutError:
+            logger.warning(f"Embedding excedeu {config.RAG_EMBEDDING_DEADLINE}s; usando apenas a busca lexical")
+            # Consome um eventual erro posterior da chamada em segundo plano
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        except Exception as e:
+            logger.warning(f"Falha no embedding da consulta; usando apenas a busca lexical: {e}")
+        self.lexical_fallbacks += 1
+        return None
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Gera o embedding de uma consulta, usando o cache em memória quando possível.
+        
+        Args:
+            query: Texto da consulta do usuário
+            
+        Returns:
+            np.ndarray: Matriz float32 de formato (1, dim) pronta para o FAISS
+        """
+        normalized_query = self._normalize_query(query)
+        query_embedding = self._warm_embeddings.get(normalized_query)
+        if query_embedding is not None:
+            return query_embedding
+        
+        cache_key = (config.EMBEDDING_MODEL, normalized_query)
+        query_embedding = self.embedding_cache.get(cache_key)
+        if query_embedding is not None:
+            logger.debug(f"Embedding recuperado do cache para consulta: '{query[:50]}...'")
+            return query_embedding
+        
+        # Consultas idênticas simultâneas compartilham uma única chamada de embedding
+        query_embedding, _ = embedding_flight.do(cache_key, lambda: self._generate_embedding(query, cache_key))
+        return query_embedding
+    
+    def _generate_embedding(self, query: str, cache_key: tuple) -> np.ndarray:
+        """Chama a API de embeddings e armazena o resultado no cache."""
+        logger.debug(f"Gerando embedding para consulta: '{query[:50]}...'")
+        with stage_timer("embed_content"):
+            result = gemini_policy.call(
+                genai.embed_content,
+                call_class=CALL_EMBED,
                 model=config.EMBEDDING_MODEL,
                 content=query,
-                task_type="retrieval_query"
+                task_type="retrieval_query",
+                request_options={"timeout": config.EMBEDDING_TIMEOUT}
             )
-            query_embedding = np.array([result['embedding']], dtype='float32')
+        query_embedding = np.array([result['embedding']], dtype='float32')
+        self.embedding_cache.set(cache_key, query_embedding)
+        return query_embedding
+    
+    async def embed_query_async(self, query: str) -> np.ndarray:
+        """
+        Versão assíncrona de embed_query.
+        
+        Args:
+            query: Texto da consulta do usuário
             
-            # Busca no índice FAISS
-            distances, indices = self.index.search(query_embedding, k)
+        Returns:
+            np.ndarray: Matriz float32 de formato (1, dim) pronta para o FAISS
+        """
+        normalized_query = self._normalize_query(query)
+        query_embedding = self._warm_embeddings.get(normalized_query)
+        if query_embedding is not None:
+            return query_embedding
+        
+        cache_key = (config.EMBEDDING_MODEL, normalized_query)
+        query_embedding = self.embedding_cache.get(cache_key)
+        if query_embedding is not None:
+            logger.debug(f"Embedding recuperado do cache para consulta: '{query[:50]}...'")
+            return query_embedding
+        
+        query_embedding, _ = await embedding_flight.do_async(
+            cache_key, lambda: self._generate_embedding_async(query, cache_key)
+        )
+        return query_embedding
+    
+    async def _generate_embedding_async(self, query: str, cache_key: tuple) -> np.ndarray:
+        """Versão assíncrona de _generate_embedding."""
+        logger.debug(f"Gerando embedding para consulta: '{query[:50]}...'")
+        embed_kwargs = {
+            "model": config.EMBEDDING_MODEL,
+            "content": query,
+            "task_type": "retrieval_query",
+            "request_options": {"timeout": config.EMBEDDING_TIMEOUT}
+        }
+        embed_content_async = getattr(genai, "embed_content_async", None)
+        with stage_timer("embed_content"):
+            if embed_content_async is not None:
+                result = await gemini_policy.call_async(embed_content_async, call_class=CALL_EMBED, timeout=config.EMBEDDING_TIMEOUT, **embed_kwargs)
+            else:
+                # Versões do SDK sem embedding assíncrono nativo
+                result = await asyncio.to_thread(gemini_policy.call, genai.embed_content, call_class=CALL_EMBED, **embed_kwargs)
+        query_embedding = np.array([result['embedding']], dtype='float32')
+        self.embedding_cache.set(cache_key, query_embedding)
+        return query_embedding
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Gera os embeddings de várias consultas com uma única chamada em lote.
+        
+        Consultas do warmup ou do cache não são reenviadas à API.
+        
+        Args:
+            queries: Textos das consultas
             
-            # Concatena os chunks relevantes
-            context_parts = []
-            for idx in indices[0]:
-                if 0 <= idx < len(self.text_chunks):
-                    context_parts.append(self.text_chunks[idx])
+        Returns:
+            np.ndarray: Matriz float32 de formato (len(queries), dim) pronta para o FAISS
+        """
+        embeddings, missing = self._lookup_embeddings(queries)
+        for batch_start in range(0, len(missing), config.RAG_EMBED_BATCH_SIZE):
+            batch = missing[batch_start:batch_start + config.RAG_EMBED_BATCH_SIZE]
+            with stage_timer("embed_content"):
+                result = gemini_policy.call(
+                    genai.embed_content,
+                    call_class=CALL_EMBED,
+                    model=config.EMBEDDING_MODEL,
+                    content=[queries[position] for position in batch],
+                    task_type="retrieval_query",
+                    request_options={"timeout": config.EMBEDDING_TIMEOUT}
+                )
+            self._store_embeddings(queries, batch, result['embedding'], embeddings)
+        return np.vstack(embeddings)
+    
+    async def embed_queries_async(self, queries: List[str]) -> np.ndarray:
+        """
+        Versão assíncrona de embed_queries.
+        
+        Args:
+            queries: Textos das consultas
             
-            context = "\n\n---\n\n".join(context_parts)
+        Returns:
+            np.ndarray: Matriz float32 de formato (len(queries), dim) pronta para o FAISS
+        """
+        embeddings, missing = self._lookup_embeddings(queries)
+        for batch_start in range(0, len(missing), config.RAG_EMBED_BATCH_SIZE):
+            batch = missing[batch_start:batch_start + config.RAG_EMBED_BATCH_SIZE]
+            embed_kwargs = {
+                "model": config.EMBEDDING_MODEL,
+                "content": [queries[position] for position in batch],
+                "task_type": "retrieval_query",
+                "request_options": {"timeout": config.EMBEDDING_TIMEOUT}
+            }
+            embed_content_async = getattr(genai, "embed_content_async", None)
+            with stage_timer("embed_content"):
+                if embed_content_async is not None:
+                    result = await gemini_policy.call_async(embed_content_async, call_class=CALL_EMBED, timeout=config.EMBEDDING_TIMEOUT, **embed_kwargs)
+                else:
+                    result = await asyncio.to_thread(gemini_policy.call, genai.embed_content, call_class=CALL_EMBED, **embed_kwargs)
+            self._store_embeddings(queries, batch, result['embedding'], embeddings)
+        return np.vstack(embeddings)
+    
+    def prefetch_embeddings(self, queries: List[str]) -> int:
+        """
+        Gera em lote e guarda no cache os embeddings de consultas que serão buscadas em seguida.
+        
+        Args:
+            queries: Textos das consultas (ex: de todos os itens de um batch)
             
-            logger.info(f"Encontrados {len(context_parts)} chunks relevantes para a consulta.")
-            logger.debug(f"Contexto gerado (primeiros 200 chars): {context[:200]}...")
+        Returns:
+            int: Número de consultas que precisaram de embedding
+        """
+        queries = self._unique_queries(queries)
+        if not queries or not self.embedding_cache.max_size:
+            return 0
+        
+        _, missing = self._lookup_embeddings(queries)
+        if missing:
+            try:
+                self.embed_queries([queries[position] for position in missing])
+            except Exception as e:
+                # Os itens ainda geram os próprios embeddings na busca
+                logger.warning(f"Falha ao pré-calcular embeddings em lote: {e}")
+                return 0
+        logger.info(f"Embeddings pré-calculados em lote: {len(missing)} de {len(queries)} consultas")
+        return len(missing)
+    
+    def _lookup_embeddings(self, queries: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Busca os embeddings no warmup e no cache; retorna a lista parcial e as posições faltantes."""
+        embeddings: List[Optional[np.ndarray]] = []
+        missing: List[int] = []
+        for position, query in enumerate(queries):
+            normalized_query = self._normalize_query(query)
+            query_embedding = self._warm_embeddings.get(normalized_query)
+            if query_embedding is None:
+                query_embedding = self.embedding_cache.get((config.EMBEDDING_MODEL, normalized_query))
+            if query_embedding is None:
+                missing.append(position)
+            embeddings.append(query_embedding)
+        return embeddings, missing
+    
+    def _store_embeddings(
+        self,
+        queries: List[str],
+        positions: List[int],
+        vectors: List[List[float]],
+        embeddings: List[Optional[np.ndarray]]
+    ) -> None:
+        """Preenche as posições faltantes com os embeddings gerados e os guarda no cache."""
+        for position, vector in zip(positions, vectors):
+            query_embedding = np.array([vector], dtype='float32')
+            embeddings[position] = query_embedding
+            self.embedding_cache.set((config.EMBEDDING_MODEL, self._normalize_query(queries[position])), query_embedding)
+    
+    def warmup(self, queries: List[str]) -> dict:
+        """
+        Pré-calcula embeddings (em lotes) e contextos de consultas frequentes.
+        
+        Os embeddings (do texto original da consulta) ficam em uma tabela sem
+        expiração, indexada pela consulta normalizada; os contextos são
+        recalculados localmente, sem chamadas à API, quando o índice é recarregado.
+        Os mapas são montados à parte e publicados ao final.
+        
+        Args:
+            queries: Consultas a pré-calcular (ex: a consulta fixa do pitch com áudio)
             
-            return context
+        Returns:
+            dict: Consultas, embeddings gerados, contextos e duração do warmup
+        """
+        start_time = time.monotonic()
+        warm_queries = dict(self._warm_queries)
+        warm_embeddings = dict(self._warm_embeddings)
+        warm_contexts = {}
+        pending = {}
+        for query in queries:
+            normalized_query = self._normalize_query(query)
+            if normalized_query and normalized_query not in warm_embeddings and normalized_query not in pending:
+                pending[normalized_query] = query
+        
+        embedded = 0
+        error = None
+        try:
+            pending_queries = list(pending.items())
+            for batch_start in range(0, len(pending_queries), config.RAG_EMBED_BATCH_SIZE):
+                batch = pending_queries[batch_start:batch_start + config.RAG_EMBED_BATCH_SIZE]
+                result = gemini_policy.call(
+                    genai.embed_content,
+                    call_class=CALL_EMBED,
+                    model=config.EMBEDDING_MODEL,
+                    content=[query for _, query in batch],
+                    task_type="retrieval_query",
+                    request_options={"timeout": config.EMBEDDING_TIMEOUT}
+                )
+                for (normalized_query, query), embedding in zip(batch, result['embedding']):
+                    warm_queries[normalized_query] = query
+                    warm_embeddings[normalized_query] = np.array([embedding], dtype='float32')
+                    embedded += 1
             
+            state = self._state
+            if state is not None:
+                for normalized_query, query_embedding in warm_embeddings.items():
+                    for mode in config.RAG_CONTEXT_MAX_CHARS:
+                        warm_contexts[(normalized_query, mode)] = (
+                            state.version,
+                            self._search_context([warm_queries[normalized_query]], query_embedding, config.RAG_TOP_K, mode)
+                        )
         except Exception as e:
-            logger.error(f"Erro durante busca RAG: {e}", exc_info=True)
-            return ""
+            # O warmup é uma otimização: falhas não impedem a inicialização
+            error = str(e)
+            logger.warning(f"Falha no warmup do RAG: {e}")
+        
+        # Publica os mapas prontos (embeddings por último: são eles que habilitam a consulta)
+        self._warm_queries = warm_queries
+        self._warm_contexts = warm_contexts
+        self._warm_embeddings = warm_embeddings
+        contexts = len(warm_contexts)
+        
+        self.warmup_stats = {
+            "queries": len(warm_embeddings),
+            "embedded": embedded,
+            "contexts": contexts,
+            "seconds": round(time.monotonic() - start_time, 3),
+            "error": error
+        }
+        logger.info(
+            f"Warmup do RAG: {embedded} embeddings em lote e {contexts} contextos "
+            f"em {self.warmup_stats['seconds']}s"
+        )
+        return self.warmup_stats
+    
+    def _get_warm_context(
+        self,
+        query: str,
+        k: int,
+        mode: Optional[str] = None,
+        count_hit: bool = True
+    ) -> Optional[str]:
+        """
+        Retorna o contexto pré-calculado de uma consulta do warmup, se houver.
+        
+        Args:
+            query: Texto da consulta
+            k: Número de chunks pedido (apenas RAG_TOP_K é pré-calculado)
+            mode: Modo da requisição (cada modo tem seu orçamento de contexto)
+            count_hit: Contabiliza o uso nas estatísticas
+            
+        Returns:
+            str: Contexto da versão atual do índice, ou None se a consulta não é do warmup
+        """
+        if k != config.RAG_TOP_K or not self._warm_embeddings:
+            return None
+        
+        normalized_query = self._normalize_query(query)
+        query_embedding = self._warm_embeddings.get(normalized_query)
+        state = self._state
+        if query_embedding is None or state is None:
+            return None
+        
+        key = (normalized_query, mode)
+        cached = self._warm_contexts.get(key)
+        if cached is None or cached[0] != state.version:
+            # Índice recarregado: recalcula com o embedding já conhecido (busca local)
+            warm_query = self._warm_queries.get(normalized_query, query)
+            cached = (state.version, self._search_context([warm_query], query_embedding, k, mode))
+            # Publica uma cópia com o novo contexto (o mapa compartilhado não é alterado)
+            self._warm_contexts = {**self._warm_contexts, key: cached}
+        
+        if count_hit:
+            self.warm_hits += 1
+        return cached[1]
+    
+    @classmethod
+    def _unique_queries(cls, queries: List[str]) -> List[str]:
+        """Remove consultas vazias e repetidas (após normalização), preservando a ordem."""
+        unique = {}
+        for query in queries:
+            normalized_query = cls._normalize_query(query or "")
+            if normalized_query and normalized_query not in unique:
+                unique[normalized_query] = query
+        return list(unique.values())
+    
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Normaliza a consulta (espaços e caixa) para uso como chave de cache."""
+        return " ".join(query.split()).casefold()
     
     def is_available(self) -> bool:
         """
@@ -110,7 +909,17 @@ class RAGService:
         Returns:
             bool: True se o índice está carregado e pronto para uso
         """
-        return self.is_loaded and self.index is not None and self.text_chunks is not None
+        return self._state is not None
+
+
+def _get_rss_mb() -> float:
+    """Retorna a memória residente atual do processo em MB (pico, se /proc indisponível)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
 
 
 # Instância global do serviço RAG (singleton)
@@ -0,0 +1,167 @@
+"""
+Cache semântico de respostas do AnimaGuy.
+
+Armazena embeddings de perguntas já respondidas em um pequeno índice vetorial
+em memória e devolve a resposta armazenada quando uma nova pergunta é
+suficientemente similar (similaridade de cosseno acima do limiar configurado).
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Armazenamento vetorial em memória de perguntas e respostas recentes."""
+    
+    def __init__(self, max_size: int, ttl_seconds: float, threshold: float):
+        """
+        Inicializa o cache semântico.
+        
+        Args:
+            max_size: Número máximo de perguntas armazenadas
+            ttl_seconds: Tempo de vida de cada entrada em segundos (<= 0 desativa a expiração)
+            threshold: Similaridade de cosseno mínima para considerar um acerto
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (max_size, dim), normalizados
+        self._answers: list = [None] * max_size
+        self._created_at = np.zeros(max_size, dtype='float64')
+        self._last_used = np.zeros(max_size, dtype='float64')
+        self._size = 0
+        self._index_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def lookup(self, query_embedding: np.ndarray, index_version: int) -> Optional[str]:
+        """
+        Procura uma resposta armazenada para uma pergunta semanticamente equivalente.
+        
+        Args:
+            query_embedding: Embedding da pergunta, formato (1, dim) ou (dim,)
+            index_version: Versão atual do índice RAG (entradas de outra versão são descartadas)
+        
+        Returns:
+            str: Resposta armazenada, ou None se não houver vizinho acima do limiar
+        """
+        query = self._normalize(query_embedding)
+        
+        with self._lock:
+            self._check_version(index_version)
+            
+            if self._size == 0 or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            
+            now = time.monotonic()
+            similarities = self._vectors[:self._size] @ query
+            if self.ttl_seconds > 0:
+                expired = self._created_at[:self._size] + self.ttl_seconds <= now
+                similarities[expired] = -1.0
+            
+            best = int(np.argmax(similarities))
+            best_similarity = float(similarities[best])
+            if best_similarity < self.threshold:
+                self.misses += 1
+                return None
+            
+            self._last_used[best] = now
+            self.hits += 1
+            logger.info(f"Cache semântico: acerto com similaridade {best_similarity:.4f}")
+            return self._answers[best]
+    
+    def add(self, query_embedding: np.ndarray, answer: str, index_version: int) -> None:
+        """
+        Armazena uma pergunta respondida, descartando a entrada expirada ou menos usada se cheio.
+        
+        Args:
+            query_embedding: Embedding da pergunta, formato (1, dim) ou (dim,)
+            answer: Resposta gerada para a pergunta
+            index_version: Versão do índice RAG usada para gerar a resposta
+        """
+        if self.max_size <= 0:
+            return
+        
+        query = self._normalize(query_embedding)
+        
+        with self._lock:
+            self._check_version(index_version)
+            
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self._vectors = np.zeros((self.max_size, query.shape[0]), dtype='float32')
+                self._size = 0
+            
+            now = time.monotonic()
+            if self._size < self.max_size:
+                slot = self._size
+                self._size += 1
+            else:
+                expired = np.flatnonzero(self._created_at + self.ttl_seconds <= now) if self.ttl_seconds > 0 else []
+                slot = int(expired[0]) if len(expired) else int(np.argmin(self._last_used))
+                self.evictions += 1
+            
+            self._vectors[slot] = query
+            self._answers[slot] = answer
+            self._created_at[slot] = now
+            self._last_used[slot] = now
+    
+    def invalidate(self) -> None:
+        """Remove todas as entradas (ex.: após atualização do índice RAG)."""
+        with self._lock:
+            self._clear()
+        logger.info("Cache semântico invalidado.")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas de uso do cache.
+        
+        Returns:
+            Dict: Tamanho, capacidade, limiar, hits, misses e evictions
+        """
+        with self._lock:
+            return {
+                "enabled": config.SEMANTIC_CACHE_ENABLED,
+                "size": self._size,
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+    
+    def _check_version(self, index_version: int) -> None:
+        """Descarta o conteúdo se o índice RAG mudou desde a última operação."""
+        if self._index_version != index_version:
+            if self._size:
+                logger.info("Índice RAG atualizado - descartando cache semântico.")
+            self._clear()
+            self._index_version = index_version
+    
+    def _clear(self) -> None:
+        self._size = 0
+        self._answers = [None] * self.max_size
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype='float32').reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+# Instância global do cache semântico (singleton)
+semantic_cache = SemanticCache(
+    max_size=config.SEMANTIC_CACHE_MAX_SIZE,
+    ttl_seconds=config.SEMANTIC_CACHE_TTL,
+    threshold=config.SEMANTIC_CACHE_THRESHOLD
+)
@@ -0,0 +1,221 @@
+"""
+Política de histórico das sessões do AnimaGuy.
+
+O modelo recebe apenas um resumo compacto dos turnos antigos seguido de uma
+janela com os últimos ANIMAGUY_HISTORY_MAX_TURNS turnos, de modo que o tamanho
+do prompt (e a latência) não cresce com a duração da conversa. Cada turno é
+gravado como um documento novo no Firestore (append-only) e os turnos que saem
+da janela são resumidos em segundo plano, fora do caminho da requisição.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import config
+from models import PROMPT_HISTORY_SUMMARY, HISTORY_SUMMARY_USER_MESSAGE, HISTORY_SUMMARY_MODEL_MESSAGE
+from utils import firestore_client, session_cache, stage_timer
+from .gemini_service import gemini_service
+
+logger = logging.getLogger(__name__)
+
+
+class SessionHistoryService:
+    """Carrega a janela de histórico das sessões e mantém o resumo dos turnos antigos."""
+    
+    def __init__(self, max_turns: int, summary_enabled: bool, summary_batch: int):
+        """
+        Inicializa o serviço de histórico.
+        
+        Args:
+            max_turns: Turnos recentes enviados ao modelo
+            summary_enabled: Se turnos fora da janela devem ser resumidos
+            summary_batch: Turnos antigos acumulados antes de disparar um novo resumo
+        """
+        self.max_turns = max_turns
+        self.summary_enabled = summary_enabled
+        self.summary_batch = max(1, summary_batch)
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+        self._in_progress = set()
+        self._lock = threading.Lock()
+        self.summaries = 0
+        self.summary_errors = 0
+    
+    def load(self, session_id: str) -> Dict[str, Any]:
+        """
+        Carrega o histórico limitado de uma sessão.
+        
+        Args:
+            session_id: ID da sessão
+        
+        Returns:
+            Dict: 'history' (mensagens no formato do Gemini), 'window', 'turn_count', 'summarized_turns' e 'summary'
+        """
+        window = session_cache.get(session_id) if session_cache.enabled else None
+        if window is None:
+            with stage_timer("session_load"):
+                window = firestore_client.get_session_window(session_id, self.max_turns)
+            session_cache.put(session_id, window)
+        return self._build_session(window)
+    
+    async def load_async(self, session_id: str) -> Dict[str, Any]:
+        """
+        Versão assíncrona de load.
+        
+        Args:
+            session_id: ID da sessão
+        
+        Returns:
+            Dict: 'history' (mensagens no formato do Gemini), 'window', 'turn_count', 'summarized_turns' e 'summary'
+        """
+        window = session_cache.get(session_id) if session_cache.enabled else None
+        if window is None:
+            with stage_timer("session_load"):
+                window = await firestore_client.get_session_window_async(session_id, self.max_turns)
+            session_cache.put(session_id, window)
+        return self._build_session(window)
+    
+    def empty(self) -> Dict[str, Any]:
+        """Histórico de uma sessão nova (evita leitura no Firestore)."""
+        return self._build_session({"turns": [], "summary": None, "turn_count": 0, "summarized_turns": 0})
+    
+    def append(self, session: Dict[str, Any], session_id: str, text: str, answer: str) -> None:
+        """
+        Grava o novo turno da sessão e agenda o resumo dos turnos antigos, se necessário.
+        
+        Com o cache de sessões ativo, o turno é gravado em segundo plano (write-behind);
+        sem ele, o número do turno é alocado em uma transação do Firestore.
+        
+        Args:
+            session: Histórico carregado por load/load_async
+            session_id: ID da sessão
+            text: Mensagem do usuário
+            answer: Resposta do modelo
+        """
+        if session_cache.enabled:
+            turn_number = session_cache.record_turn(session_id, session["window"], text, answer, self.max_turns)
+            self._maybe_summarize(session, session_id, turn_number)
+            return
+        
+        with stage_timer("session_save"):
+            turn_number = firestore_client.append_session_turn(session_id, text, answer)
+        if turn_number is not None:
+            self._maybe_summarize(session, session_id, turn_number)
+    
+    async def append_async(self, session: Dict[str, Any], session_id: str, text: str, answer: str) -> None:
+        """
+        Versão assíncrona de append.
+        
+        Args:
+            session: Histórico carregado por load/load_async
+            session_id: ID da sessão
+            text: Mensagem do usuário
+            answer: Resposta do modelo
+        """
+        if session_cache.enabled:
+            turn_number = session_cache.record_turn(session_id, session["window"], text, answer, self.max_turns)
+            self._maybe_summarize(session, session_id, turn_number)
+            return
+        
+        with stage_timer("session_save"):
+            turn_number = await firestore_client.append_session_turn_async(session_id, text, answer)
+        if turn_number is not None:
+            self._maybe_summarize(session, session_id, turn_number)
+    
+    def _build_session(self, window: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte a janela lida do Firestore nas mensagens enviadas ao modelo."""
+        history: List[Dict[str, Any]] = []
+        if window["summary"]:
+            history.append({"role": "user", "parts": [HISTORY_SUMMARY_USER_MESSAGE.format(summary=window["summary"])]})
+            history.append({"role": "model", "parts": [HISTORY_SUMMARY_MODEL_MESSAGE]})
+        
+        for turn in window["turns"]:
+            history.append({"role": "user", "parts": [turn["user"]]})
+            history.append({"role": "model", "parts": [turn["model"]]})
+        
+        return {
+            "window": window,
+            "history": history,
+            "turn_count": window["turn_count"],
+            "summarized_turns": window["summarized_turns"],
+            "summary": window["summary"]
+        }
+    
+    def _maybe_summarize(self, session: Dict[str, Any], session_id: str, turn_number: int) -> None:
+        """Agenda o resumo quando turnos suficientes saíram da janela."""
+        if not self.summary_enabled:
+            return
+        
+        last_outside_window = turn_number - self.max_turns
+        if last_outside_window - session.get("summarized_turns", 0) < self.summary_batch:
+            return
+        
+        with self._lock:
+            if session_id in self._in_progress:
+                return
+            self._in_progress.add(session_id)
+        
+        self._executor.submit(
+            self._summarize,
+            session_id,
+            session.get("summary"),
+            session.get("summarized_turns", 0),
+            last_outside_window
+        )
+    
+    def _summarize(self, session_id: str, summary: Optional[str], summarized_turns: int, last_turn: int) -> None:
+        """Resume os turnos (summarized_turns, last_turn] no resumo acumulado da sessão."""
+        try:
+            # Garante que turnos ainda em memória (write-behind) estejam no Firestore
+            if session_cache.enabled:
+                session_cache.flush()
+            
+            turns = firestore_client.get_session_turns(session_id, summarized_turns + 1, last_turn)
+            if not turns:
+                return
+            
+            formatted_turns = "\n\n".join(
+                f"Usuário: {turn['user']}\nAnimaguy: {turn['model']}" for turn in turns
+            )
+            prompt = PROMPT_HISTORY_SUMMARY.format(
+                summary=summary or "(vazio)",
+                turns=formatted_turns
+            )
+            new_summary = gemini_service.summarize_conversation(prompt)
+            
+            if firestore_client.save_session_summary(session_id, new_summary, turns[-1]["turn"]):
+                session_cache.update_summary(session_id, new_summary, turns[-1]["turn"])
+                self.summaries += 1
+                logger.info(f"Turnos {summarized_turns + 1}-{turns[-1]['turn']} da sessão {session_id} resumidos")
+        
+        except Exception as e:
+            self.summary_errors += 1
+            logger.error(f"Erro ao resumir histórico da sessão {session_id}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._in_progress.discard(session_id)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna a política e os contadores de resumo do histórico.
+        
+        Returns:
+            Dict: Janela, configuração de resumo, resumos gerados, erros e resumos em andamento
+        """
+        return {
+            "max_turns": self.max_turns,
+            "summary_enabled": self.summary_enabled,
+            "summary_batch": self.summary_batch,
+            "summaries": self.summaries,
+            "summary_errors": self.summary_errors,
+            "summaries_in_progress": len(self._in_progress)
+        }
+
+
+# Instância global do serviço de histórico (singleton)
+session_history = SessionHistoryService(
+    max_turns=config.ANIMAGUY_HISTORY_MAX_TURNS,
+    summary_enabled=config.ANIMAGUY_HISTORY_SUMMARY_ENABLED,
+    summary_batch=config.ANIMAGUY_HISTORY_SUMMARY_BATCH
+)
@@ -2,9 +2,22 @@
 Serviço para integração com Google Cloud Storage.
 """
 
+import base64
+import gzip
+import hashlib
+import json
 import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import storage
-from typing import Optional
+from typing import Any, BinaryIO, Dict, Optional
+
+try:
+    from google.cloud.storage import transfer_manager
+except ImportError:  # Versões antigas do cliente GCS
+    transfer_manager = None
 
 import config
 
@@ -17,6 +30,7 @@ class StorageService:
         """Inicializa o serviço de Storage."""
         self.client: Optional[storage.Client] = None
         self.rag_bucket: Optional[storage.Bucket] = None
+        self.rag_artifact_version: Optional[str] = None  # Gerações dos artefatos baixados por último
         self._initialize()
     
     def _initialize(self):
@@ -33,10 +47,18 @@ class StorageService:
         except Exception as e:
             logger.error(f"Erro ao inicializar cliente GCS: {e}", exc_info=True)
     
-    def download_rag_files(self) -> bool:
+    def download_rag_files(self, index_path: Optional[str] = None, chunks_path: Optional[str] = None) -> bool:
         """
         Baixa os arquivos do índice RAG do GCS para o diretório local /tmp/.
         
+        Artefatos cuja geração no GCS coincide com o manifesto local são mantidos;
+        os demais são baixados em paralelo, verificados (MD5/CRC32C) e, se
+        comprimidos (.gz), descomprimidos.
+        
+        Args:
+            index_path: Destino do índice FAISS (usa config.RAG_INDEX_PATH se None)
+            chunks_path: Destino dos chunks de texto (usa config.RAG_CHUNKS_PATH se None)
+        
         Returns:
             bool: True se download bem-sucedido, False caso contrário
         """
@@ -45,24 +67,166 @@ class StorageService:
             return False
         
         try:
-            # Download do índice FAISS
-            logger.info("Baixando faiss_index.bin do GCS...")
-            index_blob = self.rag_bucket.blob("faiss_index.bin")
-            index_blob.download_to_filename(config.RAG_INDEX_PATH)
-            logger.info(f"faiss_index.bin baixado para {config.RAG_INDEX_PATH}")
+            start_time = time.monotonic()
+            manifest = self._load_manifest()
+            artifacts = [
+                (config.RAG_INDEX_BLOB, index_path or config.RAG_INDEX_PATH),
+                (config.RAG_CHUNKS_BLOB, chunks_path or config.RAG_CHUNKS_PATH)
+            ]
+            
+            with ThreadPoolExecutor(max_workers=len(artifacts)) as executor:
+                entries = list(executor.map(
+                    lambda artifact: self._sync_artifact(artifact[0], artifact[1], manifest.get(artifact[0])),
+                    artifacts
+                ))
             
-            # Download dos chunks de texto
-            logger.info("Baixando text_chunks.json do GCS...")
-            chunks_blob = self.rag_bucket.blob("text_chunks.json")
-            chunks_blob.download_to_filename(config.RAG_CHUNKS_PATH)
-            logger.info(f"text_chunks.json baixado para {config.RAG_CHUNKS_PATH}")
+            for (blob_name, _), entry in zip(artifacts, entries):
+                manifest[blob_name] = entry
+            self._save_manifest(manifest)
+            self.rag_artifact_version = self._format_artifact_version(
+                [entry["generation"] for entry in entries]
+            )
             
+            logger.info(f"Arquivos RAG sincronizados em {time.monotonic() - start_time:.2f}s")
             return True
             
         except Exception as e:
             logger.error(f"Erro ao baixar arquivos RAG do GCS: {e}", exc_info=True)
             return False
     
+    def get_rag_artifact_version(self) -> Optional[str]:
+        """
+        Consulta (apenas metadados) a versão atual dos artefatos RAG no bucket.
+        
+        Returns:
+            str: Identificador formado pelas gerações dos objetos, ou None se indisponível
+        """
+        if not self.rag_bucket:
+            return None
+        
+        generations = []
+        for blob_name in (config.RAG_INDEX_BLOB, config.RAG_CHUNKS_BLOB):
+            blob = self.rag_bucket.get_blob(blob_name)
+            if blob is None:
+                return None
+            generations.append(blob.generation)
+        return self._format_artifact_version(generations)
+    
+    @staticmethod
+    def _format_artifact_version(generations) -> str:
+        return "-".join(str(generation) for generation in generations)
+    
+    def _sync_artifact(self, blob_name: str, local_path: str, manifest_entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Garante que a cópia local de um artefato corresponde à geração atual no GCS.
+        
+        Args:
+            blob_name: Nome do objeto no bucket RAG
+            local_path: Caminho local de destino (já descomprimido)
+            manifest_entry: Entrada do manifesto local para o objeto (se houver)
+            
+        Returns:
+            Dict: Nova entrada do manifesto (geração, hashes e caminho local)
+        """
+        blob = self.rag_bucket.get_blob(blob_name)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{self.rag_bucket.name}/{blob_name} não encontrado")
+        
+        if (
+            manifest_entry
+            and manifest_entry.get("generation") == blob.generation
+            and manifest_entry.get("local_path") == local_path
+            and os.path.exists(local_path)
+            and os.path.getsize(local_path) == manifest_entry.get("local_size")
+        ):
+            logger.info(f"{blob_name} inalterado (geração {blob.generation}) - download ignorado")
+            return manifest_entry
+        
+        download_path = f"{local_path}.download"
+        start_time = time.monotonic()
+        
+        if blob.size and blob.size >= config.RAG_DOWNLOAD_SLICE_THRESHOLD and transfer_manager is not None:
+            logger.info(f"Baixando {blob_name} ({blob.size} bytes) em fatias paralelas...")
+            transfer_manager.download_chunks_concurrently(
+                blob,
+                download_path,
+                chunk_size=config.RAG_DOWNLOAD_SLICE_SIZE,
+                max_workers=config.RAG_DOWNLOAD_SLICE_WORKERS,
+                worker_type=transfer_manager.THREAD
+            )
+        else:
+            logger.info(f"Baixando {blob_name} ({blob.size} bytes) do GCS...")
+            blob.download_to_filename(download_path, checksum=None)  # Verificado abaixo
+        
+        self._verify_checksum(blob, download_path)
+        
+        if blob_name.endswith(".gz"):
+            with gzip.open(download_path, 'rb') as source, open(local_path, 'wb') as target:
+                shutil.copyfileobj(source, target, length=1024 * 1024)
+            os.remove(download_path)
+        else:
+            os.replace(download_path, local_path)
+        
+        elapsed = time.monotonic() - start_time
+        logger.info(f"{blob_name} baixado para {local_path} em {elapsed:.2f}s")
+        
+        return {
+            "generation": blob.generation,
+            "md5_hash": blob.md5_hash,
+            "crc32c": blob.crc32c,
+            "size": blob.size,
+            "local_path": local_path,
+            "local_size": os.path.getsize(local_path)
+        }
+    
+    @staticmethod
+    def _verify_checksum(blob: storage.Blob, path: str) -> None:
+        """
+        Verifica o arquivo baixado contra o MD5 (ou CRC32C, em objetos compostos) do GCS.
+        
+        Raises:
+            ValueError: Se o checksum não confere
+        """
+        if blob.md5_hash:
+            digest = hashlib.md5()
+            expected = blob.md5_hash
+            algorithm = "MD5"
+        else:
+            try:
+                import google_crc32c
+            except ImportError:
+                logger.warning(f"{blob.name} sem MD5 e google_crc32c indisponível - verificação ignorada")
+                return
+            digest = google_crc32c.Checksum()
+            expected = blob.crc32c
+            algorithm = "CRC32C"
+        
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        
+        actual = base64.b64encode(digest.digest()).decode('ascii')
+        if actual != expected:
+            os.remove(path)
+            raise ValueError(f"Checksum {algorithm} inválido para {blob.name}: esperado {expected}, obtido {actual}")
+    
+    @staticmethod
+    def _load_manifest() -> Dict[str, Any]:
+        """Lê o manifesto local dos artefatos RAG (vazio se inexistente ou inválido)."""
+        try:
+            with open(config.RAG_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def _save_manifest(manifest: Dict[str, Any]) -> None:
+        """Grava o manifesto local de forma atômica."""
+        temp_path = f"{config.RAG_MANIFEST_PATH}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, config.RAG_MANIFEST_PATH)
+    
     def upload_file(self, local_path: str, blob_name: str, bucket_name: Optional[str] = None) -> Optional[str]:
         """
         Faz upload de um arquivo para o GCS.
@@ -96,5 +260,33 @@ class StorageService:
             logger.error(f"Erro ao fazer upload de arquivo: {e}", exc_info=True)
             return None
 
+    def download_to_file(self, gcs_uri: str, file_obj: BinaryIO, allowed_prefix: Optional[str] = None) -> int:
+        """
+        Baixa um objeto do GCS para um arquivo (em blocos, sem cópia completa em memória).
+        
+        Args:
+            gcs_uri: URI do objeto (gs://bucket/caminho)
+            file_obj: Arquivo binário de destino
+            allowed_prefix: Prefixo gs:// obrigatório (URIs vindas de requisições)
+            
+        Returns:
+            int: Bytes baixados
+        """
+        if not self.client:
+            raise RuntimeError("Cliente GCS não inicializado.")
+        
+        if not gcs_uri.startswith("gs://") or "/" not in gcs_uri[5:]:
+            raise ValueError(f"URI GCS inválida: {gcs_uri}")
+        
+        if allowed_prefix is not None and not gcs_uri.startswith(allowed_prefix):
+            raise ValueError(f"URI GCS fora do prefixo permitido ({allowed_prefix}): {gcs_uri}")
+        
+        bucket_name, blob_name = gcs_uri[5:].split("/", 1)
+        start_position = file_obj.tell()
+        self.client.bucket(bucket_name).blob(blob_name).download_to_file(file_obj)
+        size = file_obj.tell() - start_position
+        logger.info(f"Objeto baixado do GCS: {gcs_uri} ({size} bytes)")
+        return size
+
 # Instância global do serviço Storage (singleton)
 storage_service = StorageService()
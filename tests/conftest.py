@@ -0,0 +1,12 @@
+"""
+Configuração compartilhada dos testes.
+
+Os testes importam os módulos do serviço a partir da raiz do repositório.
+Dependências externas ausentes (Firestore, Flask, Gemini) fazem os testes
+que dependem delas serem ignorados via pytest.importorskip.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+"""
+Testes do cache LRU com TTL (utils/cache.py).
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("google.cloud.firestore")
+pytest.importorskip("flask")
+
+from utils.cache import TTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl_seconds=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entry_is_a_miss():
+    cache = TTLCache(max_size=2, ttl_seconds=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+    assert len(cache) == 0
+
+
+def test_zero_size_disables_the_cache():
+    cache = TTLCache(max_size=0, ttl_seconds=60)
+    cache.set("a", 1)
+    
+    assert cache.get("a") is None
+    assert cache.stats()["hit_rate"] == 0.0
@@ -0,0 +1,78 @@
+"""
+Testes da montagem do contexto RAG (services/context_assembler.py).
+"""
+
+import importlib
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+import faiss
+import numpy as np
+
+assembler_module = importlib.import_module("services.context_assembler")
+ContextAssembler = assembler_module.ContextAssembler
+SEPARATOR = assembler_module.CONTEXT_SEPARATOR
+
+# Vetores: 0 e 1 quase idênticos, 2 ortogonal à consulta, 3 próximo da consulta
+VECTORS = np.array([
+    [1.0, 0.0, 0.0],
+    [0.99, -0.01, 0.0],
+    [0.0, 0.0, 1.0],
+    [0.8, 0.6, 0.0]
+], dtype=np.float32)
+CHUNKS = ["chunk zero", "chunk um", "chunk dois", "chunk três"]
+QUERY = np.array([[1.0, 0.2, 0.0]], dtype=np.float32)
+
+
+def _index():
+    index = faiss.IndexFlatIP(VECTORS.shape[1])
+    index.add(VECTORS)
+    return index
+
+
+def _assembler(max_chars=10000, min_similarity=0.3):
+    return ContextAssembler(
+        min_similarity=min_similarity,
+        mmr_lambda=0.7,
+        duplicate_similarity=0.95,
+        max_chars_by_mode={"pitch": max_chars},
+        default_max_chars=max_chars,
+        chars_per_token=4.0
+    )
+
+
+def test_low_similarity_and_duplicates_are_dropped():
+    assembler = _assembler()
+    
+    context = assembler.assemble(_index(), CHUNKS, [0, 1, 2, 3], QUERY, k=4, mode="pitch")
+    
+    assert context.split(SEPARATOR) == ["chunk zero", "chunk três"]
+    stats = assembler.stats()
+    assert stats["below_threshold"] == 1
+    assert stats["duplicates"] == 1
+
+
+def test_budget_limits_the_number_of_chunks():
+    assembler = _assembler(max_chars=len("chunk zero") + len(SEPARATOR))
+    
+    context = assembler.assemble(_index(), CHUNKS, [0, 3], QUERY, k=4, mode="pitch")
+    
+    assert context == "chunk zero"
+    assert assembler.stats()["over_budget"] == 1
+
+
+def test_single_chunk_over_budget_is_truncated():
+    assembler = _assembler(max_chars=5)
+    
+    assert assembler.assemble(_index(), CHUNKS, [0], QUERY, k=4, mode="pitch") == "chunk"
+
+
+def test_lexical_only_search_keeps_order_without_threshold():
+    assembler = _assembler(min_similarity=0.99)
+    
+    context = assembler.assemble(_index(), CHUNKS, [2, 0], None, k=4, mode="pitch")
+    
+    assert context.split(SEPARATOR) == ["chunk dois", "chunk zero"]
@@ -0,0 +1,28 @@
+"""
+Testes da numeração de turnos das sessões (utils/firestore_client.py).
+"""
+
+import pytest
+
+pytest.importorskip("google.cloud.firestore")
+pytest.importorskip("flask")
+
+from utils.firestore_client import _next_turn_number
+
+
+def _message(role, text):
+    return {"role": role, "parts": [text]}
+
+
+def test_next_turn_number_of_new_session():
+    assert _next_turn_number(None) == 1
+
+
+def test_next_turn_number_uses_session_counter():
+    assert _next_turn_number({"turn_count": 7}) == 8
+
+
+def test_next_turn_number_of_legacy_session_counts_history_pairs():
+    history = [_message("user", "oi"), _message("model", "olá"), _message("user", "tudo bem?"), _message("model", "sim")]
+    
+    assert _next_turn_number({"history": history}) == 3
@@ -0,0 +1,166 @@
+"""
+Testes da política de chamadas ao Gemini (services/gemini_policy.py).
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+from google.api_core import exceptions as google_exceptions
+
+from services.gemini_policy import (
+    CALL_EMBED,
+    CALL_GENERATE,
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    GeminiCallPolicy,
+    GeminiUnavailableError
+)
+
+
+def _policy(**overrides):
+    options = dict(
+        max_concurrency={CALL_GENERATE: 1, CALL_EMBED: 1},
+        queue_timeout=5.0,
+        max_retries=2,
+        backoff_base=0.0,
+        backoff_max=0.0,
+        failure_threshold=1,
+        reset_timeout=0.0
+    )
+    options.update(overrides)
+    return GeminiCallPolicy(**options)
+
+
+def _fail(error):
+    def fn():
+        raise error
+    return fn
+
+
+def _open_circuit(policy):
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        policy.call(_fail(google_exceptions.ServiceUnavailable("indisponível")))
+    assert policy.stats()["circuit_state"] == CIRCUIT_OPEN
+
+
+def test_half_open_probe_success_closes_circuit():
+    policy = _policy()
+    _open_circuit(policy)
+    
+    assert policy.call(lambda: "ok") == "ok"
+    assert policy.stats()["circuit_state"] == CIRCUIT_CLOSED
+
+
+def test_half_open_probe_failure_reopens_circuit():
+    policy = _policy()
+    _open_circuit(policy)
+    
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        policy.call(_fail(google_exceptions.ServiceUnavailable("indisponível")))
+    assert policy.stats()["circuit_state"] == CIRCUIT_OPEN
+    assert policy.stats()["circuit_opens"] == 2
+
+
+def test_cancelled_probe_allows_a_new_probe():
+    policy = _policy()
+    _open_circuit(policy)
+    
+    async def scenario():
+        started = asyncio.Event()
+        
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+        
+        probe = asyncio.create_task(policy.call_async(hang))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        
+        async def ok():
+            return "ok"
+        
+        return await policy.call_async(ok)
+    
+    assert asyncio.run(scenario()) == "ok"
+    assert policy.stats()["circuit_state"] == CIRCUIT_CLOSED
+
+
+def test_cancelled_wait_for_slot_does_not_leak_it():
+    policy = _policy(queue_timeout=2.0)
+    holding = threading.Event()
+    release = threading.Event()
+    
+    def hold_slot():
+        holding.set()
+        release.wait(5)
+    
+    holder = threading.Thread(target=policy.call, args=(hold_slot,))
+    holder.start()
+    holding.wait(5)
+    
+    async def scenario():
+        async def ok():
+            return "ok"
+        
+        waiter = asyncio.create_task(policy.call_async(ok))
+        await asyncio.sleep(0.1)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        
+        # A thread de espera obtém a vaga depois do cancelamento e deve devolvê-la
+        release.set()
+        await asyncio.to_thread(holder.join, 5)
+        await asyncio.sleep(0.2)
+        return await policy.call_async(ok)
+    
+    assert asyncio.run(scenario()) == "ok"
+    assert policy._semaphores[CALL_GENERATE].acquire(blocking=False)
+    policy._semaphores[CALL_GENERATE].release()
+
+
+def test_timeouts_are_not_retried_on_long_calls():
+    policy = _policy(failure_threshold=10)
+    calls = []
+    
+    def slow():
+        calls.append(1)
+        raise google_exceptions.DeadlineExceeded("timeout")
+    
+    with pytest.raises(google_exceptions.DeadlineExceeded):
+        policy.call(slow, retry_timeouts=False)
+    assert len(calls) == 1
+    
+    with pytest.raises(google_exceptions.DeadlineExceeded):
+        policy.call(slow)
+    assert len(calls) == 1 + 3
+
+
+def test_long_generations_do_not_take_embedding_slots():
+    policy = _policy(queue_timeout=0.1)
+    holding = threading.Event()
+    release = threading.Event()
+    
+    def hold_slot():
+        holding.set()
+        release.wait(5)
+    
+    holder = threading.Thread(target=policy.call, args=(hold_slot,))
+    holder.start()
+    holding.wait(5)
+    try:
+        with pytest.raises(GeminiUnavailableError):
+            policy.call(lambda: "geração")
+        assert policy.call(lambda: "embedding", call_class=CALL_EMBED) == "embedding"
+        assert policy.stats()["in_flight"] == {CALL_GENERATE: 1, CALL_EMBED: 0}
+    finally:
+        release.set()
+        holder.join(5)
@@ -0,0 +1,82 @@
+"""
+Testes do envio de áudio à File API (services/gemini_service.py).
+"""
+
+import importlib
+import os
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+# O pacote services exporta a instância gemini_service com o mesmo nome do módulo
+gemini_module = importlib.import_module("services.gemini_service")
+GeminiService = gemini_module.GeminiService
+from utils import BoundedSpooledFile, TTLCache
+
+AUDIO = b"ID3" + bytes(range(256)) * 64
+
+
+class FakeUploads:
+    """Substitui genai.upload_file, que na versão 0.7 só aceita caminhos."""
+    
+    def __init__(self):
+        self.paths = []
+        self.contents = []
+    
+    def __call__(self, path, *, mime_type=None, display_name=None):
+        path = os.fspath(path)
+        with open(path, "rb") as f:
+            self.contents.append(f.read())
+        self.paths.append(path)
+        return SimpleNamespace(name="files/test", state=SimpleNamespace(name="ACTIVE"), size_bytes=len(AUDIO))
+
+
+@pytest.fixture
+def service(monkeypatch):
+    uploads = FakeUploads()
+    monkeypatch.setattr(gemini_module.genai, "upload_file", uploads)
+    service = GeminiService.__new__(GeminiService)
+    service.is_configured = True
+    return service, uploads
+
+
+@pytest.mark.parametrize("max_memory", [1024 * 1024, 1024])
+def test_upload_audio_from_spooled_file(service, max_memory):
+    service, uploads = service
+    stream = BoundedSpooledFile(max_bytes=1024 * 1024, max_memory=max_memory)
+    stream.write(AUDIO)
+    stream.seek(0)
+    
+    audio_file = service.upload_audio(stream, "audio/mpeg", display_name="job")
+    
+    assert audio_file.name == "files/test"
+    assert uploads.contents == [AUDIO]
+    # O arquivo temporário usado no envio é removido
+    assert not os.path.exists(uploads.paths[0])
+    stream.close()
+
+
+def test_upload_audio_uses_given_path(service, tmp_path):
+    service, uploads = service
+    audio_path = tmp_path / "pitch.ogg"
+    audio_path.write_bytes(AUDIO)
+    
+    with open(audio_path, "rb") as stream:
+        service.upload_audio(stream, "audio/ogg", path=str(audio_path))
+    
+    assert uploads.paths == [str(audio_path)]
+    assert audio_path.exists()
+
+
+def test_pitch_model_falls_back_to_default_model_without_context_cache(monkeypatch):
+    monkeypatch.setattr(gemini_module.config, "GEMINI_CONTEXT_CACHE_ENABLED", True)
+    service = GeminiService.__new__(GeminiService)
+    service._models = TTLCache(max_size=4, ttl_seconds=60)
+    service._get_pitch_context_cache = lambda: None
+    
+    model = service._get_pitch_model()
+    
+    assert model.model_name == f"models/{gemini_module.config.GEMINI_MODEL}"
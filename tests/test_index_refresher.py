@@ -0,0 +1,55 @@
+"""
+Testes da atualização do índice RAG em segundo plano (services/index_refresher.py).
+"""
+
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+# O pacote services exporta a instância index_refresher com o mesmo nome do módulo
+refresher_module = importlib.import_module("services.index_refresher")
+
+
+@pytest.fixture
+def refresher(monkeypatch):
+    remote = SimpleNamespace(version="1-1")
+    monkeypatch.setattr(
+        refresher_module, "storage_service", SimpleNamespace(get_rag_artifact_version=lambda: remote.version)
+    )
+    monkeypatch.setattr(refresher_module, "rag_service", SimpleNamespace(load_stats={"artifact_version": "1-1"}))
+    refresher = refresher_module.IndexRefresher(interval_seconds=60)
+    reloads = []
+    refresher._reload = lambda version: reloads.append(version) or True
+    return refresher, remote, reloads
+
+
+def test_unchanged_version_is_not_reloaded(refresher):
+    refresher, _, reloads = refresher
+    
+    assert not refresher.check_now()
+    assert reloads == []
+
+
+def test_new_version_is_reloaded_only_after_two_checks(refresher):
+    refresher, remote, reloads = refresher
+    remote.version = "2-2"
+    
+    assert not refresher.check_now()
+    assert refresher.check_now()
+    assert reloads == ["2-2"]
+
+
+def test_version_changing_between_checks_restarts_the_wait(refresher):
+    refresher, remote, reloads = refresher
+    remote.version = "2-1"
+    assert not refresher.check_now()
+    
+    # Chunks publicados depois do índice: nova geração, nova espera
+    remote.version = "2-2"
+    assert not refresher.check_now()
+    assert refresher.check_now()
+    assert reloads == ["2-2"]
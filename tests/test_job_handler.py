@@ -0,0 +1,63 @@
+"""
+Testes dos jobs assíncronos de pitch no encerramento (handlers/job_handler.py).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+from handlers import job_handler
+
+
+class RecordingUpdates:
+    """Substitui pitch_job_writer.update registrando as escritas."""
+    
+    def __init__(self):
+        self.updates = []
+    
+    def __call__(self, job_id, data):
+        self.updates.append((job_id, data))
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    updates = RecordingUpdates()
+    monkeypatch.setattr(job_handler.pitch_job_writer, "update", updates)
+    monkeypatch.setattr(job_handler.pitch_job_writer, "create", lambda job_id, data: None)
+    monkeypatch.setattr(job_handler, "_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(job_handler, "_slots", threading.Semaphore(10))
+    monkeypatch.setattr(job_handler, "_unfinished_jobs", set())
+    monkeypatch.setattr(job_handler, "_shutting_down", threading.Event())
+    return updates
+
+
+def test_shutdown_marks_unfinished_jobs_and_refuses_new_ones(jobs, monkeypatch):
+    running = threading.Event()
+    release = threading.Event()
+    
+    def slow_analysis(text, audio_file, job_id):
+        running.set()
+        release.wait(5)
+        return {"score": 8}
+    
+    monkeypatch.setattr(job_handler, "handle_pitch_request", slow_analysis)
+    running_job = job_handler.submit_pitch_job(text="pitch 1")["job_id"]
+    queued_job = job_handler.submit_pitch_job(text="pitch 2")["job_id"]
+    running.wait(5)
+    
+    job_handler.fail_unfinished_jobs()
+    
+    interrupted = {job_id for job_id, data in jobs.updates if data["status"] == "ERROR"}
+    assert interrupted == {running_job, queued_job}
+    with pytest.raises(job_handler.JobQueueFullError):
+        job_handler.submit_pitch_job(text="pitch 3")
+    
+    # O job em execução conclui durante a drenagem e sobrescreve o ERROR
+    release.set()
+    job_handler._executor.shutdown(wait=True)
+    assert jobs.updates[-1] == (running_job, {"status": "COMPLETE", "result": {"score": 8}})
+    assert job_handler._unfinished_jobs == {queued_job}
@@ -0,0 +1,58 @@
+"""
+Testes do índice BM25 e da fusão por Reciprocal Rank Fusion (services/lexical_index.py).
+"""
+
+import importlib
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+lexical_index = importlib.import_module("services.lexical_index")
+
+CHUNKS = [
+    "O investidor anjo aporta capital semente em startups.",
+    "Valuation pré-money e pós-money em uma rodada de investimento.",
+    "O pitch deve apresentar problema, solução, mercado e tração.",
+    "Capital semente, investidor anjo e aceleradoras: fontes de investimento."
+]
+
+
+def test_tokenize_folds_case_and_accents_and_drops_stopwords():
+    assert lexical_index.tokenize("A Tração do Pitch") == ["tracao", "pitch"]
+
+
+def test_bm25_ranks_chunks_by_matching_terms():
+    index = lexical_index.BM25Index(CHUNKS, k1=1.5, b=0.75)
+    
+    results = index.search("investidor anjo", k=4)
+    
+    assert [doc_id for doc_id, _ in results][:2] in ([0, 3], [3, 0])
+    assert all(score > 0 for _, score in results)
+    assert index.search("TRAÇÃO", k=4)[0][0] == 2
+    assert index.search("inexistente", k=4) == []
+
+
+def test_bm25_prefers_rare_terms():
+    index = lexical_index.BM25Index(CHUNKS, k1=1.5, b=0.75)
+    
+    # "valuation" aparece em um único chunk; "investimento" em dois
+    assert index.search("valuation investimento", k=1)[0][0] == 1
+
+
+def test_bm25_returns_at_most_k_results():
+    index = lexical_index.BM25Index(CHUNKS, k1=1.5, b=0.75)
+    assert len(index.search("investidor capital pitch valuation", k=2)) == 2
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = lexical_index.reciprocal_rank_fusion([[1, 2, 3], [4, 2, 5]], k=3, rrf_k=60)
+    
+    assert fused[0] == 2
+    assert set(fused) <= {1, 2, 3, 4, 5}
+    assert len(fused) == 3
+
+
+def test_reciprocal_rank_fusion_keeps_single_ranking_order():
+    assert lexical_index.reciprocal_rank_fusion([[5, 1, 9]], k=10, rrf_k=60) == [5, 1, 9]
@@ -0,0 +1,60 @@
+"""
+Testes das métricas no formato do Prometheus (utils/metrics.py).
+"""
+
+import threading
+
+import pytest
+
+pytest.importorskip("google.cloud.firestore")
+pytest.importorskip("flask")
+
+from utils.metrics import MetricsRegistry
+
+
+def test_counter_sums_shards_from_all_threads():
+    registry = MetricsRegistry(prefix="test")
+    counter = registry.counter("events_total", "Eventos.", ("kind",))
+    
+    threads = [threading.Thread(target=lambda: [counter.inc("a") for _ in range(100)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc("b", amount=2.5)
+    
+    output = registry.render()
+    assert 'test_events_total{kind="a"} 400' in output
+    assert 'test_events_total{kind="b"} 2.5' in output
+    assert "# TYPE test_events_total counter" in output
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry(prefix="test")
+    histogram = registry.histogram("duration_seconds", "Duração.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    
+    output = registry.render()
+    assert 'test_duration_seconds_bucket{le="0.1"} 1' in output
+    assert 'test_duration_seconds_bucket{le="1"} 2' in output
+    assert 'test_duration_seconds_bucket{le="+Inf"} 3' in output
+    assert "test_duration_seconds_count 3" in output
+
+
+def test_failing_collector_does_not_break_the_output():
+    registry = MetricsRegistry(prefix="test")
+    registry.gauge("up", "Ativo.").inc()
+    registry.register_collector("broken", "Quebrado.", "gauge", lambda: 1 / 0)
+    registry.register_collector("size", "Tamanho.", "gauge", lambda: [({"cache": "x"}, 3)])
+    
+    output = registry.render()
+    assert "test_up 1" in output
+    assert "test_broken" not in output
+    assert 'test_size{cache="x"} 3' in output
+
+
+def test_disabled_registry_renders_nothing():
+    registry = MetricsRegistry(prefix="test", enabled=False)
+    registry.counter("events_total", "Eventos.").inc()
+    assert registry.render() == ""
@@ -0,0 +1,41 @@
+"""
+Testes do cache de análises de pitch por conteúdo (services/pitch_cache.py).
+"""
+
+import hashlib
+import importlib
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+# O pacote services exporta a instância pitch_cache com o mesmo nome do módulo
+PitchCache = importlib.import_module("services.pitch_cache").PitchCache
+
+
+def test_key_ignores_whitespace_differences_in_text():
+    assert PitchCache.build_key(text="Meu  pitch\nde teste") == PitchCache.build_key(text="Meu pitch de teste")
+
+
+def test_key_depends_on_content():
+    audio_digest = hashlib.sha256(b"audio").digest()
+    keys = {
+        PitchCache.build_key(text="pitch A"),
+        PitchCache.build_key(text="pitch B"),
+        PitchCache.build_key(audio_digest=audio_digest),
+        PitchCache.build_key(audio_digest=audio_digest, text="pitch A")
+    }
+    assert len(keys) == 4
+
+
+def test_cached_result_is_a_copy(monkeypatch):
+    monkeypatch.setattr("config.PITCH_CACHE_ENABLED", True)
+    cache = PitchCache()
+    key = PitchCache.build_key(text="pitch")
+    cache.set(key, {"score": {"total": 8}})
+    
+    result = cache.get(key)
+    result["score"]["total"] = 0
+    
+    assert cache.get(key) == {"score": {"total": 8}}
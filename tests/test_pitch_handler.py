@@ -0,0 +1,53 @@
+"""
+Testes do registro dos jobs de pitch (handlers/pitch_handler.py).
+"""
+
+import asyncio
+import importlib
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+pitch_handler = importlib.import_module("handlers.pitch_handler")
+
+CACHED_RESULT = {"score": 9, "transcription_text": ""}
+
+
+class RecordingJobs:
+    """Substitui pitch_job_writer registrando criações e atualizações."""
+    
+    def __init__(self):
+        self.writes = []
+    
+    def create(self, job_id, data):
+        self.writes.append(("create", job_id, data))
+    
+    def update(self, job_id, data):
+        self.writes.append(("update", job_id, data))
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    recorder = RecordingJobs()
+    monkeypatch.setattr(pitch_handler, "pitch_job_writer", recorder)
+    monkeypatch.setattr(pitch_handler.pitch_cache, "get", lambda cache_key: dict(CACHED_RESULT))
+    return recorder
+
+
+def _assert_cache_hit_is_tracked(writes):
+    assert writes[0] == ("create", "job-1", {"has_audio": False, "has_text": True})
+    assert writes[-1] == ("update", "job-1", {"status": "COMPLETE", "result": CACHED_RESULT})
+
+
+def test_cache_hit_creates_and_completes_the_job(jobs):
+    assert pitch_handler.handle_pitch_request(text="meu pitch", job_id="job-1") == CACHED_RESULT
+    _assert_cache_hit_is_tracked(jobs.writes)
+
+
+def test_async_cache_hit_creates_and_completes_the_job(jobs):
+    result = asyncio.run(pitch_handler.handle_pitch_request_async(text="meu pitch", job_id="job-1"))
+    
+    assert result == CACHED_RESULT
+    _assert_cache_hit_is_tracked(jobs.writes)
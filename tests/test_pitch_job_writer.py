@@ -0,0 +1,86 @@
+"""
+Testes da gravação em lote do tracking de jobs de pitch (utils/pitch_job_writer.py).
+"""
+
+import importlib
+
+import pytest
+
+pytest.importorskip("google.cloud.firestore")
+pytest.importorskip("flask")
+
+# O pacote utils exporta a instância pitch_job_writer com o mesmo nome do módulo
+writer_module = importlib.import_module("utils.pitch_job_writer")
+PitchJobWriter = writer_module.PitchJobWriter
+
+
+class RecordingFirestore:
+    """Substitui firestore_client.write_pitch_jobs registrando os lotes."""
+    
+    def __init__(self, result=True):
+        self.result = result
+        self.batches = []
+    
+    def __call__(self, jobs):
+        self.batches.append(jobs)
+        return self.result
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    firestore = RecordingFirestore()
+    monkeypatch.setattr(writer_module.firestore_client, "write_pitch_jobs", firestore)
+    writer = PitchJobWriter(max_pending=10, batch_size=5, flush_interval=60.0)
+    # Evita iniciar a thread de gravação e o hook de SIGTERM nos testes
+    writer.start = lambda: False
+    return writer, firestore
+
+
+def test_create_and_update_are_written_once(writer):
+    writer, firestore = writer
+    writer.create("job-1", {"has_audio": False})
+    writer.update("job-1", {"status": "COMPLETE", "result": {"score": 8}})
+    
+    assert writer.flush()
+    
+    assert len(firestore.batches) == 1
+    job = firestore.batches[0]["job-1"]
+    assert job["status"] == "COMPLETE"
+    assert job["has_audio"] is False
+    assert writer.get_pending("job-1") is None
+
+
+def test_failed_flush_is_requeued_under_newer_updates(writer):
+    writer, firestore = writer
+    writer.create("job-1", {"has_audio": False})
+    firestore.result = False
+    
+    assert not writer.flush()
+    writer.update("job-1", {"status": "ERROR"})
+    
+    pending = writer.get_pending("job-1")
+    assert pending["status"] == "ERROR"
+    assert pending["has_audio"] is False
+    
+    firestore.result = True
+    assert writer.flush()
+    assert firestore.batches[-1]["job-1"]["status"] == "ERROR"
+
+
+def test_full_queue_flushes_inline(writer):
+    writer, firestore = writer
+    for i in range(10):
+        writer.update(f"job-{i}", {"status": "QUEUED"})
+    
+    assert writer.stats()["inline_flushes"] == 1
+    assert len(firestore.batches[0]) == 10
+
+
+def test_writes_after_stop_are_flushed_inline(writer):
+    writer, firestore = writer
+    writer.stop()
+    
+    writer.update("job-1", {"status": "COMPLETE"})
+    
+    assert writer.get_pending("job-1") is None
+    assert firestore.batches[-1]["job-1"]["status"] == "COMPLETE"
@@ -0,0 +1,49 @@
+"""
+Testes do cliente HTTP das callbacks (utils/public_http.py).
+"""
+
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("flask")
+
+import requests
+
+from utils.public_http import public_http_session
+
+
+def test_connection_to_private_peer_is_refused_before_sending():
+    server = socket.create_server(("127.0.0.1", 0))
+    received = []
+    
+    def accept():
+        server.settimeout(5)
+        try:
+            connection, _ = server.accept()
+        except OSError:
+            return
+        connection.settimeout(1)
+        try:
+            received.append(connection.recv(1024))
+        except OSError:
+            pass
+        connection.close()
+    
+    acceptor = threading.Thread(target=accept)
+    acceptor.start()
+    try:
+        with pytest.raises(requests.exceptions.ConnectionError, match="não público"):
+            public_http_session().post(f"https://127.0.0.1:{server.getsockname()[1]}/callback", json={}, timeout=2)
+    finally:
+        acceptor.join(5)
+        server.close()
+    
+    assert received in ([], [b""])
+
+
+def test_plain_http_is_not_supported():
+    with pytest.raises(requests.exceptions.InvalidSchema):
+        public_http_session().post("http://example.com/callback", json={}, timeout=2)
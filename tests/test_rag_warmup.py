@@ -0,0 +1,59 @@
+"""
+Testes do warmup das consultas frequentes (services/rag_service.py).
+"""
+
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+# O pacote services exporta a instância rag_service com o mesmo nome do módulo
+rag_module = importlib.import_module("services.rag_service")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    embedded = []
+    searched = []
+    
+    def embed_content(model, content, **kwargs):
+        embedded.extend(content)
+        return {"embedding": [[float(position), 1.0] for position in range(len(content))]}
+    
+    monkeypatch.setattr(rag_module.genai, "embed_content", embed_content)
+    service = rag_module.RAGService()
+    service._state = SimpleNamespace(version=1)
+    
+    def search_context(queries, query_embeddings, k, mode=None):
+        searched.append(queries[0])
+        return f"contexto de {queries[0]}"
+    
+    service._search_context = search_context
+    return service, embedded, searched
+
+
+def test_warmup_embeds_original_text_keyed_by_normalized_query(service):
+    service, embedded, searched = service
+    
+    stats = service.warmup(["Como  validar o MVP?", "como validar o mvp?"])
+    
+    assert embedded == ["Como  validar o MVP?"]
+    assert set(searched) == {"Como  validar o MVP?"}
+    assert stats["embedded"] == 1
+    assert service._get_warm_context("COMO VALIDAR O MVP?", rag_module.config.RAG_TOP_K, "pitch") == "contexto de Como  validar o MVP?"
+
+
+def test_reloaded_index_publishes_a_new_context_map(service):
+    service, embedded, searched = service
+    service.warmup(["Como validar o MVP?"])
+    published = service._warm_contexts
+    
+    service._state = SimpleNamespace(version=2)
+    service._get_warm_context("como validar o mvp?", rag_module.config.RAG_TOP_K, "pitch")
+    
+    assert service._warm_contexts is not published
+    assert service._warm_contexts[("como validar o mvp?", "pitch")][0] == 2
+    assert published[("como validar o mvp?", "pitch")][0] == 1
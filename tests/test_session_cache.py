@@ -0,0 +1,96 @@
+"""
+Testes do cache de sessões com gravação adiada (utils/session_cache.py).
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("google.cloud.firestore")
+pytest.importorskip("flask")
+
+from utils.session_cache import SessionCache
+
+
+def _window(turn_count=0, turns=None):
+    return {"turns": turns or [], "turn_count": turn_count, "summary": "", "summarized_turns": 0}
+
+
+class RecordingWriter:
+    """Gravador falso que registra os lotes recebidos."""
+    
+    def __init__(self, result=True):
+        self.result = result
+        self.batches = []
+    
+    def __call__(self, turns_by_session):
+        self.batches.append(turns_by_session)
+        return self.result
+
+
+def _cache(max_size=1, ttl_seconds=60.0, writer=None):
+    # Sem start(): a thread de gravação e o hook de SIGTERM não são iniciados nos testes
+    return SessionCache(max_size=max_size, ttl_seconds=ttl_seconds, flush_interval=60.0, writer=writer or RecordingWriter())
+
+
+def test_session_with_pending_turns_is_not_evicted():
+    cache = _cache(max_size=1)
+    cache.put("a", _window())
+    assert cache.record_turn("a", _window(), "oi", "olá", max_turns=5) == 1
+    
+    cache.put("b", _window())
+    
+    assert cache.get("a")["turn_count"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_session_is_evicted_after_flush():
+    writer = RecordingWriter()
+    cache = _cache(max_size=1, writer=writer)
+    cache.put("a", _window())
+    cache.record_turn("a", _window(), "oi", "olá", max_turns=5)
+    
+    assert cache.flush()
+    cache.put("b", _window())
+    
+    assert cache.get("a") is None
+    assert writer.batches[0]["a"][0]["turn"] == 1
+
+
+def test_expired_session_with_pending_turns_is_kept():
+    cache = _cache(ttl_seconds=0.01)
+    cache.put("a", _window())
+    cache.record_turn("a", _window(), "oi", "olá", max_turns=5)
+    time.sleep(0.02)
+    
+    window = cache.get("a")
+    
+    assert window is not None
+    assert window["turn_count"] == 1
+
+
+def test_stale_window_is_merged_with_pending_turns():
+    writer = RecordingWriter(result=False)
+    cache = _cache(writer=writer)
+    cache.record_turn("a", _window(), "1", "r1", max_turns=5)
+    cache.record_turn("a", _window(), "2", "r2", max_turns=5)
+    assert not cache.flush()
+    
+    # Janela desatualizada do Firestore: os dois turnos ainda não foram gravados
+    cache._sessions.clear()
+    cache.put("a", _window())
+    turn_number = cache.record_turn("a", _window(), "3", "r3", max_turns=5)
+    
+    assert turn_number == 3
+    assert [turn["turn"] for turn in cache.get("a")["turns"]] == [1, 2, 3]
+
+
+def test_turns_recorded_after_stop_are_flushed_inline():
+    writer = RecordingWriter()
+    cache = _cache(writer=writer)
+    cache.stop()
+    
+    assert cache.record_turn("a", _window(), "oi", "olá", max_turns=5) == 1
+    
+    assert writer.batches == [{"a": [{"turn": 1, "user": "oi", "model": "olá"}]}]
+    assert cache.stats()["pending_turns"] == 0
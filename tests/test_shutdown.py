@@ -0,0 +1,28 @@
+"""
+Testes dos ganchos de encerramento (utils/shutdown.py).
+"""
+
+from utils import shutdown
+
+
+def test_hooks_run_again_after_drain(monkeypatch):
+    calls = []
+    monkeypatch.setattr(shutdown, "_hooks", [("teste", lambda: calls.append(1))])
+    
+    shutdown.run_shutdown_hooks()
+    shutdown.run_shutdown_hooks()
+    
+    assert calls == [1, 1]
+
+
+def test_failing_hook_does_not_stop_others(monkeypatch):
+    calls = []
+    
+    def failing():
+        raise RuntimeError("falha")
+    
+    monkeypatch.setattr(shutdown, "_hooks", [("falha", failing), ("ok", lambda: calls.append(1))])
+    
+    shutdown.run_shutdown_hooks()
+    
+    assert calls == [1]
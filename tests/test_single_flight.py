@@ -0,0 +1,97 @@
+"""
+Testes da coalescência de chamadas idênticas (utils/single_flight.py).
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("google.cloud.firestore")
+pytest.importorskip("flask")
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"answer": 42}
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(group.do("k", fn)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(group.do("k", fn)))
+    follower.start()
+    while group.stats()["shared"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True]
+    assert all(result == {"answer": 42} for result, _ in results)
+
+
+def test_cancelling_the_leader_does_not_cancel_followers():
+    group = SingleFlight("test")
+    
+    async def scenario():
+        release = asyncio.Event()
+        calls = []
+        
+        async def fn():
+            calls.append(1)
+            await release.wait()
+            return {"answer": 42}
+        
+        leader = asyncio.create_task(group.do_async("k", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(group.do_async("k", fn))
+        await asyncio.sleep(0)
+        
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        
+        release.set()
+        result, shared = await follower
+        return result, shared, calls
+    
+    result, shared, calls = asyncio.run(scenario())
+    
+    assert result == {"answer": 42}
+    assert shared
+    assert len(calls) == 1
+    assert group.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_waiter():
+    group = SingleFlight("test")
+    
+    async def scenario():
+        release = asyncio.Event()
+        
+        async def fn():
+            await release.wait()
+            raise ValueError("falhou")
+        
+        waiters = [asyncio.create_task(group.do_async("k", fn)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+    
+    errors = asyncio.run(scenario())
+    
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert group.stats() == {"enabled": True, "in_flight": 0, "executed": 1, "shared": 2, "shared_rate": 0.6667}
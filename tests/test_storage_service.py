@@ -0,0 +1,74 @@
+"""
+Testes do download verificado dos artefatos RAG (services/storage_service.py).
+"""
+
+import base64
+import hashlib
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("numpy", "faiss", "flask", "google.generativeai", "google.cloud.firestore", "google.cloud.storage"):
+    pytest.importorskip(module)
+
+# O pacote services exporta a instância storage_service com o mesmo nome do módulo
+StorageService = importlib.import_module("services.storage_service").StorageService
+
+CONTENT = b"indice faiss" * 1000
+
+
+def _md5(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+
+class FakeBlob:
+    """Objeto do GCS com geração, MD5 e conteúdo fixos."""
+    
+    def __init__(self, name, content, md5_hash=None, generation=1):
+        self.name = name
+        self.content = content
+        self.md5_hash = md5_hash if md5_hash is not None else _md5(content)
+        self.crc32c = None
+        self.generation = generation
+        self.size = len(content)
+        self.downloads = 0
+    
+    def download_to_filename(self, path, checksum=None):
+        self.downloads += 1
+        with open(path, "wb") as f:
+            f.write(self.content)
+
+
+def _service(blob):
+    service = StorageService.__new__(StorageService)
+    service.rag_bucket = SimpleNamespace(name="bucket", get_blob=lambda name: blob)
+    return service
+
+
+def test_checksum_mismatch_removes_download_and_raises(tmp_path):
+    blob = FakeBlob("faiss_index.bin", CONTENT, md5_hash=_md5(b"outro conteudo"))
+    local_path = tmp_path / "faiss_index.bin"
+    
+    with pytest.raises(ValueError):
+        _service(blob)._sync_artifact(blob.name, str(local_path), None)
+    
+    assert not local_path.exists()
+    assert not (tmp_path / "faiss_index.bin.download").exists()
+
+
+def test_verified_download_is_recorded_and_skipped_when_unchanged(tmp_path):
+    blob = FakeBlob("faiss_index.bin", CONTENT, generation=7)
+    service = _service(blob)
+    local_path = str(tmp_path / "faiss_index.bin")
+    
+    entry = service._sync_artifact(blob.name, local_path, None)
+    assert entry["generation"] == 7
+    assert entry["local_size"] == len(CONTENT)
+    
+    assert service._sync_artifact(blob.name, local_path, entry) == entry
+    assert blob.downloads == 1
+    
+    blob.generation = 8
+    service._sync_artifact(blob.name, local_path, entry)
+    assert blob.downloads == 2
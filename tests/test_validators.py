@@ -0,0 +1,43 @@
+"""
+Testes da validação da callback_url (utils/validators.py).
+"""
+
+import socket
+
+import pytest
+
+pytest.importorskip("google.cloud.firestore")
+pytest.importorskip("flask")
+
+from utils import validators
+from utils.validators import validate_callback_url
+
+
+def _resolve_to(monkeypatch, address):
+    def fake_getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (address, port))]
+    monkeypatch.setattr(validators.socket, "getaddrinfo", fake_getaddrinfo)
+
+
+def test_public_https_url_is_accepted(monkeypatch):
+    _resolve_to(monkeypatch, "8.8.8.8")
+    assert validate_callback_url("https://hooks.example.com/pitch") == (True, None)
+
+
+def test_http_url_is_rejected(monkeypatch):
+    _resolve_to(monkeypatch, "8.8.8.8")
+    is_valid, _ = validate_callback_url("http://hooks.example.com/pitch")
+    assert not is_valid
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.1.2.3", "169.254.169.254", "100.64.0.1", "::1", "fe80::1"])
+def test_internal_addresses_are_rejected(monkeypatch, address):
+    _resolve_to(monkeypatch, address)
+    is_valid, _ = validate_callback_url("https://hooks.example.com/pitch")
+    assert not is_valid
+
+
+def test_host_outside_allowlist_is_rejected(monkeypatch):
+    _resolve_to(monkeypatch, "8.8.8.8")
+    is_valid, _ = validate_callback_url("https://other.example.com/pitch", frozenset({"hooks.example.com"}))
+    assert not is_valid
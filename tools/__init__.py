@@ -0,0 +1,3 @@
+"""
+Tools package - Utilitários de linha de comando (execução offline).
+"""
@@ -0,0 +1,148 @@
+"""
+Benchmark de tipos de índice FAISS (recall, latência e memória).
+
+Compara configurações de index_factory sobre os embeddings reais da base
+(embeddings.npy gravado por tools.build_index --save-embeddings), medindo
+recall@k contra a busca exata, latência p50/p99 de buscas individuais (como
+no caminho de requisição) e o tamanho serializado do índice.
+
+Uso:
+    python -m tools.benchmark_index knowledge_base/embeddings.npy \
+        --config Flat --config "IVF256,Flat:nprobe=8" --config "HNSW32:efSearch=64"
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import faiss
+
+import config
+from tools.build_index import create_index
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("benchmark_index")
+
+DEFAULT_CONFIGS = [
+    "Flat",
+    "IVF256,Flat:nprobe=8",
+    "IVF256,Flat:nprobe=32",
+    "HNSW32:efSearch=64",
+    "IVF256,PQ32:nprobe=16"
+]
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, int]]:
+    """
+    Interpreta uma configuração no formato 'factory[:param=valor,...]'.
+    
+    Args:
+        spec: Ex: "IVF256,Flat:nprobe=8"
+    
+    Returns:
+        Tuple[str, Dict[str, int]]: (string do index_factory, parâmetros de busca)
+    """
+    factory, _, params_spec = spec.partition(":")
+    params = {}
+    for item in filter(None, params_spec.split(",")):
+        name, _, value = item.partition("=")
+        params[name.strip()] = int(value)
+    return factory, params
+
+
+def percentile_ms(latencies: List[float], percentile: float) -> float:
+    return float(np.percentile(latencies, percentile) * 1000)
+
+
+def benchmark_config(
+    spec: str,
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    ground_truth: np.ndarray,
+    k: int
+) -> Dict[str, object]:
+    """
+    Constrói o índice de uma configuração e mede recall@k, latência e memória.
+    
+    Returns:
+        Dict: Métricas da configuração
+    """
+    factory, params = parse_config(spec)
+    
+    build_start = time.monotonic()
+    index = create_index(corpus, factory)
+    build_seconds = time.monotonic() - build_start
+    
+    parameter_space = faiss.ParameterSpace()
+    for name, value in params.items():
+        parameter_space.set_index_parameter(index, name, value)
+    
+    latencies = []
+    hits = 0
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, indices = index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(indices[0]) & set(ground_truth[i]))
+    
+    return {
+        "config": spec,
+        "recall": hits / (len(queries) * k),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p99_ms": percentile_ms(latencies, 99),
+        "memory_mb": len(faiss.serialize_index(index)) / (1024 * 1024),
+        "build_s": build_seconds
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compara tipos de índice FAISS nos embeddings reais.")
+    parser.add_argument("embeddings", help="Arquivo .npy com os embeddings do corpus")
+    parser.add_argument("--queries", help="Arquivo .npy com embeddings de consultas (padrão: amostra do corpus)")
+    parser.add_argument("--num-queries", type=int, default=200, help="Consultas amostradas do corpus")
+    parser.add_argument("--k", type=int, default=config.RAG_TOP_K)
+    parser.add_argument("--config", action="append", dest="configs", help="'factory[:param=valor,...]' (repetível)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    
+    corpus = np.ascontiguousarray(np.load(args.embeddings), dtype='float32')
+    if args.queries:
+        queries = np.ascontiguousarray(np.load(args.queries), dtype='float32')
+    else:
+        rng = np.random.default_rng(args.seed)
+        sample = rng.choice(len(corpus), size=min(args.num_queries, len(corpus)), replace=False)
+        queries = corpus[sample]
+    
+    logger.info(f"Corpus: {corpus.shape[0]} vetores (dim {corpus.shape[1]}), {len(queries)} consultas, k={args.k}")
+    
+    # Referência: busca exata
+    exact_index = faiss.IndexFlatL2(corpus.shape[1])
+    exact_index.add(corpus)
+    _, ground_truth = exact_index.search(queries, args.k)
+    
+    results = []
+    for spec in args.configs or DEFAULT_CONFIGS:
+        try:
+            results.append(benchmark_config(spec, corpus, queries, ground_truth, args.k))
+        except RuntimeError as e:
+            logger.error(f"Configuração '{spec}' falhou: {e}")
+    
+    header = f"{'config':<28} {'recall@' + str(args.k):>10} {'p50 ms':>9} {'p99 ms':>9} {'mem MB':>9} {'build s':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['config']:<28} {r['recall']:>10.4f} {r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} "
+            f"{r['memory_mb']:>9.2f} {r['build_s']:>9.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Construtor offline do índice RAG (faiss_index.bin + text_chunks.json).
+
+Lê documentos PDF, DOCX, PPTX, TXT e MD de um diretório, extrai e divide o
+texto em chunks em um pool de processos, gera embeddings em lotes com
+concorrência limitada e retry, e grava os artefatos no formato esperado por
+RAGService.load_index.
+
+Uso:
+    python -m tools.build_index knowledge_base/docs --output-dir knowledge_base
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+import faiss
+import google.generativeai as genai
+
+import config
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("build_index")
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.pptx', '.txt', '.md'}
+
+
+def extract_text(path: str) -> str:
+    """
+    Extrai o texto de um documento de acordo com a extensão.
+    
+    Args:
+        path: Caminho do documento
+    
+    Returns:
+        str: Texto extraído
+    """
+    extension = os.path.splitext(path)[1].lower()
+    
+    if extension == '.pdf':
+        from pypdf import PdfReader
+        reader = PdfReader(path)
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    
+    if extension == '.docx':
+        import docx
+        document = docx.Document(path)
+        parts = [paragraph.text for paragraph in document.paragraphs]
+        for table in document.tables:
+            for row in table.rows:
+                parts.append(" | ".join(cell.text for cell in row.cells))
+        return "\n".join(parts)
+    
+    if extension == '.pptx':
+        from pptx import Presentation
+        presentation = Presentation(path)
+        parts = []
+        for slide in presentation.slides:
+            for shape in slide.shapes:
+                if shape.has_text_frame:
+                    parts.append(shape.text_frame.text)
+        return "\n".join(parts)
+    
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+
+def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """
+    Divide o texto em janelas de tamanho fixo com sobreposição, quebrando em espaços.
+    
+    Args:
+        text: Texto completo do documento
+        chunk_size: Tamanho máximo de cada chunk (caracteres)
+        chunk_overlap: Sobreposição entre chunks consecutivos (caracteres)
+    
+    Returns:
+        List[str]: Chunks não vazios
+    """
+    text = " ".join(text.split())
+    chunks = []
+    start = 0
+    
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Evita cortar palavras no meio
+            last_space = text.rfind(" ", start + chunk_overlap + 1, end)
+            if last_space != -1:
+                end = last_space
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        
+        if end >= len(text):
+            break
+        next_start = max(end - chunk_overlap, start + 1)
+        if text[next_start - 1] != " ":
+            # Começa a sobreposição no início de uma palavra
+            word_start = text.find(" ", next_start, end)
+            if word_start != -1:
+                next_start = word_start + 1
+        start = next_start
+    
+    return chunks
+
+
+def parse_document(args: Tuple[str, int, int]) -> Tuple[str, List[str]]:
+    """
+    Extrai e divide um documento (executado em processo separado).
+    
+    Args:
+        args: (caminho, chunk_size, chunk_overlap)
+    
+    Returns:
+        Tuple[str, List[str]]: (caminho, chunks do documento)
+    """
+    path, chunk_size, chunk_overlap = args
+    try:
+        return path, chunk_text(extract_text(path), chunk_size, chunk_overlap)
+    except Exception as e:
+        logging.getLogger("build_index").error(f"Erro ao processar {path}: {e}")
+        return path, []
+
+
+def embed_batch(batch: List[str], max_retries: int) -> List[List[float]]:
+    """
+    Gera embeddings de um lote de chunks com retry e backoff exponencial.
+    
+    Args:
+        batch: Textos do lote
+        max_retries: Número máximo de novas tentativas
+    
+    Returns:
+        List[List[float]]: Embeddings na mesma ordem do lote
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            result = genai.embed_content(
+                model=config.EMBEDDING_MODEL,
+                content=batch,
+                task_type="retrieval_document"
+            )
+            return result['embedding']
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = min(2 ** attempt, 30) * (0.5 + random.random())
+            logger.warning(f"Falha no lote de embeddings ({e}); nova tentativa em {delay:.1f}s")
+            time.sleep(delay)
+
+
+def create_index(embeddings: np.ndarray, index_factory: str) -> faiss.Index:
+    """
+    Cria, treina (se necessário) e popula um índice FAISS a partir de uma string de factory.
+    
+    Args:
+        embeddings: Matriz float32 (n, dim) com os embeddings
+        index_factory: String do faiss.index_factory (ex: "Flat", "IVF256,Flat", "HNSW32")
+        
+    Returns:
+        faiss.Index: Índice populado
+    """
+    index = faiss.index_factory(embeddings.shape[1], index_factory, faiss.METRIC_L2)
+    if not index.is_trained:
+        logger.info(f"Treinando índice '{index_factory}' com {len(embeddings)} vetores...")
+        index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+
+def find_documents(input_dir: str) -> List[str]:
+    """Lista recursivamente os documentos suportados em um diretório."""
+    paths = []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def build_index(
+    input_dir: str,
+    output_dir: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    workers: int,
+    batch_size: int,
+    concurrency: int,
+    max_retries: int,
+    index_factory: str = config.RAG_INDEX_FACTORY,
+    save_embeddings: bool = False
+) -> None:
+    """
+    Executa o pipeline completo: parsing, chunking, embeddings e gravação dos artefatos.
+    """
+    documents = find_documents(input_dir)
+    if not documents:
+        raise ValueError(f"Nenhum documento suportado encontrado em {input_dir}")
+    
+    total_start = time.monotonic()
+    
+    # 1. Parsing e chunking em paralelo (CPU-bound)
+    logger.info(f"Processando {len(documents)} documentos com {workers} processos...")
+    parse_start = time.monotonic()
+    text_chunks: List[str] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tasks = [(path, chunk_size, chunk_overlap) for path in documents]
+        for path, chunks in executor.map(parse_document, tasks, chunksize=4):
+            text_chunks.extend(chunks)
+    parse_seconds = time.monotonic() - parse_start
+    logger.info(
+        f"Parsing concluído: {len(text_chunks)} chunks em {parse_seconds:.1f}s "
+        f"({len(documents) / parse_seconds:.1f} docs/s)"
+    )
+    
+    if not text_chunks:
+        raise ValueError("Nenhum texto extraído dos documentos.")
+    
+    # 2. Embeddings em lotes com concorrência limitada (I/O-bound)
+    genai.configure(api_key=config.GEMINI_API_KEY)
+    batches = [text_chunks[i:i + batch_size] for i in range(0, len(text_chunks), batch_size)]
+    logger.info(f"Gerando embeddings: {len(batches)} lotes, concorrência {concurrency}...")
+    embed_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda batch: embed_batch(batch, max_retries), batches))
+    embeddings = np.array([vector for batch in results for vector in batch], dtype='float32')
+    embed_seconds = time.monotonic() - embed_start
+    logger.info(
+        f"Embeddings concluídos em {embed_seconds:.1f}s "
+        f"({len(text_chunks) / embed_seconds:.1f} chunks/s)"
+    )
+    
+    # 3. Índice FAISS e chunks no formato esperado por RAGService.load_index
+    index = create_index(embeddings, index_factory)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    index_path = os.path.join(output_dir, "faiss_index.bin")
+    chunks_path = os.path.join(output_dir, "text_chunks.json")
+    faiss.write_index(index, index_path)
+    with open(chunks_path, 'w', encoding='utf-8') as f:
+        json.dump(text_chunks, f, ensure_ascii=False)
+    
+    if save_embeddings:
+        # Usado por tools.benchmark_index para comparar tipos de índice
+        embeddings_path = os.path.join(output_dir, "embeddings.npy")
+        np.save(embeddings_path, embeddings)
+        logger.info(f"Embeddings gravados em {embeddings_path}")
+    
+    total_seconds = time.monotonic() - total_start
+    logger.info(f"Artefatos gravados: {index_path} ('{index_factory}', {index.ntotal} vetores), {chunks_path}")
+    logger.info(
+        f"Total: {total_seconds:.1f}s - {len(documents) / total_seconds:.2f} docs/s, "
+        f"{len(text_chunks) / total_seconds:.1f} chunks/s"
+    )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Constrói o índice RAG (FAISS) a partir de documentos.")
+    parser.add_argument("input_dir", help="Diretório com documentos PDF/DOCX/PPTX/TXT/MD")
+    parser.add_argument("--output-dir", default="knowledge_base", help="Diretório de saída dos artefatos")
+    parser.add_argument("--chunk-size", type=int, default=config.RAG_CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=config.RAG_CHUNK_OVERLAP)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos para parsing")
+    parser.add_argument("--batch-size", type=int, default=config.RAG_EMBED_BATCH_SIZE, help="Textos por chamada de embedding")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chamadas de embedding simultâneas")
+    parser.add_argument("--max-retries", type=int, default=5, help="Novas tentativas por lote de embeddings")
+    parser.add_argument("--index-factory", default=config.RAG_INDEX_FACTORY, help="String do faiss.index_factory")
+    parser.add_argument("--save-embeddings", action="store_true", help="Grava embeddings.npy para benchmarks")
+    args = parser.parse_args(argv)
+    
+    if args.chunk_overlap >= args.chunk_size:
+        parser.error("--chunk-overlap deve ser menor que --chunk-size")
+    if not config.GEMINI_API_KEY:
+        parser.error("GEMINI_API_KEY não configurada")
+    
+    build_index(
+        input_dir=args.input_dir,
+        output_dir=args.output_dir,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        max_retries=args.max_retries,
+        index_factory=args.index_factory,
+        save_embeddings=args.save_embeddings
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
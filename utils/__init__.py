@@ -3,17 +3,68 @@ Utils package - Utilitários e helpers.
 """
 
 from .firestore_client import firestore_client
+from .cache import TTLCache
+from .session_cache import session_cache
+from .pitch_job_writer import pitch_job_writer
+from .shutdown import register_shutdown_hook, run_shutdown_hooks
+from .single_flight import SingleFlight, embedding_flight, pitch_flight, animaguy_flight
+from .metrics import (
+    metrics,
+    METRICS_CONTENT_TYPE,
+    REQUESTS_TOTAL,
+    REQUESTS_IN_FLIGHT,
+    REQUEST_SECONDS,
+    AUDIO_BYTES,
+    PROMPT_CHARS,
+    stage_timer,
+    record_token_usage
+)
+from .sse import format_sse_event, SSE_HEADERS
+from .audio_normalizer import PreparedAudio, prepare_audio
+from .uploads import BoundedSpooledFile, SpooledRequest, hash_stream, copy_to_spooled_file
 from .validators import (
     validate_animaguy_request,
     validate_pitch_request,
+    validate_pitch_batch_request,
+    validate_callback_url,
     validate_mode,
     get_audio_mime_type
 )
+from .public_http import public_http_session
 
 __all__ = [
     'firestore_client',
+    'TTLCache',
+    'session_cache',
+    'pitch_job_writer',
+    'register_shutdown_hook',
+    'run_shutdown_hooks',
+    'SingleFlight',
+    'embedding_flight',
+    'pitch_flight',
+    'animaguy_flight',
+    'metrics',
+    'METRICS_CONTENT_TYPE',
+    'REQUESTS_TOTAL',
+    'REQUESTS_IN_FLIGHT',
+    'REQUEST_SECONDS',
+    'AUDIO_BYTES',
+    'PROMPT_CHARS',
+    'stage_timer',
+    'record_token_usage',
+    'format_sse_event',
+    'SSE_HEADERS',
+    'PreparedAudio',
+    'prepare_audio',
+    'BoundedSpooledFile',
+    'SpooledRequest',
+    'hash_stream',
+    'copy_to_spooled_file',
     'validate_animaguy_request',
     'validate_pitch_request',
+    'validate_pitch_batch_request',
+    'validate_callback_url',
     'validate_mode',
-    'get_audio_mime_type'
+    'get_audio_mime_type',
+    'public_http_session'
 ]
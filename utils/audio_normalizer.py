@@ -0,0 +1,219 @@
+"""
+Normalização do áudio de pitch antes do envio ao Gemini (opcional).
+
+Usa ffprobe para detectar o container e o codec reais (em vez de confiar na
+extensão) e ffmpeg para converter o áudio para voz: mono, taxa de amostragem
+reduzida, Opus em OGG e sem silêncio no início e no fim. Arquivos menores
+significam upload mais rápido, menor latência do modelo e menos tokens.
+Se o ffmpeg não estiver disponível ou falhar, o áudio original é usado.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Formatos do ffprobe (format_name) -> tipo MIME aceito pelo Gemini
+FORMAT_MIME_TYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'ogg': 'audio/ogg',
+    'flac': 'audio/flac',
+    'aac': 'audio/aac',
+    'mov,mp4,m4a,3gp,3g2,mj2': 'audio/mp4',
+    'matroska,webm': 'audio/webm'
+}
+
+# Converte para mono na taxa de voz antes de tudo (o areverse guarda o áudio
+# inteiro em memória) e remove o silêncio inicial e, com o áudio invertido, o final
+SILENCE_FILTER = (
+    "aformat=sample_fmts=s16:channel_layouts=mono:sample_rates={sample_rate},"
+    "silenceremove=start_periods=1:start_silence=0.2:start_threshold={threshold}dB,"
+    "areverse,"
+    "silenceremove=start_periods=1:start_silence=0.2:start_threshold={threshold}dB,"
+    "areverse"
+)
+
+
+class PreparedAudio:
+    """Áudio pronto para envio: o original ou a versão normalizada em um arquivo temporário."""
+    
+    def __init__(self, stream: BinaryIO, mime_type: str, original_size: int, size: int, path: Optional[str] = None):
+        """
+        Args:
+            stream: Stream a enviar (posicionado no início)
+            mime_type: Tipo MIME detectado
+            original_size: Tamanho do áudio recebido em bytes
+            size: Tamanho do áudio a enviar em bytes
+            path: Arquivo temporário do áudio normalizado (None se for o original)
+        """
+        self.stream = stream
+        self.mime_type = mime_type
+        self.original_size = original_size
+        self.size = size
+        self.path = path
+    
+    @property
+    def normalized(self) -> bool:
+        return self.path is not None
+    
+    def close(self) -> None:
+        """Fecha e remove o arquivo temporário do áudio normalizado (o original não é fechado)."""
+        if self.path is None:
+            return
+        self.stream.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def is_available() -> bool:
+    """Indica se ffmpeg e ffprobe estão instalados."""
+    return shutil.which(config.FFMPEG_PATH) is not None and shutil.which(config.FFPROBE_PATH) is not None
+
+
+def probe_audio(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Detecta container, codec, canais, taxa de amostragem e duração de um arquivo.
+    
+    Args:
+        path: Caminho do arquivo de áudio
+    
+    Returns:
+        Dict: 'format_name', 'codec_name', 'channels', 'sample_rate' e 'duration', ou None se falhar
+    """
+    try:
+        completed = subprocess.run(
+            [
+                config.FFPROBE_PATH, '-v', 'error',
+                '-select_streams', 'a:0',
+                '-show_entries', 'format=format_name,duration:stream=codec_name,channels,sample_rate',
+                '-of', 'json', path
+            ],
+            capture_output=True,
+            timeout=30,
+            check=True
+        )
+        data = json.loads(completed.stdout)
+        stream = (data.get('streams') or [{}])[0]
+        return {
+            'format_name': data.get('format', {}).get('format_name'),
+            'codec_name': stream.get('codec_name'),
+            'channels': int(stream.get('channels', 0)),
+            'sample_rate': int(stream.get('sample_rate', 0)),
+            'duration': float(data.get('format', {}).get('duration', 0.0))
+        }
+    except Exception as e:
+        logger.warning(f"ffprobe falhou para {path}: {e}")
+        return None
+
+
+def prepare_audio(stream: BinaryIO, fallback_mime_type: str) -> PreparedAudio:
+    """
+    Detecta o formato real do áudio e o converte para voz (AUDIO_NORMALIZATION_ENABLED).
+    
+    A conversão gera mono, AUDIO_NORMALIZE_SAMPLE_RATE Hz, Opus em OGG e remove o
+    silêncio no início e no fim. Áudios que já estão nesse formato, falhas do
+    ffmpeg ou sua ausência mantêm o original.
+    
+    Args:
+        stream: Stream do áudio original (volta ao início ao final)
+        fallback_mime_type: Tipo MIME usado se a detecção falhar (ex: pela extensão)
+    
+    Returns:
+        PreparedAudio: Áudio a enviar (chame close() ao final)
+    """
+    stream.seek(0, os.SEEK_END)
+    original_size = stream.tell()
+    stream.seek(0)
+    original = PreparedAudio(stream, fallback_mime_type, original_size, original_size)
+    
+    if not config.AUDIO_NORMALIZATION_ENABLED:
+        return original
+    
+    if not is_available():
+        logger.warning("ffmpeg/ffprobe não encontrados; áudio enviado sem normalização")
+        return original
+    
+    start_time = time.monotonic()
+    with tempfile.NamedTemporaryFile(suffix='.audio') as source:
+        _copy_stream(stream, source)
+        info = probe_audio(source.name)
+        if info is None:
+            return original
+        
+        original.mime_type = FORMAT_MIME_TYPES.get(info['format_name'], fallback_mime_type)
+        logger.info(
+            f"Áudio original: {info['format_name']}/{info['codec_name']}, {info['channels']} canal(is), "
+            f"{info['sample_rate']}Hz, {info['duration']:.1f}s, {original_size} bytes"
+        )
+        
+        # Apenas Opus em OGG é aceito pelo Gemini como está (WebM/Matroska é convertido)
+        already_speech = (
+            info['format_name'] == 'ogg'
+            and info['codec_name'] == 'opus'
+            and info['channels'] == 1
+            and info['sample_rate'] <= config.AUDIO_NORMALIZE_SAMPLE_RATE
+        )
+        if already_speech:
+            return original
+        
+        output_fd, output_path = tempfile.mkstemp(suffix='.ogg')
+        os.close(output_fd)
+        try:
+            subprocess.run(
+                [
+                    config.FFMPEG_PATH, '-v', 'error', '-y',
+                    '-i', source.name,
+                    '-vn',
+                    '-af', SILENCE_FILTER.format(
+                        threshold=config.AUDIO_SILENCE_THRESHOLD_DB,
+                        sample_rate=config.AUDIO_NORMALIZE_SAMPLE_RATE
+                    ),
+                    '-ac', '1',
+                    '-ar', str(config.AUDIO_NORMALIZE_SAMPLE_RATE),
+                    '-c:a', 'libopus',
+                    '-b:a', config.AUDIO_NORMALIZE_BITRATE,
+                    '-application', 'voip',
+                    output_path
+                ],
+                capture_output=True,
+                timeout=config.AUDIO_NORMALIZE_TIMEOUT,
+                check=True
+            )
+        except Exception as e:
+            stderr = getattr(e, 'stderr', b'') or b''
+            logger.warning(f"ffmpeg falhou; áudio enviado sem normalização: {e} {stderr.decode(errors='ignore')[:300]}")
+            os.remove(output_path)
+            return original
+    
+    normalized_size = os.path.getsize(output_path)
+    if normalized_size == 0:
+        # Áudio inteiro abaixo do limiar de silêncio: mantém o original
+        logger.warning("Áudio normalizado ficou vazio; usando o original")
+        os.remove(output_path)
+        return original
+    
+    logger.info(
+        f"Áudio normalizado: {original_size} -> {normalized_size} bytes "
+        f"({normalized_size / original_size:.0%}) em {time.monotonic() - start_time:.1f}s"
+    )
+    return PreparedAudio(open(output_path, 'rb'), 'audio/ogg', original_size, normalized_size, path=output_path)
+
+
+def _copy_stream(stream: BinaryIO, destination) -> int:
+    """Copia o stream em blocos para um arquivo e volta o stream ao início."""
+    stream.seek(0)
+    shutil.copyfileobj(stream, destination, config.UPLOAD_CHUNK_SIZE)
+    destination.flush()
+    stream.seek(0)
+    return destination.tell()
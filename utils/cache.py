@@ -0,0 +1,102 @@
+"""
+Cache em memória com política LRU e expiração por TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Cache LRU thread-safe com expiração por tempo de vida (TTL)."""
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        """
+        Inicializa o cache.
+        
+        Args:
+            max_size: Número máximo de entradas antes de descartar a menos usada
+            ttl_seconds: Tempo de vida de cada entrada em segundos (<= 0 desativa a expiração)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Recupera um valor do cache.
+        
+        Args:
+            key: Chave da entrada
+        
+        Returns:
+            O valor armazenado, ou None se ausente ou expirado
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Armazena um valor no cache, descartando a entrada menos usada se necessário.
+        
+        Args:
+            key: Chave da entrada
+            value: Valor a armazenar
+        """
+        if self.max_size <= 0:
+            return
+        
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas de uso do cache.
+        
+        Returns:
+            Dict: Tamanho, capacidade, hits, misses, evictions e hit rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
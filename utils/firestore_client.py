@@ -4,18 +4,23 @@ Cliente para operações com Google Firestore.
 
 import logging
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
 from typing import Optional, Dict, Any, List
 
 import config
 
 logger = logging.getLogger(__name__)
 
+# Máximo de operações por batch de escrita do Firestore
+FIRESTORE_BATCH_LIMIT = 500
+
 class FirestoreClient:
     """Cliente para operações com Firestore."""
     
     def __init__(self):
         """Inicializa o cliente Firestore."""
         self.db: Optional[firestore.Client] = None
+        self.async_db: Optional[firestore.AsyncClient] = None  # Criado sob demanda no event loop
         self._initialize()
     
     def _initialize(self):
@@ -26,120 +31,444 @@ class FirestoreClient:
         except Exception as e:
             logger.error(f"Erro ao inicializar Firestore: {e}", exc_info=True)
     
-    def get_session_history(self, session_id: str) -> List[Dict[str, Any]]:
+    def get_session_window(self, session_id: str, max_turns: int) -> Dict[str, Any]:
         """
-        Recupera o histórico de uma sessão do AnimaGuy.
+        Recupera o resumo e os últimos turnos de uma sessão do AnimaGuy.
+        
+        Cada turno (pergunta + resposta) é um documento da subcoleção 'turns';
+        sessões antigas com o array 'history' são lidas no formato legado.
         
         Args:
             session_id: ID da sessão
+            max_turns: Número máximo de turnos recentes a retornar
             
         Returns:
-            List: Lista com histórico de mensagens
+            Dict: 'turns' (lista de {'turn', 'user', 'model'} em ordem cronológica),
+                  'summary', 'turn_count' e 'summarized_turns'
         """
+        window = {"turns": [], "summary": None, "turn_count": 0, "summarized_turns": 0}
+        
         if not self.db:
             logger.error("Firestore não inicializado.")
-            return []
+            return window
         
         try:
-            doc_ref = self.db.collection('animaguy_sessions').document(session_id)
-            doc = doc_ref.get()
-            
-            if doc.exists:
-                data = doc.to_dict()
-                history = data.get('history', [])
-                logger.info(f"Histórico recuperado para sessão {session_id}: {len(history)} mensagens")
-                return history
-            else:
+            session_ref = self.db.collection('animaguy_sessions').document(session_id)
+            doc = session_ref.get()
+            if not doc.exists:
                 logger.info(f"Nenhum histórico encontrado para sessão {session_id}")
-                return []
-                
+                return window
+            
+            data = doc.to_dict()
+            window["summary"] = data.get('summary')
+            window["summarized_turns"] = data.get('summarized_turns', 0)
+            
+            # Sessões antigas guardam os primeiros turnos no array 'history' do documento
+            legacy_turns = _pair_legacy_history(data.get('history', []))
+            window["turn_count"] = data.get('turn_count', len(legacy_turns))
+            
+            if max_turns > 0:
+                turns = []
+                if window["turn_count"] > len(legacy_turns):
+                    query = (
+                        session_ref.collection('turns')
+                        .order_by('turn', direction=firestore.Query.DESCENDING)
+                        .limit(max_turns)
+                    )
+                    turns = [turn.to_dict() for turn in query.stream()][::-1]
+                window["turns"] = (legacy_turns + turns)[-max_turns:]
+            
+            logger.info(
+                f"Histórico recuperado para sessão {session_id}: {len(window['turns'])} de "
+                f"{window['turn_count']} turnos (resumo: {'sim' if window['summary'] else 'não'})"
+            )
+            return window
+            
         except Exception as e:
             logger.error(f"Erro ao recuperar histórico da sessão {session_id}: {e}", exc_info=True)
-            return []
+            return window
     
-    def save_session_history(self, session_id: str, history: List[Dict[str, Any]]) -> bool:
+    def append_session_turn(self, session_id: str, user_message: str, answer: str) -> Optional[int]:
         """
-        Salva o histórico de uma sessão do AnimaGuy.
+        Acrescenta um turno à sessão sem reescrever o histórico anterior.
+        
+        O número do turno é alocado em uma transação que incrementa 'turn_count':
+        requisições concorrentes da mesma sessão (em qualquer instância) recebem
+        números distintos em vez de sobrescrever o mesmo documento.
         
         Args:
             session_id: ID da sessão
-            history: Lista com histórico de mensagens
+            user_message: Mensagem do usuário
+            answer: Resposta do modelo
             
         Returns:
-            bool: True se salvou com sucesso
+            int: Número atribuído ao turno, ou None se não salvou
+        """
+        if not self.db:
+            logger.error("Firestore não inicializado.")
+            return None
+        
+        session_ref = self.db.collection('animaguy_sessions').document(session_id)
+        
+        @firestore.transactional
+        def append_in_transaction(transaction) -> int:
+            snapshot = session_ref.get(transaction=transaction)
+            turn_number = _next_turn_number(snapshot.to_dict())
+            _add_turn_to_transaction(transaction, session_ref, turn_number, user_message, answer)
+            return turn_number
+        
+        try:
+            turn_number = append_in_transaction(self.db.transaction())
+            logger.info(f"Turno {turn_number} salvo para sessão {session_id}")
+            return turn_number
+            
+        except Exception as e:
+            logger.error(f"Erro ao salvar turno da sessão {session_id}: {e}", exc_info=True)
+            return None
+    
+    def append_session_turns(self, turns_by_session: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """
+        Grava em lote turnos de várias sessões (usado pela gravação adiada do cache de sessões).
+        
+        Args:
+            turns_by_session: {session_id: [{'turn', 'user', 'model'}, ...]}
+            
+        Returns:
+            bool: True se todos os lotes foram gravados
         """
         if not self.db:
             logger.error("Firestore não inicializado.")
             return False
         
         try:
-            doc_ref = self.db.collection('animaguy_sessions').document(session_id)
-            doc_ref.set({
-                'history': history,
-                'last_updated': firestore.SERVER_TIMESTAMP
-            })
-            logger.info(f"Histórico salvo para sessão {session_id}: {len(history)} mensagens")
+            batch = self.db.batch()
+            operations = 0
+            for session_id, turns in turns_by_session.items():
+                for turn in turns:
+                    # Cada turno usa 2 operações; um batch aceita até 500
+                    if operations >= FIRESTORE_BATCH_LIMIT - 2:
+                        batch.commit()
+                        batch = self.db.batch()
+                        operations = 0
+                    self._add_turn_to_batch(batch, session_id, turn['turn'], turn['user'], turn['model'])
+                    operations += 2
+            
+            if operations:
+                batch.commit()
             return True
             
         except Exception as e:
-            logger.error(f"Erro ao salvar histórico da sessão {session_id}: {e}", exc_info=True)
+            logger.error(f"Erro ao gravar turnos em lote: {e}", exc_info=True)
             return False
     
-    def create_pitch_job(self, job_id: str, initial_data: Dict[str, Any]) -> bool:
+    def get_session_turns(self, session_id: str, first_turn: int, last_turn: int) -> List[Dict[str, Any]]:
         """
-        Cria um job de processamento de pitch no Firestore.
+        Recupera um intervalo de turnos de uma sessão (usado na sumarização).
         
         Args:
-            job_id: ID do job
-            initial_data: Dados iniciais do job
+            session_id: ID da sessão
+            first_turn: Primeiro turno (inclusive)
+            last_turn: Último turno (inclusive)
+            
+        Returns:
+            List: Turnos {'turn', 'user', 'model'} em ordem cronológica
+        """
+        if not self.db:
+            logger.error("Firestore não inicializado.")
+            return []
+        
+        try:
+            session_ref = self.db.collection('animaguy_sessions').document(session_id)
+            data = session_ref.get().to_dict() or {}
+            legacy_turns = _pair_legacy_history(data.get('history', []))
+            turns = [turn for turn in legacy_turns if first_turn <= turn['turn'] <= last_turn]
+            
+            if last_turn > len(legacy_turns):
+                query = (
+                    session_ref.collection('turns')
+                    .where(filter=FieldFilter('turn', '>=', max(first_turn, len(legacy_turns) + 1)))
+                    .where(filter=FieldFilter('turn', '<=', last_turn))
+                    .order_by('turn')
+                )
+                turns.extend(turn.to_dict() for turn in query.stream())
+            return turns
+            
+        except Exception as e:
+            logger.error(f"Erro ao recuperar turnos da sessão {session_id}: {e}", exc_info=True)
+            return []
+    
+    def save_session_summary(self, session_id: str, summary: str, summarized_turns: int) -> bool:
+        """
+        Salva o resumo compacto dos turnos antigos de uma sessão.
+        
+        Args:
+            session_id: ID da sessão
+            summary: Resumo acumulado da conversa
+            summarized_turns: Número de turnos cobertos pelo resumo
             
         Returns:
-            bool: True se criou com sucesso
+            bool: True se salvou com sucesso
         """
         if not self.db:
             logger.error("Firestore não inicializado.")
             return False
         
         try:
-            doc_ref = self.db.collection('pitch_jobs').document(job_id)
-            job_data = {
-                'id': job_id,
-                'status': 'PROCESSING',
-                'timestamp': firestore.SERVER_TIMESTAMP,
-                **initial_data
-            }
-            doc_ref.set(job_data)
-            logger.info(f"Job de pitch {job_id} criado no Firestore.")
+            self.db.collection('animaguy_sessions').document(session_id).set({
+                'summary': summary,
+                'summarized_turns': summarized_turns
+            }, merge=True)
+            logger.info(f"Resumo da sessão {session_id} atualizado ({summarized_turns} turnos)")
             return True
             
         except Exception as e:
-            logger.error(f"Erro ao criar job {job_id}: {e}", exc_info=True)
+            logger.error(f"Erro ao salvar resumo da sessão {session_id}: {e}", exc_info=True)
             return False
     
-    def update_pitch_job(self, job_id: str, updates: Dict[str, Any]) -> bool:
+    def _add_turn_to_batch(self, batch, session_id: str, turn_number: int, user_message: str, answer: str) -> None:
+        """Adiciona a gravação de um turno (documento novo + contador da sessão) a um batch."""
+        session_ref = self.db.collection('animaguy_sessions').document(session_id)
+        batch.set(session_ref.collection('turns').document(f"{turn_number:08d}"), {
+            'turn': turn_number,
+            'user': user_message,
+            'model': answer,
+            'created_at': firestore.SERVER_TIMESTAMP
+        })
+        batch.set(session_ref, {
+            'turn_count': turn_number,
+            'last_updated': firestore.SERVER_TIMESTAMP
+        }, merge=True)
+    
+    def get_pitch_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         """
-        Atualiza um job de processamento de pitch.
+        Recupera um job de processamento de pitch.
         
         Args:
             job_id: ID do job
-            updates: Dados a atualizar
             
         Returns:
-            bool: True se atualizou com sucesso
+            Dict: Dados do job, ou None se não existir
+        """
+        if not self.db:
+            logger.error("Firestore não inicializado.")
+            return None
+        
+        try:
+            doc = self.db.collection('pitch_jobs').document(job_id).get()
+            return doc.to_dict() if doc.exists else None
+            
+        except Exception as e:
+            logger.error(f"Erro ao recuperar job {job_id}: {e}", exc_info=True)
+            return None
+    
+    def write_pitch_jobs(self, jobs: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Grava em lote criações/atualizações de jobs de pitch (merge por documento).
+        
+        Args:
+            jobs: {job_id: campos a gravar}
+            
+        Returns:
+            bool: True se todos os lotes foram gravados
         """
         if not self.db:
             logger.error("Firestore não inicializado.")
             return False
         
         try:
-            doc_ref = self.db.collection('pitch_jobs').document(job_id)
-            doc_ref.update(updates)
-            logger.info(f"Job {job_id} atualizado no Firestore.")
+            job_items = list(jobs.items())
+            for start in range(0, len(job_items), FIRESTORE_BATCH_LIMIT):
+                batch = self.db.batch()
+                for job_id, data in job_items[start:start + FIRESTORE_BATCH_LIMIT]:
+                    batch.set(self.db.collection('pitch_jobs').document(job_id), data, merge=True)
+                batch.commit()
+            logger.info(f"{len(job_items)} jobs de pitch gravados no Firestore.")
             return True
             
         except Exception as e:
-            logger.error(f"Erro ao atualizar job {job_id}: {e}", exc_info=True)
+            logger.error(f"Erro ao gravar jobs de pitch em lote: {e}", exc_info=True)
             return False
+    
+    async def get_session_window_async(self, session_id: str, max_turns: int) -> Dict[str, Any]:
+        """
+        Versão assíncrona de get_session_window.
+        
+        Args:
+            session_id: ID da sessão
+            max_turns: Número máximo de turnos recentes a retornar
+            
+        Returns:
+            Dict: 'turns', 'summary', 'turn_count' e 'summarized_turns'
+        """
+        window = {"turns": [], "summary": None, "turn_count": 0, "summarized_turns": 0}
+        
+        db = self._get_async_db()
+        if not db:
+            return window
+        
+        try:
+            session_ref = db.collection('animaguy_sessions').document(session_id)
+            doc = await session_ref.get()
+            if not doc.exists:
+                logger.info(f"Nenhum histórico encontrado para sessão {session_id}")
+                return window
+            
+            data = doc.to_dict()
+            window["summary"] = data.get('summary')
+            window["summarized_turns"] = data.get('summarized_turns', 0)
+            
+            # Sessões antigas guardam os primeiros turnos no array 'history' do documento
+            legacy_turns = _pair_legacy_history(data.get('history', []))
+            window["turn_count"] = data.get('turn_count', len(legacy_turns))
+            
+            if max_turns > 0:
+                turns = []
+                if window["turn_count"] > len(legacy_turns):
+                    query = (
+                        session_ref.collection('turns')
+                        .order_by('turn', direction=firestore.Query.DESCENDING)
+                        .limit(max_turns)
+                    )
+                    turns = [turn.to_dict() async for turn in query.stream()][::-1]
+                window["turns"] = (legacy_turns + turns)[-max_turns:]
+            
+            logger.info(
+                f"Histórico recuperado para sessão {session_id}: {len(window['turns'])} de "
+                f"{window['turn_count']} turnos (resumo: {'sim' if window['summary'] else 'não'})"
+            )
+            return window
+            
+        except Exception as e:
+            logger.error(f"Erro ao recuperar histórico da sessão {session_id}: {e}", exc_info=True)
+            return window
+    
+    async def append_session_turn_async(self, session_id: str, user_message: str, answer: str) -> Optional[int]:
+        """
+        Versão assíncrona de append_session_turn.
+        
+        Args:
+            session_id: ID da sessão
+            user_message: Mensagem do usuário
+            answer: Resposta do modelo
+            
+        Returns:
+            int: Número atribuído ao turno, ou None se não salvou
+        """
+        db = self._get_async_db()
+        if not db:
+            return None
+        
+        session_ref = db.collection('animaguy_sessions').document(session_id)
+        
+        @firestore.async_transactional
+        async def append_in_transaction(transaction) -> int:
+            snapshot = await session_ref.get(transaction=transaction)
+            turn_number = _next_turn_number(snapshot.to_dict())
+            _add_turn_to_transaction(transaction, session_ref, turn_number, user_message, answer)
+            return turn_number
+        
+        try:
+            turn_number = await append_in_transaction(db.transaction())
+            logger.info(f"Turno {turn_number} salvo para sessão {session_id}")
+            return turn_number
+            
+        except Exception as e:
+            logger.error(f"Erro ao salvar turno da sessão {session_id}: {e}", exc_info=True)
+            return None
+    
+    async def get_pitch_job_async(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Versão assíncrona de get_pitch_job.
+        
+        Args:
+            job_id: ID do job
+            
+        Returns:
+            Dict: Dados do job, ou None se não existir
+        """
+        db = self._get_async_db()
+        if not db:
+            return None
+        
+        try:
+            doc = await db.collection('pitch_jobs').document(job_id).get()
+            return doc.to_dict() if doc.exists else None
+            
+        except Exception as e:
+            logger.error(f"Erro ao recuperar job {job_id}: {e}", exc_info=True)
+            return None
+    
+    def _get_async_db(self) -> Optional[firestore.AsyncClient]:
+        """Retorna o cliente assíncrono, criando-o no primeiro uso (dentro do event loop)."""
+        if self.async_db is None:
+            try:
+                self.async_db = firestore.AsyncClient(project=config.PROJECT_ID)
+                logger.info("Cliente Firestore assíncrono inicializado com sucesso.")
+            except Exception as e:
+                logger.error(f"Erro ao inicializar Firestore assíncrono: {e}", exc_info=True)
+                return None
+        return self.async_db
+    
+    def find_pitch_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Procura o resultado de um job de pitch concluído com a mesma chave de cache.
+        
+        Args:
+            cache_key: Chave de conteúdo do pitch (hash do áudio/texto, prompt e modelo)
+            
+        Returns:
+            Dict: Resultado armazenado do job, ou None se não encontrado
+        """
+        if not self.db:
+            logger.error("Firestore não inicializado.")
+            return None
+        
+        try:
+            query = (
+                self.db.collection('pitch_jobs')
+                .where(filter=FieldFilter('cache_key', '==', cache_key))
+                .where(filter=FieldFilter('status', '==', 'COMPLETE'))
+                .limit(1)
+            )
+            for doc in query.stream():
+                result = doc.to_dict().get('result')
+                if result:
+                    logger.info(f"Resultado de pitch encontrado no Firestore (job {doc.id}).")
+                    return result
+            return None
+            
+        except Exception as e:
+            logger.error(f"Erro ao buscar resultado de pitch em cache: {e}", exc_info=True)
+            return None
+
+def _next_turn_number(session_data: Optional[Dict[str, Any]]) -> int:
+    """Próximo número de turno de uma sessão (sessões legadas contam os turnos do array 'history')."""
+    data = session_data or {}
+    return data.get('turn_count', len(_pair_legacy_history(data.get('history', [])))) + 1
+
+def _add_turn_to_transaction(transaction, session_ref, turn_number: int, user_message: str, answer: str) -> None:
+    """Cria o documento do turno (falha se já existir) e avança o contador da sessão na transação."""
+    transaction.create(session_ref.collection('turns').document(f"{turn_number:08d}"), {
+        'turn': turn_number,
+        'user': user_message,
+        'model': answer,
+        'created_at': firestore.SERVER_TIMESTAMP
+    })
+    transaction.set(session_ref, {
+        'turn_count': turn_number,
+        'last_updated': firestore.SERVER_TIMESTAMP
+    }, merge=True)
+
+def _pair_legacy_history(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Converte o array legado de mensagens (user/model alternados) em turnos numerados."""
+    turns = []
+    for position in range(0, len(history) - 1, 2):
+        turns.append({
+            'turn': position // 2 + 1,
+            'user': history[position]['parts'][0],
+            'model': history[position + 1]['parts'][0]
+        })
+    return turns
 
 # Instância global do cliente Firestore (singleton)
 firestore_client = FirestoreClient()
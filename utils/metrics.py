@@ -0,0 +1,345 @@
+"""
+Métricas do serviço no formato de texto do Prometheus (endpoint /metrics).
+
+Contadores, gauges e histogramas sem dependências externas. Cada thread grava
+em um shard próprio (sem lock no caminho quente; o lock só é usado quando uma
+thread grava pela primeira vez em uma métrica) e os shards são somados apenas
+na coleta. Estatísticas que os serviços já mantêm (caches, single-flight,
+política do Gemini) entram por coletores chamados no momento da coleta.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Tipo de conteúdo da exposição em texto do Prometheus
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Buckets padrão (segundos) para latências de etapas e requisições
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Buckets de tamanho para bytes de áudio e caracteres de prompt
+AUDIO_BYTES_BUCKETS = (64e3, 256e3, 1e6, 2e6, 5e6, 10e6, 25e6)
+PROMPT_CHARS_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _Metric:
+    """Base das métricas: nome, ajuda, rótulos e shards por thread."""
+    
+    metric_type = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+    
+    def _shard(self) -> dict:
+        """Retorna o shard da thread atual, criando-o na primeira gravação."""
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.values = shard
+        return shard
+    
+    def _snapshot(self) -> List[dict]:
+        """Copia os shards (a cópia de um dict não libera o GIL)."""
+        with self._lock:
+            shards = list(self._shards)
+        return [dict(shard) for shard in shards]
+    
+    def _labels(self, values: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+    
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotônico."""
+    
+    metric_type = "counter"
+    
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """
+        Incrementa o contador.
+        
+        Args:
+            *labelvalues: Valores dos rótulos, na ordem de labelnames
+            amount: Valor a somar (não negativo)
+        """
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0.0) + amount
+    
+    def samples(self) -> List[Sample]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._snapshot():
+            for labelvalues, value in shard.items():
+                totals[labelvalues] = totals.get(labelvalues, 0.0) + value
+        return [(self.name, self._labels(labelvalues), value) for labelvalues, value in sorted(totals.items())]
+
+
+class Gauge(Counter):
+    """Valor que sobe e desce (ex: requisições em andamento)."""
+    
+    metric_type = "gauge"
+    
+    def dec(self, *labelvalues: str, amount: float = 1.0) -> None:
+        """
+        Decrementa o gauge.
+        
+        Args:
+            *labelvalues: Valores dos rótulos, na ordem de labelnames
+            amount: Valor a subtrair
+        """
+        self.inc(*labelvalues, amount=-amount)
+    
+    @contextmanager
+    def track(self, *labelvalues: str) -> Iterator[None]:
+        """Incrementa o gauge durante o bloco."""
+        self.inc(*labelvalues)
+        try:
+            yield
+        finally:
+            self.dec(*labelvalues)
+
+
+class Histogram(_Metric):
+    """Histograma com buckets fixos, soma e contagem."""
+    
+    metric_type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """
+        Registra uma observação.
+        
+        Args:
+            value: Valor observado (ex: segundos, bytes)
+            *labelvalues: Valores dos rótulos, na ordem de labelnames
+        """
+        shard = self._shard()
+        entry = shard.get(labelvalues)
+        if entry is None:
+            # [contagens por bucket (a última é +Inf), soma]
+            entry = shard[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+    
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        """Registra a duração do bloco em segundos."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+    
+    def samples(self) -> List[Sample]:
+        totals: Dict[LabelValues, list] = {}
+        for shard in self._snapshot():
+            for labelvalues, (counts, total) in shard.items():
+                merged = totals.setdefault(labelvalues, [[0] * (len(self.buckets) + 1), 0.0])
+                for position, count in enumerate(list(counts)):
+                    merged[0][position] += count
+                merged[1] += total
+        
+        samples: List[Sample] = []
+        for labelvalues, (counts, total) in sorted(totals.items()):
+            labels = self._labels(labelvalues)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Registro das métricas e coletores expostos em /metrics."""
+    
+    def __init__(self, prefix: str, enabled: bool = True):
+        """
+        Inicializa o registro.
+        
+        Args:
+            prefix: Prefixo dos nomes das métricas
+            enabled: Se False, /metrics responde vazio (as gravações continuam baratas)
+        """
+        self.prefix = prefix
+        self.enabled = enabled
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], List[Tuple[Dict[str, str], float]]]]] = []
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(f"{self.prefix}_{name}", documentation, labelnames))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+    
+    def register_collector(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        collect: Callable[[], List[Tuple[Dict[str, str], float]]]
+    ) -> None:
+        """
+        Registra uma métrica lida de estatísticas existentes no momento da coleta.
+        
+        Args:
+            name: Nome da métrica (sem o prefixo)
+            documentation: Texto de ajuda
+            metric_type: 'counter' ou 'gauge'
+            collect: Função que retorna [(rótulos, valor)]
+        """
+        self._collectors.append((f"{self.prefix}_{name}", documentation, metric_type, collect))
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        """
+        Gera a exposição em texto de todas as métricas.
+        
+        Returns:
+            str: Conteúdo no formato de texto do Prometheus
+        """
+        if not self.enabled:
+            return ""
+        
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(_header(metric.name, metric.documentation, metric.metric_type))
+            lines.extend(_sample_line(name, labels, value) for name, labels, value in metric.samples())
+        
+        for name, documentation, metric_type, collect in self._collectors:
+            try:
+                samples = collect()
+            except Exception as e:
+                # Um serviço indisponível não derruba a coleta das demais métricas
+                logger.warning(f"Falha ao coletar a métrica {name}: {e}")
+                continue
+            lines.extend(_header(name, documentation, metric_type))
+            lines.extend(_sample_line(name, labels, value) for labels, value in samples)
+        
+        return "\n".join(lines) + "\n"
+
+
+def _header(name: str, documentation: str, metric_type: str) -> List[str]:
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+
+
+def _sample_line(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        rendered = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+        return f"{name}{{{rendered}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Instância global do registro de métricas (singleton)
+metrics = MetricsRegistry(prefix="llm", enabled=config.METRICS_ENABLED)
+
+REQUESTS_TOTAL = metrics.counter("requests_total", "Requisições HTTP por endpoint e status.", ("endpoint", "status"))
+REQUESTS_IN_FLIGHT = metrics.gauge("requests_in_flight", "Requisições HTTP em andamento por endpoint.", ("endpoint",))
+REQUEST_SECONDS = metrics.histogram("request_duration_seconds", "Duração das requisições HTTP.", ("endpoint",))
+STAGE_SECONDS = metrics.histogram(
+    "stage_duration_seconds",
+    "Duração de cada etapa do processamento (embedding, busca, histórico, geração).",
+    ("stage",)
+)
+STAGE_ERRORS = metrics.counter("stage_errors_total", "Etapas que terminaram com erro.", ("stage",))
+STAGES_IN_FLIGHT = metrics.gauge("stages_in_flight", "Etapas em andamento.", ("stage",))
+AUDIO_BYTES = metrics.histogram("audio_bytes", "Tamanho dos áudios de pitch enviados ao Gemini.", buckets=AUDIO_BYTES_BUCKETS)
+PROMPT_CHARS = metrics.histogram(
+    "prompt_chars",
+    "Caracteres do prompt (instrução, contexto e mensagem) por operação.",
+    ("operation",),
+    buckets=PROMPT_CHARS_BUCKETS
+)
+GEMINI_TOKENS = metrics.counter(
+    "gemini_tokens_total",
+    "Tokens informados no usage_metadata das respostas do Gemini.",
+    ("operation", "kind")
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Mede uma etapa: duração, etapas em andamento e erros.
+    
+    Args:
+        stage: Nome da etapa (ex: 'embed_content', 'index_search', 'gemini_chat')
+    """
+    STAGES_IN_FLIGHT.inc(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+        STAGES_IN_FLIGHT.dec(stage)
+
+
+def record_token_usage(operation: str, response) -> None:
+    """
+    Soma os tokens do usage_metadata de uma resposta do Gemini.
+    
+    Args:
+        operation: Operação (ex: 'chat', 'pitch_text', 'pitch_audio', 'summary')
+        response: Resposta de generate_content/send_message (já consumida, se em streaming)
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, field in (
+        ("prompt", "prompt_token_count"),
+        ("cached", "cached_content_token_count"),
+        ("candidates", "candidates_token_count")
+    ):
+        count = getattr(usage, field, 0) or 0
+        if count:
+            GEMINI_TOKENS.inc(operation, kind, amount=float(count))
@@ -0,0 +1,222 @@
+"""
+Gravação em segundo plano do tracking de jobs de pitch.
+
+As criações e atualizações de documentos em 'pitch_jobs' são enfileiradas em
+memória, combinadas por job (criação + conclusão viram uma única escrita) e
+gravadas em batches do Firestore por uma thread própria, fora do caminho da
+requisição. A fila é limitada: quando cheia, quem enfileira grava as
+pendências na própria thread. As pendências são gravadas no encerramento e,
+a partir dele, cada escrita é gravada de forma síncrona (requisições e jobs
+ainda em andamento concluem depois do SIGTERM).
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from google.cloud import firestore
+
+import config
+from .firestore_client import firestore_client
+from .shutdown import register_shutdown_hook
+
+logger = logging.getLogger(__name__)
+
+
+class PitchJobWriter:
+    """Fila limitada de escritas de jobs de pitch, gravada em batches."""
+    
+    def __init__(self, max_pending: int, batch_size: int, flush_interval: float):
+        """
+        Inicializa o gravador.
+        
+        Args:
+            max_pending: Máximo de jobs com escrita pendente em memória
+            batch_size: Jobs pendentes que disparam uma gravação antes do intervalo
+            flush_interval: Intervalo máximo entre gravações (segundos)
+        """
+        self.max_pending = max(1, max_pending)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._oldest_pending_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.enqueued = 0
+        self.written = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.inline_flushes = 0
+        self.last_flush_lag_seconds: Optional[float] = None
+    
+    def create(self, job_id: str, initial_data: Dict[str, Any]) -> None:
+        """
+        Enfileira a criação de um job (status PROCESSING).
+        
+        Args:
+            job_id: ID do job
+            initial_data: Dados iniciais do job
+        """
+        self._enqueue(job_id, {
+            'id': job_id,
+            'status': 'PROCESSING',
+            'timestamp': firestore.SERVER_TIMESTAMP,
+            **initial_data
+        })
+    
+    def update(self, job_id: str, updates: Dict[str, Any]) -> None:
+        """
+        Enfileira a atualização de um job.
+        
+        Args:
+            job_id: ID do job
+            updates: Dados a atualizar
+        """
+        self._enqueue(job_id, updates)
+    
+    def get_pending(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna os campos ainda não gravados de um job, se houver.
+        
+        Args:
+            job_id: ID do job
+        
+        Returns:
+            Dict: Cópia dos campos pendentes, ou None
+        """
+        with self._lock:
+            data = self._pending.get(job_id)
+            return copy.deepcopy(data) if data is not None else None
+    
+    def flush(self) -> bool:
+        """
+        Grava todas as escritas pendentes em batches.
+        
+        Returns:
+            bool: True se não havia pendências ou se a gravação foi bem-sucedida
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return True
+                pending, self._pending = self._pending, OrderedDict()
+                oldest_pending_at, self._oldest_pending_at = self._oldest_pending_at, None
+            
+            if firestore_client.write_pitch_jobs(pending):
+                self.flushes += 1
+                self.written += len(pending)
+                self.last_flush_lag_seconds = round(time.monotonic() - oldest_pending_at, 3)
+                return True
+            
+            # Devolve à fila o que couber; o restante é descartado (memória limitada)
+            self.flush_errors += 1
+            with self._lock:
+                for job_id, data in reversed(pending.items()):
+                    if len(self._pending) >= self.max_pending:
+                        logger.error(f"Fila de jobs de pitch cheia; escrita do job {job_id} descartada")
+                        continue
+                    merged = {**data, **self._pending.get(job_id, {})}
+                    self._pending[job_id] = merged
+                    self._pending.move_to_end(job_id, last=False)
+                self._oldest_pending_at = oldest_pending_at
+            return False
+    
+    def start(self) -> bool:
+        """
+        Inicia a thread de gravação e registra o flush de encerramento (SIGTERM).
+        
+        Returns:
+            bool: True se a thread foi iniciada nesta chamada
+        """
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._thread = threading.Thread(target=self._run, name="pitch-job-writer", daemon=True)
+        
+        register_shutdown_hook("pitch_job_writer", self.stop)
+        self._thread.start()
+        logger.info(f"Gravação em lote de jobs de pitch ativa (intervalo: {self.flush_interval}s)")
+        return True
+    
+    def stop(self) -> None:
+        """
+        Encerra a thread de gravação e grava as pendências restantes.
+        
+        Idempotente: é chamado no SIGTERM e de novo após a drenagem do servidor.
+        Depois dele, _enqueue grava cada escrita na thread de quem enfileirou.
+        """
+        self._stop_event.set()
+        self._wake_event.set()
+        self.flush()
+    
+    def _enqueue(self, job_id: str, data: Dict[str, Any]) -> None:
+        """Combina a escrita com as pendentes do mesmo job e acorda a thread se necessário."""
+        with self._lock:
+            self._pending.setdefault(job_id, {}).update(data)
+            self.enqueued += 1
+            if self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+            pending_count = len(self._pending)
+        
+        if self._stop_event.is_set():
+            # Encerramento em andamento: não há thread para gravar depois
+            self.flush()
+            return
+        
+        if self._thread is None:
+            self.start()
+        
+        if pending_count >= self.max_pending:
+            # Fila cheia: grava na thread de quem enfileirou (backpressure)
+            self.inline_flushes += 1
+            self.flush()
+        elif pending_count >= self.batch_size:
+            self._wake_event.set()
+    
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.flush_interval)
+            self._wake_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.flush_errors += 1
+                logger.error(f"Erro na gravação de jobs de pitch: {e}", exc_info=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da fila de gravação.
+        
+        Returns:
+            Dict: Pendências, idade da pendência mais antiga, contadores e atraso da última gravação
+        """
+        with self._lock:
+            pending_age = (
+                round(time.monotonic() - self._oldest_pending_at, 3)
+                if self._oldest_pending_at is not None else 0.0
+            )
+            return {
+                "pending_jobs": len(self._pending),
+                "max_pending": self.max_pending,
+                "pending_age_seconds": pending_age,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "inline_flushes": self.inline_flushes,
+                "last_flush_lag_seconds": self.last_flush_lag_seconds
+            }
+
+
+# Instância global do gravador de jobs de pitch (singleton)
+pitch_job_writer = PitchJobWriter(
+    max_pending=config.PITCH_JOB_MAX_PENDING,
+    batch_size=config.PITCH_JOB_BATCH_SIZE,
+    flush_interval=config.PITCH_JOB_FLUSH_INTERVAL
+)
@@ -0,0 +1,65 @@
+"""
+Cliente HTTP que só se conecta a endereços públicos (envio das callbacks).
+
+validate_callback_url resolve o host antes do envio, mas o requests resolve o
+nome de novo ao conectar: um DNS que muda entre as duas resoluções (DNS
+rebinding) levaria o POST à rede interna. Este cliente verifica o endereço do
+par já conectado, antes do handshake TLS, e ignora proxies do ambiente.
+"""
+
+import socket
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+
+from .validators import _is_public_address
+
+
+class NonPublicPeerError(requests.exceptions.ConnectionError):
+    """Levantada quando a conexão chegou a um endereço não público."""
+
+
+class _PublicPeerHTTPSConnection(HTTPSConnection):
+    """Conexão HTTPS que é fechada se o par conectado não for um endereço público."""
+    
+    def _new_conn(self) -> socket.socket:
+        # Verifica o socket TCP recém-conectado, antes do handshake TLS
+        sock = super()._new_conn()
+        address = sock.getpeername()[0]
+        if not _is_public_address(address):
+            sock.close()
+            raise NonPublicPeerError(f"Conexão recusada: {self.host} resolveu para o endereço não público {address}")
+        return sock
+
+
+class _PublicPeerHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PublicPeerHTTPSConnection
+
+
+class PublicPeerAdapter(HTTPAdapter):
+    """Adapter do requests que usa _PublicPeerHTTPSConnection nas URLs https."""
+    
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme,
+            "https": _PublicPeerHTTPSConnectionPool
+        }
+
+
+def public_http_session() -> requests.Session:
+    """
+    Cria uma sessão do requests que só aceita https para endereços públicos.
+    
+    Returns:
+        requests.Session: Sessão sem proxies do ambiente e sem suporte a http
+    """
+    session = requests.Session()
+    # Com proxy, o par conectado seria o proxy e a verificação não valeria
+    session.trust_env = False
+    session.mount("https://", PublicPeerAdapter())
+    # Sem adapter para http: o requests recusa a URL (InvalidSchema)
+    del session.adapters["http://"]
+    return session
@@ -0,0 +1,329 @@
+"""
+Cache em processo das sessões do AnimaGuy com gravação adiada (write-behind).
+
+Mantém em memória a janela de histórico das sessões ativas (LRU + TTL), de
+modo que turnos consecutivos não leem o Firestore. Os novos turnos são
+acumulados e gravados em lote por uma thread periódica e no encerramento da
+instância (SIGTERM); a partir dele, cada turno é gravado de forma síncrona. Deve ser usado com afinidade de sessão no Cloud Run: sem
+ela, outra instância pode atender a mesma sessão com uma janela desatualizada.
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+from .firestore_client import firestore_client
+from .shutdown import register_shutdown_hook
+
+logger = logging.getLogger(__name__)
+
+# Gravador: recebe {session_id: [turnos]} e retorna True se persistiu
+TurnWriter = Callable[[Dict[str, List[Dict[str, Any]]]], bool]
+
+
+class SessionCache:
+    """Cache LRU de janelas de sessão com gravação adiada dos novos turnos."""
+    
+    def __init__(self, max_size: int, ttl_seconds: float, flush_interval: float, writer: TurnWriter):
+        """
+        Inicializa o cache de sessões.
+        
+        Args:
+            max_size: Número máximo de sessões em memória
+            ttl_seconds: Tempo sem uso após o qual a sessão é relida do Firestore
+            flush_interval: Intervalo entre gravações em lote (segundos)
+            writer: Função que grava os turnos pendentes no Firestore
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval = flush_interval
+        self._writer = writer
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._flushing: Dict[str, List[Dict[str, Any]]] = {}
+        self._oldest_pending_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.flushed_turns = 0
+        self.flush_errors = 0
+        self.last_flush_lag_seconds: Optional[float] = None
+    
+    @property
+    def enabled(self) -> bool:
+        """Indica se o cache está ativo (max_size > 0)."""
+        return self.max_size > 0
+    
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Recupera uma cópia da janela de uma sessão em memória.
+        
+        Args:
+            session_id: ID da sessão
+        
+        Returns:
+            Dict: Janela da sessão, ou None se ausente ou expirada
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            now = time.monotonic()
+            if entry is not None and entry["expires_at"] <= now and self._has_pending(session_id):
+                # O Firestore ainda não tem os turnos pendentes: a janela em memória continua valendo
+                entry["expires_at"] = now + self.ttl_seconds
+            elif entry is None or entry["expires_at"] <= now:
+                if entry is not None:
+                    del self._sessions[session_id]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return copy.deepcopy(entry["window"])
+    
+    def put(self, session_id: str, window: Dict[str, Any]) -> None:
+        """
+        Armazena a janela de uma sessão lida do Firestore.
+        
+        Turnos ainda não gravados desta sessão são incorporados à janela, para
+        que a numeração continue a partir deles.
+        
+        Args:
+            session_id: ID da sessão
+            window: Janela no formato de FirestoreClient.get_session_window
+        """
+        with self._lock:
+            self._store(session_id, self._merge_pending(session_id, copy.deepcopy(window)))
+    
+    def record_turn(
+        self,
+        session_id: str,
+        window: Dict[str, Any],
+        user_message: str,
+        answer: str,
+        max_turns: int
+    ) -> int:
+        """
+        Acrescenta um turno à sessão em memória e o agenda para gravação.
+        
+        O número do turno é atribuído aqui, sob lock, para que requisições
+        concorrentes da mesma sessão nesta instância não colidam.
+        
+        Args:
+            session_id: ID da sessão
+            window: Janela carregada no início do turno (usada se a sessão saiu do cache)
+            user_message: Mensagem do usuário
+            answer: Resposta do modelo
+            max_turns: Tamanho da janela mantida em memória
+        
+        Returns:
+            int: Número atribuído ao turno
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            current = (
+                entry["window"] if entry is not None
+                else self._merge_pending(session_id, copy.deepcopy(window))
+            )
+            
+            turn_number = current["turn_count"] + 1
+            turn = {"turn": turn_number, "user": user_message, "model": answer}
+            current["turns"] = (current["turns"] + [turn])[-max_turns:] if max_turns > 0 else []
+            current["turn_count"] = turn_number
+            self._store(session_id, current)
+            
+            self._pending.setdefault(session_id, []).append(turn)
+            if self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+        
+        if self._stop_event.is_set():
+            # Encerramento em andamento: a thread de gravação já terminou
+            self.flush()
+        return turn_number
+    
+    def update_summary(self, session_id: str, summary: str, summarized_turns: int) -> None:
+        """
+        Atualiza o resumo de uma sessão em memória (após a sumarização em segundo plano).
+        
+        Args:
+            session_id: ID da sessão
+            summary: Resumo acumulado
+            summarized_turns: Número de turnos cobertos pelo resumo
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and summarized_turns > entry["window"]["summarized_turns"]:
+                entry["window"]["summary"] = summary
+                entry["window"]["summarized_turns"] = summarized_turns
+    
+    def flush(self) -> bool:
+        """
+        Grava em lote todos os turnos pendentes.
+        
+        Returns:
+            bool: True se não havia pendências ou se a gravação foi bem-sucedida
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return True
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+                oldest_pending_at, self._oldest_pending_at = self._oldest_pending_at, None
+            
+            total_turns = sum(len(turns) for turns in pending.values())
+            try:
+                persisted = self._writer(pending)
+            except Exception as e:
+                logger.error(f"Erro ao gravar turnos pendentes: {e}", exc_info=True)
+                persisted = False
+            
+            if not persisted:
+                # Devolve as pendências para a próxima tentativa, preservando a ordem
+                with self._lock:
+                    for session_id, turns in pending.items():
+                        self._pending[session_id] = turns + self._pending.get(session_id, [])
+                    self._flushing = {}
+                    self._oldest_pending_at = oldest_pending_at
+                self.flush_errors += 1
+                return False
+            
+            with self._lock:
+                self._flushing = {}
+            self.flushes += 1
+            self.flushed_turns += total_turns
+            self.last_flush_lag_seconds = round(time.monotonic() - oldest_pending_at, 3)
+            logger.info(
+                f"{total_turns} turnos de {len(pending)} sessões gravados "
+                f"(atraso: {self.last_flush_lag_seconds}s)"
+            )
+            return True
+    
+    def stop(self) -> None:
+        """
+        Encerra a thread de gravação e grava as pendências restantes.
+        
+        Idempotente: é chamado no SIGTERM e de novo após a drenagem do servidor.
+        Depois dele, record_turn grava cada turno na thread da requisição.
+        """
+        self._stop_event.set()
+        self.flush()
+    
+    def _store(self, session_id: str, window: Dict[str, Any]) -> None:
+        """Armazena a janela (com o lock adquirido), descartando a sessão menos usada se necessário."""
+        if self.max_size <= 0:
+            return
+        
+        self._sessions[session_id] = {"window": window, "expires_at": time.monotonic() + self.ttl_seconds}
+        self._sessions.move_to_end(session_id)
+        if len(self._sessions) <= self.max_size:
+            return
+        
+        # Sessões com turnos não gravados não são descartadas: relê-las do Firestore
+        # repetiria números de turno. O cache pode exceder max_size até o próximo flush.
+        for candidate in list(self._sessions):
+            if len(self._sessions) <= self.max_size:
+                break
+            if candidate != session_id and not self._has_pending(candidate):
+                del self._sessions[candidate]
+                self.evictions += 1
+    
+    def _has_pending(self, session_id: str) -> bool:
+        """Indica (com o lock adquirido) se a sessão tem turnos ainda não gravados."""
+        return session_id in self._pending or session_id in self._flushing
+    
+    def _merge_pending(self, session_id: str, window: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Incorpora à janela (com o lock adquirido) os turnos não gravados que ela não contém.
+        
+        Args:
+            session_id: ID da sessão
+            window: Janela lida do Firestore
+        
+        Returns:
+            Dict: A própria janela, com turns e turn_count atualizados
+        """
+        unsaved = self._flushing.get(session_id, []) + self._pending.get(session_id, [])
+        missing = [turn for turn in unsaved if turn["turn"] > window["turn_count"]]
+        if not missing:
+            return window
+        
+        window["turns"] = window["turns"] + missing
+        window["turn_count"] = missing[-1]["turn"]
+        return window
+    
+    def start(self) -> bool:
+        """
+        Inicia a thread de gravação e registra o flush de encerramento (SIGTERM).
+        
+        Chamado explicitamente na inicialização do serviço (thread principal),
+        para que o handler de SIGTERM possa ser instalado; record_turn não inicia
+        a thread.
+        
+        Returns:
+            bool: True se a thread foi iniciada nesta chamada
+        """
+        if not self.enabled:
+            return False
+        
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._thread = threading.Thread(target=self._run, name="session-cache-flusher", daemon=True)
+        
+        register_shutdown_hook("session_cache", self.stop)
+        self._thread.start()
+        logger.info(f"Gravação adiada de sessões ativa (intervalo: {self.flush_interval}s)")
+        return True
+    
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do cache e da gravação adiada.
+        
+        Returns:
+            Dict: Tamanho, hits, misses, hit rate, evictions, pendências e atraso de gravação
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            pending_turns = sum(len(turns) for turns in self._pending.values())
+            pending_age = (
+                round(time.monotonic() - self._oldest_pending_at, 3)
+                if self._oldest_pending_at is not None else 0.0
+            )
+            return {
+                "size": len(self._sessions),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "pending_turns": pending_turns,
+                "pending_age_seconds": pending_age,
+                "flushes": self.flushes,
+                "flushed_turns": self.flushed_turns,
+                "flush_errors": self.flush_errors,
+                "last_flush_lag_seconds": self.last_flush_lag_seconds
+            }
+
+
+# Instância global do cache de sessões (singleton)
+session_cache = SessionCache(
+    max_size=config.SESSION_CACHE_MAX_SIZE if config.SESSION_CACHE_ENABLED else 0,
+    ttl_seconds=config.SESSION_CACHE_TTL,
+    flush_interval=config.SESSION_CACHE_FLUSH_INTERVAL,
+    writer=firestore_client.append_session_turns
+)
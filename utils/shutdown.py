@@ -0,0 +1,72 @@
+"""
+Ganchos de encerramento do processo.
+
+O Cloud Run envia SIGTERM alguns segundos antes de encerrar a instância. Os
+ganchos registrados aqui (ex: gravação de dados pendentes no Firestore) devem
+ser idempotentes: rodam no SIGTERM (quando o handler não foi substituído pelo
+servidor), de novo depois que o servidor drena as requisições em andamento
+(worker_exit do gunicorn, after_serving do Quart) e na saída do interpretador.
+Depois da primeira execução, os gravadores passam a gravar de forma síncrona,
+de modo que requisições concluídas durante a drenagem não percam dados.
+"""
+
+import atexit
+import logging
+import signal
+import threading
+from typing import Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_hooks: List[Tuple[str, Callable[[], None]]] = []
+_lock = threading.Lock()
+_run_lock = threading.Lock()
+_installed = False
+
+
+def register_shutdown_hook(name: str, hook: Callable[[], None]) -> None:
+    """
+    Registra uma função a ser executada no encerramento do processo.
+    
+    Args:
+        name: Nome do gancho (usado nos logs)
+        hook: Função sem argumentos
+    """
+    global _installed
+    
+    with _lock:
+        _hooks.append((name, hook))
+        if _installed:
+            return
+        _installed = True
+    
+    atexit.register(run_shutdown_hooks)
+    try:
+        previous_handler = signal.getsignal(signal.SIGTERM)
+        
+        def handle_sigterm(signum, frame):
+            logger.info("SIGTERM recebido - executando ganchos de encerramento")
+            run_shutdown_hooks()
+            if callable(previous_handler):
+                previous_handler(signum, frame)
+            elif previous_handler == signal.SIG_DFL:
+                raise SystemExit(0)
+        
+        signal.signal(signal.SIGTERM, handle_sigterm)
+    except ValueError:
+        # signal.signal só pode ser chamado na thread principal; resta o atexit
+        logger.warning("Handler de SIGTERM não instalado (fora da thread principal)")
+
+
+def run_shutdown_hooks() -> None:
+    """Executa os ganchos registrados (pode ser chamada várias vezes; as execuções não se sobrepõem)."""
+    with _lock:
+        hooks = list(_hooks)
+    
+    with _run_lock:
+        for name, hook in hooks:
+            try:
+                hook()
+                logger.info(f"Gancho de encerramento '{name}' executado")
+            except Exception as e:
+                logger.error(f"Erro no gancho de encerramento '{name}': {e}", exc_info=True)
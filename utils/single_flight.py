@@ -0,0 +1,155 @@
+"""
+Coalescência de chamadas idênticas em andamento (single-flight).
+
+Quando várias requisições com a mesma entrada chegam ao mesmo tempo (ex: uma
+turma enviando a mesma pergunta), apenas a primeira chama o Gemini; as demais
+aguardam essa chamada e recebem uma cópia do resultado (ou o mesmo erro).
+Nada é guardado após a conclusão: resultados reaproveitáveis ficam nos caches.
+"""
+
+import asyncio
+import copy
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Call:
+    """Chamada em andamento compartilhada entre threads."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Executa uma única chamada por chave entre requisições simultâneas."""
+    
+    def __init__(self, name: str, enabled: bool = True):
+        """
+        Inicializa o grupo.
+        
+        Args:
+            name: Nome do grupo (usado nos logs)
+            enabled: Se False, toda chamada é executada normalmente
+        """
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+    
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Executa fn, ou aguarda a execução já em andamento para a mesma chave.
+        
+        Args:
+            key: Impressão digital da entrada
+            fn: Função sem argumentos que faz a chamada
+        
+        Returns:
+            Tuple: (resultado, True se foi compartilhado de outra requisição)
+        """
+        if not self.enabled:
+            return fn(), False
+        
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.shared += 1
+        
+        if not is_leader:
+            logger.info(f"Aguardando chamada idêntica em andamento ({self.name})")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+        
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+    
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Versão assíncrona de do (coalesce as chamadas do mesmo event loop).
+        
+        Args:
+            key: Impressão digital da entrada
+            fn: Função sem argumentos que retorna a corrotina da chamada
+        
+        Returns:
+            Tuple: (resultado, True se foi compartilhado de outra requisição)
+        """
+        if not self.enabled:
+            return await fn(), False
+        
+        task = self._async_calls.get(key)
+        is_leader = task is None
+        if is_leader:
+            # A chamada roda em uma tarefa do grupo: cancelar o líder não cancela os demais
+            task = asyncio.ensure_future(fn())
+            self._async_calls[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda done, key=key: self._finish_async(key, done))
+        else:
+            self.shared += 1
+            logger.info(f"Aguardando chamada idêntica em andamento ({self.name})")
+        
+        # shield: o cancelamento de quem aguarda (inclusive o líder) não cancela a chamada compartilhada
+        result = await asyncio.shield(task)
+        if is_leader:
+            return result, False
+        return copy.deepcopy(result), True
+    
+    def _finish_async(self, key: Hashable, task: asyncio.Future) -> None:
+        """Remove a chamada assíncrona concluída do grupo."""
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        if not task.cancelled():
+            # Marca o erro como consumido mesmo sem requisições aguardando
+            task.exception()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do grupo.
+        
+        Returns:
+            Dict: Chamadas em andamento, executadas e compartilhadas
+        """
+        with self._lock:
+            in_flight = len(self._calls) + len(self._async_calls)
+        total = self.executed + self.shared
+        return {
+            "enabled": self.enabled,
+            "in_flight": in_flight,
+            "executed": self.executed,
+            "shared": self.shared,
+            "shared_rate": round(self.shared / total, 4) if total else 0.0
+        }
+
+
+# Instâncias globais por tipo de chamada (singletons)
+embedding_flight = SingleFlight("embeddings", enabled=config.SINGLE_FLIGHT_ENABLED)
+pitch_flight = SingleFlight("pitch", enabled=config.SINGLE_FLIGHT_ENABLED)
+animaguy_flight = SingleFlight("animaguy", enabled=config.SINGLE_FLIGHT_ENABLED)
@@ -0,0 +1,27 @@
+"""
+Formatação de eventos Server-Sent Events (SSE).
+"""
+
+import json
+from typing import Any, Dict
+
+
+def format_sse_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Formata um evento no protocolo text/event-stream.
+    
+    Args:
+        event: Nome do evento (ex: 'token', 'done')
+        data: Payload do evento, serializado como JSON
+        
+    Returns:
+        str: Evento SSE pronto para envio
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# Cabeçalhos para evitar buffering por proxies intermediários
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
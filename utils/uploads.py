@@ -0,0 +1,110 @@
+"""
+Ingestão de uploads de áudio sem cópias completas em memória.
+
+Os arquivos do multipart são gravados em arquivos temporários "spooled"
+(memória até UPLOAD_SPOOL_MAX_MEMORY, disco depois) que rejeitam o upload
+assim que ultrapassa AUDIO_MAX_BYTES, e são lidos em blocos de tamanho fixo
+para hash e envio à File API do Gemini.
+"""
+
+import hashlib
+import shutil
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import config
+
+
+class BoundedSpooledFile(tempfile.SpooledTemporaryFile):
+    """Arquivo temporário spooled que recusa escritas além de um limite de bytes."""
+    
+    def __init__(self, max_bytes: int, max_memory: int):
+        """
+        Inicializa o arquivo.
+        
+        Args:
+            max_bytes: Tamanho máximo aceito (levanta RequestEntityTooLarge ao exceder)
+            max_memory: Bytes mantidos em memória antes de migrar para o disco
+        """
+        super().__init__(max_size=max_memory, mode='w+b')
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+    
+    def write(self, data) -> int:
+        self.bytes_written += len(data)
+        if self.bytes_written > self.max_bytes:
+            raise RequestEntityTooLarge(
+                f"Arquivo excede o limite de {self.max_bytes / (1024 * 1024):.0f}MB"
+            )
+        return super().write(data)
+
+
+def spooled_stream_factory(
+    total_content_length: Optional[int],
+    content_type: Optional[str],
+    filename: Optional[str] = None,
+    content_length: Optional[int] = None
+) -> BoundedSpooledFile:
+    """
+    Stream factory do Werkzeug: grava cada arquivo do multipart em um BoundedSpooledFile.
+    
+    Returns:
+        BoundedSpooledFile: Destino do arquivo enviado
+    """
+    return BoundedSpooledFile(max_bytes=config.AUDIO_MAX_BYTES, max_memory=config.UPLOAD_SPOOL_MAX_MEMORY)
+
+
+class SpooledRequest(Request):
+    """Request do Flask que grava uploads em arquivos spooled com limite de tamanho."""
+    
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None
+    ) -> BinaryIO:
+        return spooled_stream_factory(total_content_length, content_type, filename, content_length)
+
+
+def hash_stream(stream: BinaryIO) -> Tuple[bytes, int]:
+    """
+    Calcula o SHA-256 de um stream em blocos, voltando ao início ao final.
+    
+    Args:
+        stream: Stream binário posicionável
+    
+    Returns:
+        Tuple[bytes, int]: (digest SHA-256, tamanho em bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    while True:
+        chunk = stream.read(config.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.digest(), size
+
+
+def copy_to_spooled_file(stream: BinaryIO) -> BoundedSpooledFile:
+    """
+    Copia um stream para um novo arquivo spooled (ex: para sobreviver ao fim da requisição).
+    
+    Args:
+        stream: Stream binário de origem
+    
+    Returns:
+        BoundedSpooledFile: Cópia posicionada no início
+    """
+    spooled = BoundedSpooledFile(max_bytes=config.AUDIO_MAX_BYTES, max_memory=config.UPLOAD_SPOOL_MAX_MEMORY)
+    stream.seek(0)
+    shutil.copyfileobj(stream, spooled, config.UPLOAD_CHUNK_SIZE)
+    spooled.seek(0)
+    return spooled
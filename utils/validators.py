@@ -2,8 +2,11 @@
 Validadores para requisições HTTP.
 """
 
+import ipaddress
 import logging
-from typing import Tuple, Optional
+import socket
+from typing import Any, Collection, Tuple, Optional
+from urllib.parse import urlparse
 from werkzeug.datastructures import FileStorage
 
 logger = logging.getLogger(__name__)
@@ -84,6 +87,133 @@ def validate_pitch_request(text: Optional[str], audio_file: Optional[FileStorage
     return True, None
 
 
+def validate_pitch_batch_request(
+    payload: Any,
+    max_items: int,
+    audio_uri_prefix: Optional[str] = None
+) -> Tuple[bool, Optional[str]]:
+    """
+    Valida uma requisição de análise de pitches em lote.
+    
+    Args:
+        payload: Corpo JSON da requisição ({"items": [...], "concurrency": n})
+        max_items: Número máximo de itens aceitos
+        audio_uri_prefix: Prefixo gs:// permitido para 'audio_uri' (None recusa itens com áudio)
+        
+    Returns:
+        Tuple[bool, Optional[str]]: (is_valid, error_message)
+    """
+    if not isinstance(payload, dict):
+        return False, "Corpo da requisição deve ser um objeto JSON."
+    
+    items = payload.get('items')
+    if not isinstance(items, list) or not items:
+        return False, "O campo 'items' deve ser uma lista não vazia."
+    
+    if len(items) > max_items:
+        return False, f"O batch excede o limite de {max_items} itens."
+    
+    concurrency = payload.get('concurrency')
+    # bool é subclasse de int: "concurrency": true não é um número
+    if concurrency is not None and (
+        isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1
+    ):
+        return False, "O campo 'concurrency' deve ser um inteiro positivo."
+    
+    allowed_extensions = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.aac', '.webm'}
+    
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            return False, f"Item {position}: deve ser um objeto."
+        
+        text = item.get('text')
+        audio_uri = item.get('audio_uri')
+        
+        if not text and not audio_uri:
+            return False, f"Item {position}: requer pelo menos 'text' ou 'audio_uri'."
+        
+        if text is not None:
+            if not isinstance(text, str) or len(text.strip()) == 0:
+                return False, f"Item {position}: o campo 'text' não pode estar vazio."
+            if len(text) > 10000:
+                return False, f"Item {position}: o campo 'text' excede o limite de 10000 caracteres."
+        
+        if audio_uri is not None:
+            if not isinstance(audio_uri, str) or not audio_uri.startswith("gs://"):
+                return False, f"Item {position}: 'audio_uri' deve ser uma URI gs://bucket/caminho."
+            if audio_uri_prefix is None:
+                return False, f"Item {position}: áudio por 'audio_uri' não está habilitado neste serviço."
+            if not audio_uri.startswith(audio_uri_prefix):
+                return False, f"Item {position}: 'audio_uri' deve estar em {audio_uri_prefix}."
+            file_ext = '.' + audio_uri.rsplit('.', 1)[-1].lower() if '.' in audio_uri else ''
+            if file_ext not in allowed_extensions:
+                return False, f"Item {position}: formato de áudio não suportado. Use: {', '.join(allowed_extensions)}"
+    
+    return True, None
+
+
+def validate_callback_url(
+    callback_url: Optional[str],
+    allowed_hosts: Optional[Collection[str]] = None
+) -> Tuple[bool, Optional[str]]:
+    """
+    Valida a URL de callback de um job assíncrono.
+    
+    Exige https e resolve o host: endereços privados, de loopback, link-local,
+    reservados ou de metadados não são aceitos, para que o serviço não seja
+    usado para alcançar a rede interna (SSRF). Faz resolução DNS (bloqueante).
+    
+    Args:
+        callback_url: URL que receberá o resultado via POST (opcional)
+        allowed_hosts: Hosts aceitos; se vazio, qualquer host público é aceito
+        
+    Returns:
+        Tuple[bool, Optional[str]]: (is_valid, error_message)
+    """
+    if not callback_url:
+        return True, None
+    
+    if len(callback_url) > 2048:
+        return False, "O campo 'callback_url' excede o limite de 2048 caracteres."
+    
+    try:
+        parsed = urlparse(callback_url)
+        hostname = parsed.hostname
+        port = parsed.port or 443
+    except ValueError:
+        return False, "O campo 'callback_url' deve ser uma URL https válida."
+    
+    if parsed.scheme != 'https' or not hostname or parsed.username or parsed.password:
+        return False, "O campo 'callback_url' deve ser uma URL https válida."
+    
+    if allowed_hosts and hostname.lower() not in allowed_hosts:
+        return False, "O host da 'callback_url' não está na lista de hosts permitidos."
+    
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(hostname, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        return False, "O host da 'callback_url' não pôde ser resolvido."
+    
+    for address in addresses:
+        if not _is_public_address(address):
+            logger.warning(f"callback_url recusada: {hostname} resolve para {address}")
+            return False, "A 'callback_url' deve apontar para um endereço público."
+    
+    return True, None
+
+
+def _is_public_address(address: str) -> bool:
+    """Indica se o IP é roteável na internet (não privado, loopback, link-local ou reservado)."""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    
+    return ip.is_global and not (
+        ip.is_private or ip.is_loopback or ip.is_link_local
+        or ip.is_reserved or ip.is_multicast or ip.is_unspecified
+    )
+
+
 def validate_mode(mode: Optional[str]) -> Tuple[bool, Optional[str]]:
     """
     Valida o modo de operação.